@@ -27,6 +27,12 @@ module.exports = {
 cube('Sales', {
   sql: 'SELECT * FROM sales_data',
   
+  // sales_daily_rollup's watermark only moves when new sales have been merged,
+  // so caches and pre-aggregations rebuild on new data instead of on a timer
+  refreshKey: {
+    sql: "SELECT high_watermark FROM rollup_watermarks WHERE rollup_name = 'sales_daily_rollup'"
+  },
+  
   dimensions: {
     id: {
       sql: 'id',
@@ -104,7 +110,10 @@ cube('Sales', {
       measureReferences: [Sales.totalAmount, Sales.count],
       dimensionReferences: [Sales.saleDate, Sales.region, Sales.category],
       timeDimensionReference: Sales.saleDate,
-      granularity: 'day'
+      granularity: 'day',
+      refreshKey: {
+        sql: "SELECT high_watermark FROM rollup_watermarks WHERE rollup_name = 'sales_daily_rollup'"
+      }
     },
     
     monthly: {
@@ -112,7 +121,10 @@ cube('Sales', {
       measureReferences: [Sales.totalAmount, Sales.count],
       dimensionReferences: [Sales.region, Sales.category],
       timeDimensionReference: Sales.saleDate,
-      granularity: 'month'
+      granularity: 'month',
+      refreshKey: {
+        sql: "SELECT high_watermark FROM rollup_watermarks WHERE rollup_name = 'sales_daily_rollup'"
+      }
     }
   }
 });
@@ -0,0 +1,169 @@
+import asyncio
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Sequence
+
+import httpx
+import structlog
+from jose import jwt
+
+logger = structlog.get_logger()
+
+
+class InvalidTokenError(Exception):
+    """Raised when a bearer token cannot be verified"""
+
+
+class TTLCache:
+    """Bounded LRU cache whose entries expire after a per-entry TTL"""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, tuple[float, Any]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return default
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._data[key]
+            self.misses += 1
+            return default
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        ttl = self.ttl if ttl is None else ttl
+        if ttl <= 0:
+            return
+        self._data[key] = (time.monotonic() + ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._data.pop(key, None)
+        return default if entry is None else entry[1]
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict[str, int]:
+        return {"entries": len(self._data), "hits": self.hits, "misses": self.misses}
+
+
+class JWKSCache:
+    """Signing keys of the identity provider, fetched lazily and refreshed on rotation.
+
+    Keys are refetched when the cached set is older than ``ttl`` or when a token
+    names a ``kid`` we have not seen. Refetches for unknown kids are limited to
+    one per ``min_refresh_interval`` so forged headers cannot hammer the issuer.
+    """
+
+    def __init__(self, jwks_url: str, ttl: float = 3600.0, min_refresh_interval: float = 30.0, timeout: float = 5.0):
+        self.jwks_url = jwks_url
+        self.ttl = ttl
+        self.min_refresh_interval = min_refresh_interval
+        self.timeout = timeout
+        self._keys: Dict[str, Dict[str, Any]] = {}
+        self._fetched_at = 0.0
+        self._lock = asyncio.Lock()
+
+    async def refresh(self) -> None:
+        async with httpx.AsyncClient(timeout=self.timeout) as client:
+            response = await client.get(self.jwks_url)
+            response.raise_for_status()
+        keys = {key["kid"]: key for key in response.json().get("keys", []) if "kid" in key}
+        self._keys = keys
+        self._fetched_at = time.monotonic()
+        logger.info("JWKS refreshed", url=self.jwks_url, key_count=len(keys))
+
+    async def get_key(self, kid: str) -> Dict[str, Any]:
+        age = time.monotonic() - self._fetched_at
+        key = self._keys.get(kid)
+        if key is not None and age < self.ttl:
+            return key
+
+        async with self._lock:
+            # Another request may have refreshed while we waited for the lock
+            age = time.monotonic() - self._fetched_at
+            key = self._keys.get(kid)
+            if key is not None and age < self.ttl:
+                return key
+            if key is None and age < self.min_refresh_interval:
+                raise InvalidTokenError(f"Unknown signing key: {kid}")
+            try:
+                await self.refresh()
+            except Exception as e:
+                # Keep serving the previous key set if the issuer is briefly unreachable
+                if kid in self._keys:
+                    logger.warning(f"JWKS refresh failed, using cached keys: {e}")
+                    return self._keys[kid]
+                raise InvalidTokenError(f"Could not fetch signing keys: {e}")
+
+        key = self._keys.get(kid)
+        if key is None:
+            raise InvalidTokenError(f"Unknown signing key: {kid}")
+        return key
+
+
+class TokenVerifier:
+    """Verifies bearer tokens locally and caches their claims until expiry"""
+
+    def __init__(
+        self,
+        jwks: JWKSCache,
+        issuer: Optional[str] = None,
+        audience: Optional[str] = None,
+        algorithms: Sequence[str] = ("RS256",),
+        cache_size: int = 10000,
+        max_cache_ttl: float = 300.0,
+    ):
+        self.jwks = jwks
+        self.issuer = issuer
+        self.audience = audience
+        self.algorithms = list(algorithms)
+        self.max_cache_ttl = max_cache_ttl
+        self._claims = TTLCache(maxsize=cache_size, ttl=max_cache_ttl)
+
+    async def verify(self, token: str) -> Dict[str, Any]:
+        cache_key = hashlib.sha256(token.encode()).digest()
+        claims = self._claims.get(cache_key)
+        if claims is not None:
+            return claims
+
+        try:
+            header = jwt.get_unverified_header(token)
+        except Exception as e:
+            raise InvalidTokenError(f"Malformed token: {e}")
+        if header.get("alg") not in self.algorithms:
+            raise InvalidTokenError(f"Unsupported signing algorithm: {header.get('alg')}")
+
+        key = await self.jwks.get_key(header.get("kid", ""))
+        try:
+            claims = jwt.decode(
+                token,
+                key,
+                algorithms=self.algorithms,
+                audience=self.audience,
+                issuer=self.issuer,
+                options={"verify_aud": self.audience is not None},
+            )
+        except Exception as e:
+            raise InvalidTokenError(str(e))
+        if "sub" not in claims:
+            raise InvalidTokenError("Token has no subject")
+
+        ttl = min(self.max_cache_ttl, claims.get("exp", 0) - time.time())
+        self._claims.set(cache_key, claims, ttl=ttl)
+        return claims
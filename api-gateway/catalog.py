@@ -0,0 +1,154 @@
+"""In-process snapshot of the report catalog: categories and active reports.
+
+The catalog changes a few times a day but is read on every menu render. The
+snapshot holds each view of it (categories, reports, reports per category, and
+the combined catalog) as pre-encoded JSON with a strong ETag. It is rebuilt
+only when the catalog's version changes, i.e. the row count or latest
+updated_at of either table. The version is checked at most once per
+``check_interval``, so most requests neither touch the database nor encode
+anything, and clients holding the current ETag get a bodiless 304.
+"""
+import asyncio
+import hashlib
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+import structlog
+from fastapi.responses import Response
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from serialization import encode_json
+
+logger = structlog.get_logger()
+
+VERSION_SQL = """
+    SELECT (SELECT count(*) FROM report_categories), (SELECT max(updated_at) FROM report_categories),
+           (SELECT count(*) FROM reports), (SELECT max(updated_at) FROM reports)
+"""
+CATEGORIES_SQL = """
+    SELECT id, name, description, icon, sort_order
+    FROM report_categories
+    ORDER BY sort_order, name
+"""
+REPORTS_SQL = """
+    SELECT id, category_id, name, description, chart_config, is_active, created_at
+    FROM reports
+    WHERE is_active
+    ORDER BY name
+"""
+
+# Authenticated and user-independent: browsers may keep it but must revalidate
+CACHE_CONTROL = "private, no-cache"
+
+
+@dataclass
+class Encoded:
+    body: bytes
+    etag: str
+
+
+def encode(content: Any) -> Encoded:
+    body = encode_json(content)
+    return Encoded(body, f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"')
+
+
+EMPTY_LIST = encode([])
+
+
+@dataclass
+class CatalogSnapshot:
+    version: Tuple[Any, ...]
+    categories: Encoded
+    reports: Encoded
+    reports_by_category: Dict[uuid.UUID, Encoded]
+    catalog: Encoded
+
+    def reports_for(self, category_id: Optional[uuid.UUID]) -> Encoded:
+        if category_id is None:
+            return self.reports
+        return self.reports_by_category.get(category_id, EMPTY_LIST)
+
+
+def build_snapshot(
+    version: Tuple[Any, ...],
+    categories: List[Dict[str, Any]],
+    reports: List[Dict[str, Any]]
+) -> CatalogSnapshot:
+    by_category: Dict[Any, List[Dict[str, Any]]] = {category["id"]: [] for category in categories}
+    uncategorized = []
+    for report in reports:
+        by_category.get(report["category_id"], uncategorized).append(report)
+    return CatalogSnapshot(
+        version=version,
+        categories=encode(categories),
+        reports=encode(reports),
+        reports_by_category={category_id: encode(items) for category_id, items in by_category.items()},
+        catalog=encode({
+            "categories": [{**category, "reports": by_category[category["id"]]} for category in categories],
+            "uncategorized": uncategorized,
+        })
+    )
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # If-None-Match compares weakly, so a W/ prefix added by a proxy still matches
+    return any(tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(","))
+
+
+class CatalogCache:
+    def __init__(self, engine: AsyncEngine, check_interval: float = 5.0):
+        self.engine = engine
+        self.check_interval = check_interval
+        self.hits = 0
+        self.checks = 0
+        self.rebuilds = 0
+        self.not_modified = 0
+        self._snapshot: Optional[CatalogSnapshot] = None
+        self._checked_at = 0.0
+        self._lock = asyncio.Lock()
+
+    def _fresh(self) -> bool:
+        return self._snapshot is not None and time.monotonic() - self._checked_at < self.check_interval
+
+    async def snapshot(self) -> CatalogSnapshot:
+        if self._fresh():
+            self.hits += 1
+            return self._snapshot
+        # One version check at a time; requests queued behind it reuse its result
+        async with self._lock:
+            if self._fresh():
+                self.hits += 1
+                return self._snapshot
+            async with self.engine.connect() as conn:
+                version = tuple((await conn.execute(text(VERSION_SQL))).one())
+                self.checks += 1
+                if self._snapshot is None or version != self._snapshot.version:
+                    categories = [dict(row) for row in (await conn.execute(text(CATEGORIES_SQL))).mappings()]
+                    reports = [dict(row) for row in (await conn.execute(text(REPORTS_SQL))).mappings()]
+                    self._snapshot = build_snapshot(version, categories, reports)
+                    self.rebuilds += 1
+                    logger.info("Report catalog rebuilt", categories=len(categories), reports=len(reports))
+            self._checked_at = time.monotonic()
+        return self._snapshot
+
+    def respond(self, encoded: Encoded, if_none_match: Optional[str]) -> Response:
+        headers = {"ETag": encoded.etag, "Cache-Control": CACHE_CONTROL}
+        if etag_matches(if_none_match, encoded.etag):
+            self.not_modified += 1
+            return Response(status_code=304, headers=headers)
+        return Response(encoded.body, media_type="application/json", headers=headers)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "hits": self.hits,
+            "checks": self.checks,
+            "rebuilds": self.rebuilds,
+            "not_modified": self.not_modified,
+        }
@@ -0,0 +1,123 @@
+"""Write-behind logging of query history and audit events.
+
+Requests enqueue rows and return; a background task drains the queue and
+writes each table's rows with one multi-row INSERT per flush. The queue is
+bounded: when the database falls behind, producers wait up to
+``enqueue_timeout`` for space, after which the row is dropped and counted
+rather than failing the request that produced it.
+"""
+import asyncio
+from collections import defaultdict
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import structlog
+from sqlalchemy import Table, insert
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+logger = structlog.get_logger()
+
+
+def summarize_result(columns: List[str], records: Sequence[Dict[str, Any]], sample_rows: int) -> Dict[str, Any]:
+    """What llm_queries keeps of a result: its shape and the first few rows"""
+    return {
+        "row_count": len(records),
+        "columns": columns,
+        "sample": list(records[:sample_rows]),
+        "truncated": len(records) > sample_rows,
+    }
+
+
+class HistoryWriter:
+    def __init__(
+        self,
+        engine: AsyncEngine,
+        max_queue: int = 10000,
+        batch_size: int = 500,
+        flush_interval: float = 1.0,
+        enqueue_timeout: float = 0.5,
+    ):
+        self.engine = engine
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.enqueue_timeout = enqueue_timeout
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self.max_queue = max_queue
+        self._queue: Optional["asyncio.Queue[Optional[Tuple[Table, Dict[str, Any]]]]"] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        # Created here so the queue belongs to the serving event loop
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Write whatever is still queued, then stop the background task"""
+        if self._task is None:
+            return
+        await self._queue.put(None)
+        await self._task
+        self._task = None
+
+    async def enqueue(self, table: Table, values: Dict[str, Any]) -> bool:
+        if self._queue is None:
+            raise RuntimeError("HistoryWriter is not started")
+        # Timestamp when the event happened, not when the batch is written
+        values.setdefault("created_at", datetime.utcnow())
+        try:
+            self._queue.put_nowait((table, values))
+        except asyncio.QueueFull:
+            try:
+                await asyncio.wait_for(self._queue.put((table, values)), self.enqueue_timeout)
+            except asyncio.TimeoutError:
+                self.dropped += 1
+                logger.warning("History queue full, dropping row", table=table.name, dropped=self.dropped)
+                return False
+        return True
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            item = await self._queue.get()
+            if item is None:
+                break
+            batch = [item]
+            # Wait up to flush_interval for the batch to fill before writing it
+            deadline = loop.time() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), remaining)
+                except asyncio.TimeoutError:
+                    break
+                if item is None:  # stop() sentinel: write this batch and exit
+                    stopping = True
+                    break
+                batch.append(item)
+            await self._flush(batch)
+
+    async def _flush(self, batch: List[Tuple[Table, Dict[str, Any]]]) -> None:
+        by_table: Dict[Table, List[Dict[str, Any]]] = defaultdict(list)
+        for table, values in batch:
+            by_table[table].append(values)
+        for table, rows in by_table.items():
+            try:
+                async with self.engine.begin() as conn:
+                    await conn.execute(insert(table), rows)
+                self.written += len(rows)
+            except Exception as e:
+                self.failed += len(rows)
+                logger.error(f"Error writing {len(rows)} rows to {table.name}: {e}")
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "written": self.written,
+            "dropped": self.dropped,
+            "failed": self.failed,
+        }
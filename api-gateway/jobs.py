@@ -0,0 +1,379 @@
+"""Asynchronous jobs for long-running reports and natural language queries.
+
+Submitting a job returns immediately. A fixed pool of workers runs the
+queued jobs, so a slow query holds a worker rather than an HTTP connection.
+Workers serve the highest priority first. Within a priority they pick the
+user with the fewest running jobs, and on ties the one served least
+recently, so one user's backlog cannot starve everyone else.
+
+Results are spooled to disk as NDJSON with one JSON array per row. The
+byte offset of every page of ``page_rows`` rows is kept in memory, so any
+row range is read with a single seek and returned without being decoded.
+Jobs and their files expire ``ttl`` seconds after they finish. Jobs live in
+this process only: they do not survive a restart, and leftover spool files
+are removed on start.
+"""
+import asyncio
+import os
+import uuid
+from collections import defaultdict, deque
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Sequence
+
+import structlog
+
+from serialization import encode_json, encode_row_lines
+
+logger = structlog.get_logger()
+
+PRIORITIES = {"high": 0, "normal": 1, "low": 2}
+SPOOL_SUFFIX = ".ndjson"
+
+
+class JobRejected(Exception):
+    """Raised when a user already has the maximum number of jobs queued"""
+
+
+class ResultTooLarge(Exception):
+    pass
+
+
+class ResultSpool:
+    """Writes a job's rows to disk a page at a time and records where each page starts"""
+
+    def __init__(self, path: Path, page_rows: int, max_bytes: int = 0):
+        self.path = path
+        self.page_rows = page_rows
+        self.max_bytes = max_bytes
+        self.columns: List[str] = []
+        self.row_count = 0
+        self.size = 0
+        self.page_offsets = [0]
+        self._pending: List[Sequence[Any]] = []
+        self._file = None
+
+    def set_columns(self, columns: List[str]) -> None:
+        self.columns = columns
+
+    def reset(self) -> None:
+        """Discard everything written so far, e.g. before retrying the query elsewhere"""
+        if self._file is not None:
+            self._file.seek(0)
+            self._file.truncate()
+        self.row_count = 0
+        self.size = 0
+        self.page_offsets = [0]
+        self._pending = []
+
+    async def write(self, rows: Sequence[Sequence[Any]]) -> None:
+        self._pending.extend(rows)
+        while len(self._pending) >= self.page_rows:
+            page, self._pending = self._pending[:self.page_rows], self._pending[self.page_rows:]
+            await self._write_page(page)
+
+    async def close(self) -> None:
+        if self._pending:
+            page, self._pending = self._pending, []
+            await self._write_page(page)
+        self.abort()
+
+    def abort(self) -> None:
+        """Close the file without writing buffered rows"""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    async def _write_page(self, rows: Sequence[Sequence[Any]]) -> None:
+        data = encode_row_lines(rows, len(self.columns))
+        if self.max_bytes and self.size + len(data) > self.max_bytes:
+            raise ResultTooLarge(f"Result exceeds the spool limit of {self.max_bytes} bytes")
+        if self._file is None:
+            self._file = open(self.path, "wb")
+        await asyncio.to_thread(self._file.write, data)
+        self.size += len(data)
+        self.row_count += len(rows)
+        self.page_offsets.append(self.size)
+
+
+# A job's work: fill the spool, return metadata to keep with the job (e.g. the SQL that ran)
+JobRunner = Callable[[ResultSpool], Awaitable[Optional[Dict[str, Any]]]]
+
+
+@dataclass
+class Job:
+    id: str
+    user_id: Any
+    kind: str
+    priority: str
+    run: JobRunner = field(repr=False)
+    description: Dict[str, Any] = field(default_factory=dict)
+    status: str = "queued"
+    submitted_at: datetime = field(default_factory=lambda: datetime.now(timezone.utc))
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    expires_at: Optional[datetime] = None
+    error: Optional[str] = None
+    metadata: Dict[str, Any] = field(default_factory=dict)
+    columns: List[str] = field(default_factory=list)
+    row_count: int = 0
+    size: int = 0
+    path: Optional[Path] = None
+    page_offsets: List[int] = field(default_factory=lambda: [0])
+    task: Optional[asyncio.Task] = field(default=None, repr=False)
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("succeeded", "failed", "cancelled")
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "priority": self.priority,
+            "status": self.status,
+            **self.description,
+            "submitted_at": self.submitted_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "expires_at": self.expires_at,
+            "error": self.error,
+            "columns": self.columns,
+            "row_count": self.row_count,
+            "size_bytes": self.size,
+            **self.metadata,
+        }
+
+
+class JobManager:
+    def __init__(
+        self,
+        spool_dir: str,
+        workers: int = 4,
+        page_rows: int = 1000,
+        ttl: float = 3600.0,
+        timeout: float = 900.0,
+        max_queued_per_user: int = 20,
+        max_running_per_user: int = 2,
+        max_result_bytes: int = 0,
+    ):
+        self.spool_dir = Path(spool_dir)
+        self.workers = workers
+        self.page_rows = page_rows
+        self.ttl = ttl
+        self.timeout = timeout
+        self.max_queued_per_user = max_queued_per_user
+        self.max_running_per_user = max_running_per_user
+        self.max_result_bytes = max_result_bytes
+        self.jobs: Dict[str, Job] = {}
+        self.counts: Dict[str, int] = defaultdict(int)
+        # priority -> user -> queued jobs, oldest first
+        self._queues: Dict[int, Dict[Any, Deque[Job]]] = {rank: {} for rank in PRIORITIES.values()}
+        self._running: Dict[Any, int] = defaultdict(int)
+        self._last_started: Dict[Any, float] = {}
+        self._wakeup: Optional[asyncio.Condition] = None
+        self._tasks: List[asyncio.Task] = []
+
+    def start(self) -> None:
+        self.spool_dir.mkdir(parents=True, exist_ok=True)
+        for leftover in self.spool_dir.glob(f"*{SPOOL_SUFFIX}"):
+            leftover.unlink(missing_ok=True)
+        # Created here so the condition belongs to the serving event loop
+        self._wakeup = asyncio.Condition()
+        self._tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._expire()))
+
+    async def stop(self) -> None:
+        running = [job.task for job in self.jobs.values() if job.task is not None]
+        for task in [*self._tasks, *running]:
+            task.cancel()
+        await asyncio.gather(*self._tasks, *running, return_exceptions=True)
+        self._tasks = []
+        for job in list(self.jobs.values()):
+            self._discard(job)
+
+    def submit(
+        self,
+        user_id: Any,
+        kind: str,
+        run: JobRunner,
+        priority: str = "normal",
+        description: Optional[Dict[str, Any]] = None
+    ) -> Job:
+        if self._wakeup is None:
+            raise RuntimeError("JobManager is not started")
+        if priority not in PRIORITIES:
+            raise ValueError(f"Unknown priority {priority!r}; expected one of {', '.join(PRIORITIES)}")
+        queued = sum(len(queues.get(user_id, ())) for queues in self._queues.values())
+        if queued >= self.max_queued_per_user:
+            raise JobRejected(f"At most {self.max_queued_per_user} jobs may be queued per user")
+        job = Job(uuid.uuid4().hex, user_id, kind, priority, run, description or {})
+        self.jobs[job.id] = job
+        self._queues[PRIORITIES[priority]].setdefault(user_id, deque()).append(job)
+        self.counts["submitted"] += 1
+        self._notify()
+        return job
+
+    def get(self, job_id: str, user_id: Any) -> Optional[Job]:
+        job = self.jobs.get(job_id)
+        return job if job is not None and job.user_id == user_id else None
+
+    def for_user(self, user_id: Any) -> List[Job]:
+        return sorted(
+            (job for job in self.jobs.values() if job.user_id == user_id),
+            key=lambda job: job.submitted_at, reverse=True
+        )
+
+    def cancel(self, job: Job) -> None:
+        """Cancel a queued or running job, or delete a finished one and its result"""
+        if job.status == "queued":
+            queue = self._queues[PRIORITIES[job.priority]].get(job.user_id)
+            if queue is not None and job in queue:
+                queue.remove(job)
+            self._finish(job, "cancelled")
+        elif job.status == "running" and job.task is not None:
+            job.task.cancel()
+        else:
+            self._discard(job)
+
+    async def read(self, job: Job, offset: int, limit: int) -> List[bytes]:
+        """The encoded rows in [offset, offset + limit), one JSON array each"""
+        end = min(offset + limit, job.row_count)
+        if offset >= end or job.path is None:
+            return []
+        first, last = offset // self.page_rows, (end - 1) // self.page_rows
+        start, stop = job.page_offsets[first], job.page_offsets[last + 1]
+
+        def read_pages() -> bytes:
+            with open(job.path, "rb") as f:
+                f.seek(start)
+                return f.read(stop - start)
+
+        lines = (await asyncio.to_thread(read_pages)).splitlines()
+        skip = offset - first * self.page_rows
+        return lines[skip:skip + end - offset]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "queued": sum(len(queue) for queues in self._queues.values() for queue in queues.values()),
+            "running": sum(self._running.values()),
+            "retained": len(self.jobs),
+            "spool_bytes": sum(job.size for job in self.jobs.values()),
+            **self.counts,
+        }
+
+    def _notify(self) -> None:
+        async def notify():
+            async with self._wakeup:
+                self._wakeup.notify_all()
+
+        asyncio.get_running_loop().create_task(notify())
+
+    def _next(self) -> Optional[Job]:
+        """Highest priority first; within it, the user with the fewest running jobs"""
+        for rank in sorted(self._queues):
+            queues = self._queues[rank]
+            candidates = [
+                user_id for user_id, queue in queues.items()
+                if queue and self._running[user_id] < self.max_running_per_user
+            ]
+            if not candidates:
+                continue
+            user_id = min(candidates, key=lambda user: (self._running[user], self._last_started.get(user, 0.0)))
+            queue = queues[user_id]
+            job = queue.popleft()
+            if not queue:
+                del queues[user_id]
+            return job
+        return None
+
+    async def _work(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            async with self._wakeup:
+                job = self._next()
+                while job is None:
+                    await self._wakeup.wait()
+                    job = self._next()
+                self._running[job.user_id] += 1
+                self._last_started[job.user_id] = loop.time()
+            try:
+                job.task = asyncio.create_task(self._execute(job))
+                await asyncio.shield(job.task)
+            except asyncio.CancelledError:
+                if not job.task.done():
+                    raise
+            finally:
+                job.task = None
+                self._running[job.user_id] -= 1
+                if not self._running[job.user_id]:
+                    del self._running[job.user_id]
+                # A user below their running limit again may have jobs waiting
+                self._notify()
+
+    async def _execute(self, job: Job) -> None:
+        job.status = "running"
+        job.started_at = datetime.now(timezone.utc)
+        job.path = self.spool_dir / f"{job.id}{SPOOL_SUFFIX}"
+        spool = ResultSpool(job.path, self.page_rows, self.max_result_bytes)
+        status, error = "failed", None
+        try:
+            job.metadata = await asyncio.wait_for(job.run(spool), self.timeout) or {}
+            await spool.close()
+            status = "succeeded"
+        except asyncio.TimeoutError:
+            error = f"Job exceeded the time limit of {self.timeout:.0f}s"
+        except asyncio.CancelledError:
+            status = "cancelled"
+        except Exception as e:
+            logger.error(f"Job {job.id} failed: {e}")
+            error = str(e)
+        finally:
+            spool.abort()
+        job.columns, job.row_count, job.size, job.page_offsets = (
+            spool.columns, spool.row_count, spool.size, spool.page_offsets
+        )
+        self._finish(job, status, error)
+
+    def _finish(self, job: Job, status: str, error: Optional[str] = None) -> None:
+        job.status = status
+        job.error = error
+        job.finished_at = datetime.now(timezone.utc)
+        job.expires_at = job.finished_at + timedelta(seconds=self.ttl)
+        self.counts[status] += 1
+        if status != "succeeded":
+            self._remove_file(job)
+        logger.info("Job finished", job_id=job.id, kind=job.kind, status=status, rows=job.row_count)
+
+    def _remove_file(self, job: Job) -> None:
+        if job.path is not None:
+            try:
+                os.unlink(job.path)
+            except FileNotFoundError:
+                pass
+            job.path = None
+        job.size = 0
+
+    def _discard(self, job: Job) -> None:
+        self._remove_file(job)
+        self.jobs.pop(job.id, None)
+
+    async def _expire(self) -> None:
+        while True:
+            await asyncio.sleep(min(self.ttl, 60.0))
+            now = datetime.now(timezone.utc)
+            for job in [job for job in self.jobs.values() if job.expires_at and job.expires_at <= now]:
+                self._discard(job)
+
+
+def encode_page(job: Job, offset: int, lines: List[bytes]) -> bytes:
+    """A page of a job's result as JSON; the spooled rows are spliced in without decoding"""
+    header = encode_json({
+        "job_id": job.id,
+        "columns": job.columns,
+        "offset": offset,
+        "total_rows": job.row_count,
+        "next_offset": offset + len(lines) if offset + len(lines) < job.row_count else None,
+    })
+    return header[:-1] + b',"rows":[' + b",".join(lines) + b"]}"
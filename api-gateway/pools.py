@@ -0,0 +1,173 @@
+"""Per-workload connection pools and read-replica routing.
+
+Each class of database work (auth, catalog reads, report queries, ad-hoc
+SQL, background writers) gets its own engine and pool. A burst of slow
+reports can exhaust its own pool but never block a login. Every pool pings
+connections on checkout, recycles them after a fixed age and caps overflow.
+
+Read-only report and ad-hoc queries can go to a replica. ``ReplicaMonitor``
+polls the replica's replay lag. A ``ReadRouter`` sends queries to the replica
+only while that lag is within bounds, and falls back to the primary when the
+replica lags, cannot be reached, or drops a connection mid-query.
+"""
+import asyncio
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Optional, TypeVar
+
+import structlog
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+
+logger = structlog.get_logger()
+
+T = TypeVar("T")
+
+# Seconds the replica is behind the primary; 0 when it has replayed everything it received
+REPLICA_LAG_SQL = """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+    END
+"""
+
+
+@dataclass
+class PoolSettings:
+    size: int
+    max_overflow: int
+    timeout: float = 10.0
+    recycle: float = 1800.0
+    # Prepared statements asyncpg keeps per connection, so repeated queries skip parse and plan
+    statement_cache_size: int = 100
+
+
+def create_pool(url: str, settings: PoolSettings, **kwargs: Any) -> AsyncEngine:
+    return create_async_engine(
+        url,
+        pool_size=settings.size,
+        max_overflow=settings.max_overflow,
+        pool_timeout=settings.timeout,
+        pool_recycle=settings.recycle,
+        pool_pre_ping=True,
+        connect_args={"prepared_statement_cache_size": settings.statement_cache_size},
+        **kwargs
+    )
+
+
+# Connection exceptions, server shutdown/startup, and queries cancelled by a recovery conflict
+REPLICA_FAILURE_STATES = ("08", "57P01", "57P02", "57P03", "40001")
+
+
+def is_replica_failure(error: BaseException) -> bool:
+    """Whether a read failed because of the replica rather than the statement"""
+    if isinstance(error, DBAPIError):
+        sqlstate = getattr(error.orig, "sqlstate", None)
+        return error.connection_invalidated or sqlstate is None or sqlstate.startswith(REPLICA_FAILURE_STATES)
+    return isinstance(error, (OSError, asyncio.TimeoutError))
+
+
+class ReplicaMonitor:
+    """Polls the replica's replay lag and decides whether it may serve reads"""
+
+    def __init__(self, engine: AsyncEngine, max_lag: float = 5.0, interval: float = 5.0, timeout: float = 2.0):
+        self.engine = engine
+        self.max_lag = max_lag
+        self.interval = interval
+        self.timeout = timeout
+        self.lag: Optional[float] = None
+        self.healthy = False
+        self.failures = 0
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def check(self) -> bool:
+        try:
+            async with self.engine.connect() as conn:
+                lag = await asyncio.wait_for(conn.scalar(text(REPLICA_LAG_SQL)), self.timeout)
+        except Exception as e:
+            self.mark_failed(e)
+            return False
+        self.lag = float(lag) if lag is not None else None
+        healthy = self.lag is not None and self.lag <= self.max_lag
+        if healthy != self.healthy:
+            logger.info("Replica reads " + ("enabled" if healthy else "disabled"), lag_seconds=self.lag)
+        self.healthy = healthy
+        return healthy
+
+    def mark_failed(self, error: BaseException) -> None:
+        """Stop reading from the replica until the next successful check"""
+        self.failures += 1
+        if self.healthy:
+            logger.warning(f"Replica unavailable, reading from the primary: {error}")
+        self.healthy = False
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "healthy": int(self.healthy),
+            "lag_seconds": self.lag if self.lag is not None else -1,
+            "max_lag_seconds": self.max_lag,
+            "failures": self.failures,
+        }
+
+    async def _run(self) -> None:
+        while True:
+            await self.check()
+            await asyncio.sleep(self.interval)
+
+
+class ReadRouter:
+    """Chooses the engine for one read-only workload: the replica when healthy, else the primary"""
+
+    def __init__(
+        self,
+        primary: AsyncEngine,
+        replica: Optional[AsyncEngine] = None,
+        monitor: Optional[ReplicaMonitor] = None
+    ):
+        self.primary = primary
+        self.replica = replica if monitor is not None else None
+        self.monitor = monitor
+        self.replica_reads = 0
+        self.primary_reads = 0
+        self.fallbacks = 0
+
+    def engine(self) -> AsyncEngine:
+        if self.replica is not None and self.monitor.healthy:
+            self.replica_reads += 1
+            return self.replica
+        self.primary_reads += 1
+        return self.primary
+
+    async def run(self, query: Callable[[AsyncEngine], Awaitable[T]]) -> T:
+        """Run a read-only ``query(engine)``, retrying on the primary if the replica connection fails"""
+        engine = self.engine()
+        try:
+            return await query(engine)
+        except Exception as e:
+            if engine is self.primary or not is_replica_failure(e):
+                raise
+            self.monitor.mark_failed(e)
+        self.fallbacks += 1
+        self.primary_reads += 1
+        return await query(self.primary)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "replica_reads": self.replica_reads,
+            "primary_reads": self.primary_reads,
+            "fallbacks": self.fallbacks,
+        }
@@ -0,0 +1,158 @@
+import asyncio
+import hashlib
+import sys
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Sequence, Set, Tuple
+
+import structlog
+
+logger = structlog.get_logger()
+
+# Rows sampled to estimate the in-memory size of a result
+SIZE_SAMPLE_ROWS = 100
+
+
+@dataclass
+class CachedResult:
+    columns: List[str]
+    rows: Sequence[Sequence[Any]]
+    size: int = 0
+    expires_at: float = 0.0
+    loaded_at: float = field(default_factory=time.time)
+
+
+def estimate_size(columns: List[str], rows: Sequence[Sequence[Any]]) -> int:
+    """Approximate bytes held by a result, extrapolated from the first rows"""
+    if not rows:
+        return sys.getsizeof(columns)
+    sample = rows[:SIZE_SAMPLE_ROWS]
+    sample_size = sum(
+        sys.getsizeof(row) + sum(sys.getsizeof(value) for value in row)
+        for row in sample
+    )
+    return sys.getsizeof(columns) + sample_size * len(rows) // len(sample)
+
+
+def query_hash(sql: str) -> str:
+    return hashlib.sha256(sql.encode()).hexdigest()
+
+
+def is_older(key: Tuple[Any, ...], other: Tuple[Any, ...]) -> bool:
+    """Whether ``key`` caches an older definition of the report than ``other``"""
+    updated_at, other_updated_at = key[2], other[2]
+    if updated_at is None or other_updated_at is None:
+        return False
+    return updated_at < other_updated_at
+
+
+class ReportResultCache:
+    """LRU cache of report results bounded by entry count and approximate bytes.
+
+    Keys are (report id, query hash, report updated_at, bound parameters), so
+    editing a report moves it to a new key; entries for older versions of the
+    same report are dropped as soon as a newer version is stored, while results
+    for other parameter values of the current version are kept. Concurrent
+    misses on one key share a single load instead of each hitting the database.
+    """
+
+    def __init__(self, max_bytes: int, max_entries: int, default_ttl: float):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self._entries: "OrderedDict[Hashable, CachedResult]" = OrderedDict()
+        self._keys_by_report: Dict[Any, Set[Hashable]] = {}
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    @staticmethod
+    def make_key(
+        report_id: Any,
+        sql: str,
+        updated_at: Optional[datetime],
+        parameters: Tuple[Tuple[str, Any], ...] = ()
+    ) -> Tuple[Any, str, Optional[datetime], Tuple[Tuple[str, Any], ...]]:
+        return (report_id, query_hash(sql), updated_at, parameters)
+
+    async def get_or_load(
+        self,
+        key: Tuple[Any, ...],
+        ttl: Optional[float],
+        loader: Callable[[], Awaitable[Tuple[List[str], Sequence[Sequence[Any]]]]],
+    ) -> Tuple[CachedResult, bool]:
+        """Return (result, cache_hit), running ``loader`` at most once per key at a time"""
+        ttl = self.default_ttl if ttl is None else ttl
+        entry = self._entries.get(key)
+        if entry is not None:
+            if entry.expires_at > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry, True
+            self._remove(key)
+
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            self.misses += 1
+            task = asyncio.ensure_future(self._load(key, ttl, loader))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        # Shielded so one cancelled caller does not abort the load for the others
+        return await asyncio.shield(task), False
+
+    async def _load(self, key, ttl, loader) -> CachedResult:
+        columns, rows = await loader()
+        entry = CachedResult(columns=columns, rows=rows, size=estimate_size(columns, rows))
+        if ttl > 0 and entry.size <= self.max_bytes:
+            entry.expires_at = time.monotonic() + ttl
+            self._store(key, entry)
+        return entry
+
+    def _store(self, key: Tuple[Any, ...], entry: CachedResult) -> None:
+        report_id = key[0]
+        cached = list(self._keys_by_report.get(report_id, ()))
+        # A slow load of an older definition may finish after a newer one was stored
+        if any(is_older(key, other) for other in cached):
+            return
+        # A newer definition of the report makes every older entry unreachable
+        for stale in cached:
+            if is_older(stale, key):
+                self._remove(stale)
+        if key in self._entries:
+            self._remove(key)
+
+        self._entries[key] = entry
+        self._keys_by_report.setdefault(report_id, set()).add(key)
+        self._bytes += entry.size
+        while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+            self._remove(next(iter(self._entries)))
+
+    def _remove(self, key: Hashable) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        self._bytes -= entry.size
+        keys = self._keys_by_report.get(key[0])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._keys_by_report[key[0]]
+
+    def invalidate(self, report_id: Any) -> None:
+        for key in list(self._keys_by_report.get(report_id, ())):
+            self._remove(key)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+        }
@@ -0,0 +1,72 @@
+import csv
+import io
+import uuid
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence
+
+from sqlalchemy.ext.asyncio import AsyncResult
+
+from serialization import encode_ndjson, to_jsonable
+
+# Media types for the streaming result formats, keyed by the ?format= value
+STREAM_MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+ARROW_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+# "columnar" is JSON too, so it can only be requested through ?format=
+MEDIA_TYPES = {**STREAM_MEDIA_TYPES, "arrow": ARROW_MEDIA_TYPE}
+
+
+def negotiate_format(requested: Optional[str], accept: Optional[str], supported: Sequence[str]) -> Optional[str]:
+    """Pick a result format from ?format= first, then the Accept header"""
+    if requested:
+        return requested if requested in supported else None
+    if accept:
+        for media_range in accept.split(","):
+            media_type = media_range.split(";")[0].strip().lower()
+            for name in supported:
+                if MEDIA_TYPES.get(name) == media_type:
+                    return name
+    return "json" if "json" in supported else None
+
+
+def encode_arrow(columns: List[str], rows: Sequence[Sequence[Any]], metadata: Optional[Dict[str, str]] = None) -> bytes:
+    """Encode a result as an Arrow IPC stream; metadata is attached to the schema"""
+    import pyarrow as pa  # Imported lazily, only Arrow clients pay for it
+
+    arrays = []
+    for i in range(len(columns)):
+        values = [row[i] for row in rows]
+        if any(isinstance(value, uuid.UUID) for value in values):
+            values = [None if value is None else str(value) for value in values]
+        arrays.append(pa.array(values))
+    table = pa.Table.from_arrays(arrays, names=columns)
+    if metadata:
+        table = table.replace_schema_metadata(metadata)
+
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def encode_csv(rows: Sequence[Sequence[Any]]) -> bytes:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerows(
+        [to_jsonable(value) if value is not None else "" for value in row]
+        for row in rows
+    )
+    return buffer.getvalue().encode()
+
+
+async def stream_result(result: AsyncResult, fmt: str) -> AsyncIterator[bytes]:
+    """Encode a server-side cursor result batch by batch as it is fetched"""
+    columns = list(result.keys())
+    if fmt == "csv":
+        yield encode_csv([columns])
+    async for partition in result.partitions():
+        if fmt == "csv":
+            yield encode_csv(partition)
+        else:
+            yield encode_ndjson(columns, partition)
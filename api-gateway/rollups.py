@@ -0,0 +1,361 @@
+"""Transparent routing of report queries to pre-aggregated rollup tables.
+
+A rollup (database/init/04_sales_rollups.sql) holds sums and counts per
+day x region x category x product and is refreshed incrementally. Rows
+created after its watermark are read from the raw table. A routed query
+therefore reads "rollup UNION ALL recent raw rows", aliased to the raw
+table's name, and returns the same result it would have returned before
+the refresh caught up.
+
+The raw tail is bounded twice. The watermark is read in the query itself,
+so it always matches the rollup's contents. The last watermark the gateway
+saw is also inlined as a literal, which the planner can estimate and serve
+from the created_at index; a parameter alone would get a sequential scan.
+Watermarks never move backwards, so the literal is never the tighter bound.
+
+Bind parameters of parameterized reports (``:name``) are left in place like
+literals, so one rewrite serves every set of values.
+
+Only queries the rollup can answer exactly are rewritten. Every column a
+query touches must be a rollup dimension or sit inside a supported
+aggregate, and there can be no joins, subqueries, window functions or
+unknown identifiers. An output alias may not reuse the name of a source
+column other than a dimension. Anything else runs unchanged against the
+raw table.
+"""
+import asyncio
+import re
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, List, Optional, Set, Tuple
+
+import structlog
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+logger = structlog.get_logger()
+
+# Missing rollup table or refresh function: the database predates the rollup
+UNDEFINED_OBJECT_STATES = {"42P01", "42883"}
+
+TOKEN_RE = re.compile(r"""
+    (?P<space>\s+|--[^\n]*|/\*.*?\*/)
+  | (?P<string>'(?:[^']|'')*')
+  | (?P<quoted>"(?:[^"]|"")*")
+  | (?P<number>\d+(?:\.\d*)?)
+  | (?P<name>[A-Za-z_][A-Za-z0-9_$]*)
+  | (?P<param>:[A-Za-z_][A-Za-z0-9_]*)
+  | (?P<op>::|<=|>=|<>|!=|\|\||[-+*/%<>=(),.;])
+""", re.VERBOSE | re.DOTALL)
+
+# Words a routable query may use besides dimensions, aliases and functions
+KEYWORDS = {
+    "select", "from", "where", "group", "by", "order", "asc", "desc", "nulls", "first", "last", "limit",
+    "offset", "and", "or", "not", "as", "interval", "current_date", "current_timestamp", "between", "in",
+    "is", "null", "case", "when", "then", "else", "end", "union", "all", "distinct", "having", "true",
+    "false", "date", "timestamp", "like", "ilike",
+}
+FUNCTIONS = {
+    "date_trunc", "date_part", "coalesce", "nullif", "round", "to_char", "lower", "upper", "now", "abs",
+    "greatest", "least",
+}
+CAST_TYPES = {"numeric", "decimal", "integer", "int", "bigint", "float", "real", "text", "date", "varchar"}
+AGGREGATES = {"sum", "count", "avg"}
+SET_OPERATORS = {"union", "intersect", "except"}
+
+Token = Tuple[str, str]
+
+
+@dataclass
+class Rollup:
+    name: str  # Rollup table, and its key in rollup_watermarks
+    source: str  # Raw table the rollup aggregates
+    dimensions: Tuple[str, ...]
+    # Relation column -> (expression over the rollup table, expression over a raw row)
+    columns: Dict[str, Tuple[str, str]]
+    # (aggregate, argument) over the raw table -> equivalent over the relation
+    aggregates: Dict[Tuple[str, str], str]
+    refresh_function: str
+    # Every column of the source table: output aliases must not shadow the raw-only ones
+    source_columns: Tuple[str, ...] = ()
+    watermark_column: str = "created_at"
+
+    def relation(self, watermark: Optional[datetime] = None) -> str:
+        rollup_columns = ", ".join(
+            [*self.dimensions, *(f"{expr} AS {col}" if expr != col else col for col, (expr, _) in self.columns.items())]
+        )
+        raw_columns = ", ".join([*self.dimensions, *(expr for _, expr in self.columns.values())])
+        known = f"{self.watermark_column} > '{watermark.isoformat()}'::timestamptz AND " if watermark else ""
+        return (
+            f"(SELECT {rollup_columns} FROM {self.name}"
+            f" UNION ALL"
+            f" SELECT {raw_columns} FROM {self.source}"
+            f" WHERE {known}{self.watermark_column} > COALESCE("
+            f"(SELECT high_watermark FROM rollup_watermarks WHERE rollup_name = '{self.name}'), '-infinity'))"
+        )
+
+
+SALES_DAILY_ROLLUP = Rollup(
+    name="sales_daily_rollup",
+    source="sales_data",
+    dimensions=("sale_date", "region", "category", "product_name"),
+    columns={
+        "total_amount": ("total_amount", "total_amount"),
+        "quantity": ("quantity", "quantity"),
+        "unit_price": ("unit_price_sum", "unit_price"),
+        "row_count": ("row_count", "1"),
+    },
+    aggregates={
+        ("sum", "total_amount"): "SUM(total_amount)",
+        ("sum", "quantity"): "SUM(quantity)::bigint",
+        ("count", "*"): "SUM(row_count)::bigint",
+        ("count", "1"): "SUM(row_count)::bigint",
+        ("avg", "total_amount"): "(SUM(total_amount) / NULLIF(SUM(row_count), 0))",
+        ("avg", "quantity"): "(SUM(quantity)::numeric / NULLIF(SUM(row_count), 0))",
+        ("avg", "unit_price"): "(SUM(unit_price) / NULLIF(SUM(row_count), 0))",
+        # Dimensions are NOT NULL, so counting one counts rows
+        **{("count", dimension): "SUM(row_count)::bigint"
+           for dimension in ("sale_date", "region", "category", "product_name")},
+    },
+    refresh_function="refresh_sales_daily_rollup",
+    source_columns=(
+        "id", "sale_date", "product_name", "category", "region", "sales_rep", "quantity", "unit_price",
+        "total_amount", "customer_id", "created_at",
+    ),
+)
+
+ROLLUPS = [SALES_DAILY_ROLLUP]
+
+
+def tokenize(sql: str) -> Optional[List[Token]]:
+    tokens, pos = [], 0
+    while pos < len(sql):
+        match = TOKEN_RE.match(sql, pos)
+        if match is None:
+            return None
+        tokens.append((match.lastgroup, match.group()))
+        pos = match.end()
+    return tokens
+
+
+def rewrite(sql: str, rollup: Rollup, watermark: Optional[datetime] = None) -> Optional[str]:
+    """``sql`` reading ``rollup`` instead of its source table, or None if it cannot"""
+    tokens = tokenize(sql)
+    if not tokens:
+        return None
+    sig = [i for i, (kind, _) in enumerate(tokens) if kind != "space"]
+
+    def value(j: int) -> str:
+        return tokens[sig[j]][1].lower() if j < len(sig) else ""
+
+    def kind(j: int) -> str:
+        return tokens[sig[j]][0] if j < len(sig) else ""
+
+    # First pass: FROM targets, table aliases and output-column aliases
+    replacements: Dict[int, str] = {}
+    table_names = {rollup.source}
+    column_aliases: Set[str] = set()
+    for j in range(len(sig)):
+        if value(j) == "as" and kind(j + 1) == "name":
+            column_aliases.add(value(j + 1))
+        if value(j) != "from":
+            continue
+        if value(j + 1) != rollup.source:
+            return None  # Subquery, another table, or a qualified name
+        k = j + 2 + (value(j + 2) == "as")
+        alias = value(k) if kind(k) == "name" and value(k) not in KEYWORDS else None
+        if alias:
+            table_names.add(alias)
+            column_aliases.discard(alias)
+        replacements[sig[j + 1]] = rollup.relation(watermark) + ("" if alias else f" AS {rollup.source}")
+    if not replacements:
+        return None
+    # WHERE and GROUP BY resolve a name to the input column before an output
+    # alias. An alias spelled like a raw-only column (SUM(x) AS sales_rep ...
+    # WHERE sales_rep = 'a') names a column the rollup does not have, and one
+    # spelled like a measure would read the rollup's sums instead of raw values.
+    if column_aliases & (set(rollup.source_columns) | set(rollup.columns)) - set(rollup.dimensions):
+        return None
+
+    spans: Dict[int, Tuple[int, str]] = {}  # token index -> (last token index, replacement)
+    allowed = set(rollup.dimensions) | column_aliases | table_names | KEYWORDS
+    # Each SELECT block must aggregate, group or de-duplicate: rollup rows are not raw rows
+    block_collapses = [False]
+    j = 0
+    while j < len(sig):
+        word, token_kind = value(j), kind(j)
+        if token_kind in ("string", "number", "param"):
+            j += 1
+            continue
+        if token_kind == "quoted":
+            return None
+        if token_kind == "op":
+            if word == ";" and j != len(sig) - 1:
+                return None
+            if word == "(" and value(j + 1) in ("select", "with"):
+                return None
+            if word == "::":
+                if value(j + 1) not in CAST_TYPES:
+                    return None
+                j += 2
+                continue
+            if word == "." and not (value(j - 1) in table_names and value(j + 1) in rollup.dimensions):
+                return None
+            j += 1
+            continue
+
+        if word in SET_OPERATORS:
+            block_collapses.append(False)
+        elif word in ("group", "distinct"):
+            block_collapses[-1] = True
+        # A keyword before "(" opens a group, as in "AND (a OR b)", not a call
+        if value(j + 1) == "(" and word not in KEYWORDS:
+            if word in AGGREGATES:
+                close = j + 2
+                while close < len(sig) and value(close) != ")":
+                    close += 1
+                args = [value(k) for k in range(j + 2, close)]
+                if len(args) == 3 and args[0] in table_names and args[1] == ".":
+                    args = args[2:]
+                replacement = rollup.aggregates.get((word, args[0])) if len(args) == 1 else None
+                if replacement is None or value(close + 1) in ("over", "filter"):
+                    return None
+                spans[sig[j]] = (sig[close], replacement)
+                block_collapses[-1] = True
+                j = close + 1
+                continue
+            if word not in FUNCTIONS:
+                return None
+        elif word not in allowed:
+            return None  # A raw-only column, another table, JOIN, OVER, WITH, ...
+        j += 1
+
+    if not all(block_collapses):
+        return None
+
+    parts, i = [], 0
+    while i < len(tokens):
+        if i in spans:
+            end, replacement = spans[i]
+            parts.append(replacement)
+            i = end + 1
+            continue
+        parts.append(replacements.get(i, tokens[i][1]))
+        i += 1
+    return "".join(parts)
+
+
+class RollupRouter:
+    def __init__(self, rollups: List[Rollup], enabled: bool = True, cache_size: int = 1024):
+        self.rollups = rollups
+        self.enabled = enabled
+        self.cache_size = cache_size
+        # Rollups known to exist in the database and their last seen watermarks; set by RollupRefresher
+        self.watermarks: Dict[str, datetime] = {}
+        self.routed = 0
+        self.passed = 0
+        self._rewrites: Dict[str, Tuple[str, Optional[str]]] = {}
+
+    def route(self, sql: str) -> Tuple[str, Optional[str]]:
+        """The SQL to run and the rollup it reads, or (sql, None) to run it as is"""
+        if not self.enabled or not self.watermarks:
+            return sql, None
+        routed = self._rewrites.get(sql)
+        if routed is None:
+            routed = (sql, None)
+            for rollup in self.rollups:
+                if rollup.name not in self.watermarks:
+                    continue
+                rewritten = rewrite(sql, rollup, self.watermarks[rollup.name])
+                if rewritten is not None:
+                    routed = (rewritten, rollup.name)
+                    break
+            if len(self._rewrites) >= self.cache_size:
+                self._rewrites.clear()
+            self._rewrites[sql] = routed
+        if routed[1]:
+            self.routed += 1
+        else:
+            self.passed += 1
+        return routed
+
+    def set_watermark(self, rollup: str, watermark: Optional[datetime]) -> None:
+        if watermark is None:
+            self.watermarks.pop(rollup, None)
+        elif self.watermarks.get(rollup) != watermark:
+            self.watermarks[rollup] = watermark
+        else:
+            return
+        # Rewrites inline the watermark
+        self._rewrites.clear()
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "watermarks": {name: watermark.isoformat() for name, watermark in self.watermarks.items()},
+            "routed": self.routed,
+            "passed": self.passed,
+        }
+
+
+class RollupRefresher:
+    """Runs each rollup's incremental refresh function on a fixed interval"""
+
+    def __init__(self, engine: AsyncEngine, router: RollupRouter, interval: float = 300.0, lag: float = 60.0):
+        self.engine = engine
+        self.router = router
+        self.interval = interval
+        self.lag = lag
+        self.last_refresh: Dict[str, Dict[str, object]] = {}
+        # Set once every rollup has been tried, i.e. routing reflects what is installed
+        self.first_pass = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def refresh(self, rollup: Rollup, full: bool = False) -> Optional[int]:
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        try:
+            async with self.engine.begin() as conn:
+                rows = await conn.scalar(
+                    text(f"SELECT {rollup.refresh_function}(make_interval(secs => :lag), :full)"),
+                    {"lag": self.lag, "full": full}
+                )
+                watermark = await conn.scalar(
+                    text("SELECT high_watermark FROM rollup_watermarks WHERE rollup_name = :name"),
+                    {"name": rollup.name}
+                )
+        except DBAPIError as e:
+            if getattr(e.orig, "sqlstate", None) in UNDEFINED_OBJECT_STATES:
+                self.router.set_watermark(rollup.name, None)
+                logger.warning(f"Rollup {rollup.name} is not installed; queries will not be routed to it")
+            else:
+                logger.error(f"Error refreshing rollup {rollup.name}: {e}")
+            return None
+        except Exception as e:
+            logger.error(f"Error refreshing rollup {rollup.name}: {e}")
+            return None
+        # Routing stays exact while refreshes fail, so only a missing rollup disables it
+        self.router.set_watermark(rollup.name, watermark)
+        self.last_refresh[rollup.name] = {"rows_merged": rows, "seconds": round(loop.time() - started, 3)}
+        logger.info("Rollup refreshed", rollup=rollup.name, **self.last_refresh[rollup.name])
+        return rows
+
+    async def _run(self) -> None:
+        while True:
+            for rollup in self.router.rollups:
+                await self.refresh(rollup)
+            self.first_pass.set()
+            await asyncio.sleep(self.interval)
@@ -0,0 +1,122 @@
+"""Row serialization for query results.
+
+orjson encodes str/int/float/bool, datetime, date, time and UUID natively in C,
+so the only Python work left per cell is for column types it cannot encode
+(Decimal from NUMERIC columns, intervals). The converter for each column is
+chosen once from its first non-null value rather than checked cell by cell.
+"""
+import uuid
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+import orjson
+from fastapi.responses import JSONResponse
+
+Converter = Callable[[Any], Any]
+
+# Encoded by orjson as-is
+NATIVE_TYPES = (str, int, float, bool, datetime, date, time, uuid.UUID, dict, list)
+
+CONVERTERS: Dict[type, Converter] = {
+    Decimal: float,
+    timedelta: timedelta.total_seconds,
+    bytes: bytes.hex,
+    memoryview: lambda value: value.hex(),
+}
+
+
+def to_jsonable(value: Any) -> Any:
+    """Per-value fallback for formats that need plain strings and numbers, e.g. CSV"""
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    converter = CONVERTERS.get(type(value))
+    return converter(value) if converter else value
+
+
+def _default(value: Any) -> Any:
+    # Only reached for types without a column converter, e.g. a mixed-type column
+    converter = CONVERTERS.get(type(value))
+    return converter(value) if converter else str(value)
+
+
+def column_converters(rows: Sequence[Sequence[Any]], width: int) -> List[Optional[Converter]]:
+    """Converter per column, or None where orjson can encode the values directly"""
+    converters: List[Optional[Converter]] = [None] * width
+    pending = set(range(width))
+    for row in rows:
+        for i in list(pending):
+            value = row[i]
+            if value is None:
+                continue
+            pending.discard(i)
+            if not isinstance(value, NATIVE_TYPES):
+                converters[i] = CONVERTERS.get(type(value))
+        if not pending:
+            break
+    return converters
+
+
+def convert_rows(rows: Sequence[Sequence[Any]], width: int) -> Sequence[Sequence[Any]]:
+    """Apply column converters; rows are returned untouched when none are needed"""
+    active = [(i, converter) for i, converter in enumerate(column_converters(rows, width)) if converter]
+    if not active:
+        return rows
+    converted = []
+    for row in rows:
+        values = list(row)
+        for i, converter in active:
+            value = values[i]
+            if value is not None:
+                values[i] = converter(value)
+        converted.append(values)
+    return converted
+
+
+def to_records(columns: List[str], rows: Sequence[Sequence[Any]]) -> List[Dict[str, Any]]:
+    return [dict(zip(columns, row)) for row in convert_rows(rows, len(columns))]
+
+
+def to_columnar(columns: List[str], rows: Sequence[Sequence[Any]]) -> Dict[str, Any]:
+    """One array per column instead of one dict per row, so names are sent once"""
+    converters = column_converters(rows, len(columns))
+    data = []
+    for i, converter in enumerate(converters):
+        if converter is None:
+            data.append([row[i] for row in rows])
+        else:
+            data.append([None if row[i] is None else converter(row[i]) for row in rows])
+    return {"columns": columns, "data": data}
+
+
+def encode_json(content: Any) -> bytes:
+    return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+
+
+def dumps(content: Any) -> str:
+    """json.dumps replacement, e.g. as the engine's JSONB serializer"""
+    return encode_json(content).decode()
+
+
+def encode_ndjson(columns: List[str], rows: Sequence[Sequence[Any]]) -> bytes:
+    return b"".join(
+        orjson.dumps(record, default=_default, option=orjson.OPT_APPEND_NEWLINE)
+        for record in to_records(columns, rows)
+    )
+
+
+def encode_row_lines(rows: Sequence[Sequence[Any]], width: int) -> bytes:
+    """One JSON array per row, newline-terminated: NDJSON without repeating column names"""
+    return b"".join(
+        orjson.dumps(tuple(row), default=_default, option=orjson.OPT_APPEND_NEWLINE)
+        for row in convert_rows(rows, width)
+    )
+
+
+class JSONBytesResponse(JSONResponse):
+    """JSONResponse rendered with orjson; handles datetimes, UUIDs and Decimals"""
+
+    def render(self, content: Any) -> bytes:
+        return encode_json(content)
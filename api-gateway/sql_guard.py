@@ -0,0 +1,128 @@
+"""Bounded execution of ad-hoc (LLM-generated) SQL.
+
+Every statement runs on the ad-hoc pool (or its replica, see pools.py) so
+runaway queries cannot starve report and catalog traffic. It runs inside a
+read-only transaction with a transaction-local statement_timeout. A row cap is
+applied as a LIMIT, and the planner's estimate for the capped query is checked
+before anything executes. A query over the cost limit is downgraded to a
+smaller row cap and re-planned; that helps when the plan can stop early, e.g. a
+scan or index-ordered read. If the cheaper plan is still over the limit, as
+with a full aggregation or sort, the query is rejected.
+"""
+import re
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence
+
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from pools import ReadRouter
+
+TRAILING_LIMIT_RE = re.compile(r"\blimit\s+(\d+|all)(\s+offset\s+\d+)?\s*$", re.IGNORECASE)
+# The SQL-standard spelling of LIMIT; the count defaults to 1, and WITH TIES may return more rows
+TRAILING_FETCH_RE = re.compile(
+    r"\bfetch\s+(?:first|next)\s+(?:(\d+)\s+)?rows?\s+(only|with\s+ties)\s*$", re.IGNORECASE
+)
+ROW_LIMIT_CLAUSE_RE = re.compile(r"\b(?:limit|offset|fetch)\b", re.IGNORECASE)
+QUERY_CANCELED = "57014"
+
+
+class QueryRejected(Exception):
+    """Raised when a statement is refused before or during execution"""
+
+    def __init__(self, message: str, plan: Optional[Dict[str, Any]] = None):
+        super().__init__(message)
+        self.plan = plan
+
+
+@dataclass
+class GuardedResult:
+    columns: List[str]
+    rows: Sequence[Sequence[Any]]
+    plan: Dict[str, Any]
+    sql: str
+
+
+def apply_row_limit(sql: str, max_rows: int) -> tuple[str, bool]:
+    """Cap a SELECT at ``max_rows``; returns the statement and whether it changed"""
+    sql = sql.strip().rstrip(";").strip()
+    limit, fetch = TRAILING_LIMIT_RE.search(sql), TRAILING_FETCH_RE.search(sql)
+    if limit is not None:
+        count = None if limit.group(1).lower() == "all" else int(limit.group(1))
+    elif fetch is not None:
+        count = int(fetch.group(1) or 1) if fetch.group(2).lower() == "only" else None
+    elif ROW_LIMIT_CLAUSE_RE.search(sql) is None:
+        return f"{sql}\nLIMIT {max_rows}", True
+    else:
+        count = None  # A row-limiting clause a LIMIT cannot simply follow, e.g. OFFSET n ROWS
+    if count is not None and count <= max_rows:
+        return sql, False
+    # The query's own limit is too large, unbounded or not understood: cap it from the outside
+    return f"SELECT * FROM (\n{sql}\n) AS limited_query\nLIMIT {max_rows}", True
+
+
+def summarize_plan(explain_output: Any) -> Dict[str, Any]:
+    plan = explain_output[0]["Plan"]
+    return {
+        "node_type": plan["Node Type"],
+        "startup_cost": plan["Startup Cost"],
+        "total_cost": plan["Total Cost"],
+        "plan_rows": plan["Plan Rows"],
+    }
+
+
+class SQLGuard:
+    def __init__(
+        self,
+        reads: ReadRouter,
+        max_cost: float,
+        max_rows: int,
+        statement_timeout_ms: int,
+        downgrade_rows: int = 0
+    ):
+        self.reads = reads
+        self.max_cost = max_cost
+        self.max_rows = max_rows
+        self.statement_timeout_ms = statement_timeout_ms
+        # Row cap tried for queries over max_cost before rejecting them; 0 disables
+        self.downgrade_rows = downgrade_rows if 0 < downgrade_rows < max_rows else 0
+
+    async def execute(self, sql: str) -> GuardedResult:
+        return await self.reads.run(lambda engine: self._execute(engine, sql))
+
+    @staticmethod
+    async def _plan(conn: Any, sql: str, max_rows: int) -> tuple[str, Dict[str, Any]]:
+        guarded_sql, limited = apply_row_limit(sql, max_rows)
+        # exec_driver_sql sends the statement verbatim: text() would read
+        # ":30" inside a literal such as '10:30' as a bind parameter
+        explain = await conn.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {guarded_sql}")
+        plan = summarize_plan(explain.scalar())
+        plan["row_limit"] = max_rows if limited else None
+        return guarded_sql, plan
+
+    async def _execute(self, engine: AsyncEngine, sql: str) -> GuardedResult:
+        async with engine.connect() as conn:
+            async with conn.begin():
+                await conn.exec_driver_sql("SET TRANSACTION READ ONLY")
+                await conn.exec_driver_sql(
+                    "SELECT set_config('statement_timeout', $1, true)", (f"{self.statement_timeout_ms}ms",)
+                )
+                guarded_sql, plan = await self._plan(conn, sql, self.max_rows)
+                if plan["total_cost"] > self.max_cost and self.downgrade_rows:
+                    original_cost = plan["total_cost"]
+                    guarded_sql, plan = await self._plan(conn, sql, self.downgrade_rows)
+                    plan["downgraded_from_cost"] = original_cost
+                if plan["total_cost"] > self.max_cost:
+                    raise QueryRejected(
+                        f"Estimated query cost {plan['total_cost']:.0f} exceeds the limit of {self.max_cost:.0f}",
+                        plan
+                    )
+                try:
+                    result = await conn.exec_driver_sql(guarded_sql)
+                except DBAPIError as e:
+                    if getattr(e.orig, "sqlstate", None) == QUERY_CANCELED:
+                        raise QueryRejected(
+                            f"Query exceeded the statement timeout of {self.statement_timeout_ms}ms", plan
+                        )
+                    raise
+                return GuardedResult(list(result.keys()), result.fetchall(), plan, guarded_sql)
@@ -0,0 +1,173 @@
+"""Local JWT verification against a stand-in issuer serving a JWKS over HTTP"""
+import asyncio
+import hashlib
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from jose import jwk, jwt
+
+from auth import InvalidTokenError, JWKSCache, TokenVerifier
+
+ISSUER = "http://issuer.test/realms/enterprise-reporting"
+AUDIENCE = "api-gateway"
+
+
+class SigningKey:
+    def __init__(self, kid: str):
+        self.kid = kid
+        private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        self.pem = private_key.private_bytes(
+            serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+        )
+        self.jwk = jwk.construct(
+            private_key.public_key().public_bytes(
+                serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo
+            ),
+            "RS256"
+        ).to_dict()
+        self.jwk.update({"kid": kid, "use": "sig", "alg": "RS256"})
+
+    def token(self, **overrides) -> str:
+        now = int(time.time())
+        claims = {"sub": "user-1", "iss": ISSUER, "aud": AUDIENCE, "iat": now, "exp": now + 3600}
+        claims.update(overrides)
+        return jwt.encode(claims, self.pem, algorithm="RS256", headers={"kid": self.kid})
+
+
+class Issuer:
+    """JWKS endpoint whose published keys can be rotated; counts fetches"""
+
+    def __init__(self):
+        self.keys = [SigningKey("key-1")]
+        self.fetches = 0
+        issuer = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                issuer.fetches += 1
+                body = json.dumps({"keys": [key.jwk for key in issuer.keys]}).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}/certs"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+
+@pytest.fixture
+def issuer():
+    issuer = Issuer()
+    yield issuer
+    issuer.server.shutdown()
+    issuer.server.server_close()
+
+
+@pytest.fixture
+def verifier(issuer):
+    return TokenVerifier(JWKSCache(issuer.url, min_refresh_interval=30.0), issuer=ISSUER, audience=AUDIENCE)
+
+
+def test_valid_token(issuer, verifier):
+    claims = asyncio.run(verifier.verify(issuer.keys[0].token()))
+    assert claims["sub"] == "user-1"
+    assert issuer.fetches == 1
+
+
+def test_valid_token_is_served_from_the_claim_cache(issuer, verifier):
+    token = issuer.keys[0].token()
+
+    async def verify_twice():
+        await verifier.verify(token)
+        return await verifier.verify(token)
+
+    assert asyncio.run(verify_twice())["sub"] == "user-1"
+    assert verifier._claims.hits == 1
+    assert issuer.fetches == 1
+
+
+def test_expired_token_is_rejected(issuer, verifier):
+    now = int(time.time())
+    token = issuer.keys[0].token(iat=now - 120, exp=now - 60)
+    with pytest.raises(InvalidTokenError, match="expired"):
+        asyncio.run(verifier.verify(token))
+
+
+def test_wrong_audience_is_rejected(issuer, verifier):
+    with pytest.raises(InvalidTokenError, match="audience"):
+        asyncio.run(verifier.verify(issuer.keys[0].token(aud="another-client")))
+
+
+def test_wrong_issuer_is_rejected(issuer, verifier):
+    with pytest.raises(InvalidTokenError, match="issuer"):
+        asyncio.run(verifier.verify(issuer.keys[0].token(iss="http://elsewhere.test/realms/other")))
+
+
+def test_token_signed_by_another_key_with_a_known_kid_is_rejected(issuer, verifier):
+    forged = SigningKey("key-1").token()
+    with pytest.raises(InvalidTokenError, match="Signature"):
+        asyncio.run(verifier.verify(forged))
+
+
+def test_unknown_kid_refreshes_the_jwks_after_rotation(issuer, verifier):
+    async def scenario():
+        await verifier.verify(issuer.keys[0].token())
+        # The issuer rotates to a new key once the minimum refresh interval has passed
+        issuer.keys.append(SigningKey("key-2"))
+        verifier.jwks._fetched_at -= verifier.jwks.min_refresh_interval
+        return await verifier.verify(issuer.keys[1].token(sub="user-2"))
+
+    assert asyncio.run(scenario())["sub"] == "user-2"
+    assert issuer.fetches == 2
+
+
+def test_unknown_kid_refresh_respects_min_refresh_interval(issuer, verifier):
+    async def scenario():
+        await verifier.verify(issuer.keys[0].token())
+        forged = SigningKey("forged").token()
+        for _ in range(5):
+            with pytest.raises(InvalidTokenError, match="Unknown signing key"):
+                await verifier.verify(forged)
+
+    asyncio.run(scenario())
+    assert issuer.fetches == 1
+
+
+def test_unknown_kid_after_the_interval_triggers_one_refresh(issuer, verifier):
+    async def scenario():
+        await verifier.verify(issuer.keys[0].token())
+        verifier.jwks._fetched_at -= verifier.jwks.min_refresh_interval
+        forged = SigningKey("forged").token()
+        for _ in range(3):
+            with pytest.raises(InvalidTokenError, match="Unknown signing key"):
+                await verifier.verify(forged)
+
+    asyncio.run(scenario())
+    assert issuer.fetches == 2
+
+
+def cached_ttl(verifier: TokenVerifier, token: str) -> float:
+    expires_at, _ = verifier._claims._data[hashlib.sha256(token.encode()).digest()]
+    return expires_at - time.monotonic()
+
+
+def test_claim_cache_ttl_is_capped_at_token_expiry(issuer, verifier):
+    token = issuer.keys[0].token(exp=int(time.time()) + 20)
+    asyncio.run(verifier.verify(token))
+    assert 0 < cached_ttl(verifier, token) <= 20
+
+
+def test_claim_cache_ttl_is_capped_at_max_cache_ttl(issuer, verifier):
+    token = issuer.keys[0].token()
+    asyncio.run(verifier.verify(token))
+    assert verifier.max_cache_ttl - 5 < cached_ttl(verifier, token) <= verifier.max_cache_ttl
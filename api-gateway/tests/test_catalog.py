@@ -0,0 +1,197 @@
+import asyncio
+import json
+import uuid
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+
+import pytest
+
+from catalog import CATEGORIES_SQL, EMPTY_LIST, REPORTS_SQL, VERSION_SQL, CatalogCache, etag_matches
+
+SALES, FINANCE = uuid.UUID(int=1), uuid.UUID(int=2)
+CREATED = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+class Result:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def one(self):
+        return self.rows[0]
+
+    def mappings(self):
+        return self.rows
+
+
+class CatalogDatabase:
+    """Stands in for the catalog engine; ``updated_at`` plays max(updated_at) of both tables"""
+
+    def __init__(self):
+        self.categories = [
+            {"id": SALES, "name": "Sales", "description": None, "icon": "chart", "sort_order": 1},
+            {"id": FINANCE, "name": "Finance", "description": None, "icon": "money", "sort_order": 2},
+        ]
+        self.reports = [
+            self.report("Monthly revenue", SALES),
+            self.report("Cash flow", FINANCE),
+            self.report("Orphan", None),
+        ]
+        self.updated_at = CREATED
+        self.statements = []
+
+    @staticmethod
+    def report(name, category_id):
+        return {
+            "id": uuid.uuid5(uuid.NAMESPACE_URL, name), "category_id": category_id, "name": name,
+            "description": None, "chart_config": {"type": "bar"}, "is_active": True, "created_at": CREATED,
+        }
+
+    @asynccontextmanager
+    async def connect(self):
+        yield self
+
+    async def execute(self, statement):
+        sql = statement.text
+        self.statements.append(sql)
+        if sql == VERSION_SQL:
+            return Result([(len(self.categories), self.updated_at, len(self.reports), self.updated_at)])
+        return Result([dict(row) for row in {CATEGORIES_SQL: self.categories, REPORTS_SQL: self.reports}[sql]])
+
+    def version_checks(self):
+        return self.statements.count(VERSION_SQL)
+
+
+@pytest.fixture
+def database():
+    return CatalogDatabase()
+
+
+def snapshot(cache):
+    return asyncio.run(cache.snapshot())
+
+
+def test_snapshot_groups_reports_by_category(database):
+    current = snapshot(CatalogCache(database))
+
+    catalog = json.loads(current.catalog.body)
+    assert [category["name"] for category in catalog["categories"]] == ["Sales", "Finance"]
+    assert [report["name"] for report in catalog["categories"][0]["reports"]] == ["Monthly revenue"]
+    assert [report["name"] for report in catalog["uncategorized"]] == ["Orphan"]
+    assert [report["name"] for report in json.loads(current.reports_for(FINANCE).body)] == ["Cash flow"]
+    assert len(json.loads(current.reports_for(None).body)) == 3
+    assert current.reports_for(uuid.UUID(int=99)) is EMPTY_LIST
+
+
+def test_version_is_checked_at_most_once_per_interval(database):
+    cache = CatalogCache(database, check_interval=60)
+
+    first, second = snapshot(cache), snapshot(cache)
+
+    assert first is second
+    assert database.version_checks() == 1
+    assert cache.stats() == {"hits": 1, "checks": 1, "rebuilds": 1, "not_modified": 0}
+
+
+def test_unchanged_version_keeps_the_snapshot(database):
+    cache = CatalogCache(database, check_interval=0)
+
+    first, second = snapshot(cache), snapshot(cache)
+
+    assert first is second
+    assert (cache.checks, cache.rebuilds) == (2, 1)
+    assert database.statements.count(REPORTS_SQL) == 1
+
+
+def test_edited_report_rebuilds_with_a_new_etag(database):
+    cache = CatalogCache(database, check_interval=0)
+    before = snapshot(cache)
+
+    database.reports[0] = {**database.reports[0], "name": "Monthly revenue (net)"}
+    database.updated_at = datetime(2024, 2, 1, tzinfo=timezone.utc)
+    after = snapshot(cache)
+
+    assert cache.rebuilds == 2
+    assert after.catalog.etag != before.catalog.etag
+    assert after.reports_for(SALES).etag != before.reports_for(SALES).etag
+    # Views the edit did not touch keep their ETag, so clients still get a 304 for them
+    assert after.categories.etag == before.categories.etag
+    assert after.reports_for(FINANCE).etag == before.reports_for(FINANCE).etag
+
+
+def test_deleted_report_rebuilds_on_the_row_count(database):
+    cache = CatalogCache(database, check_interval=0)
+    before = snapshot(cache)
+
+    database.reports.pop()  # updated_at of the remaining rows is unchanged
+    after = snapshot(cache)
+
+    assert cache.rebuilds == 2
+    assert json.loads(after.catalog.body)["uncategorized"] == []
+    assert after.catalog.etag != before.catalog.etag
+
+
+def test_etag_is_stable_across_rebuilds_with_identical_content(database):
+    cache = CatalogCache(database, check_interval=0)
+    before = snapshot(cache)
+
+    database.updated_at = datetime(2024, 3, 1, tzinfo=timezone.utc)  # Touched, not changed
+    after = snapshot(cache)
+
+    assert after is not before and cache.rebuilds == 2
+    assert after.catalog == before.catalog
+    assert after.categories.etag == before.categories.etag
+    assert snapshot(CatalogCache(CatalogDatabase())).catalog.etag == before.catalog.etag
+
+
+def test_concurrent_requests_share_one_version_check(database):
+    cache = CatalogCache(database, check_interval=60)
+
+    async def scenario():
+        return await asyncio.gather(*(cache.snapshot() for _ in range(10)))
+
+    snapshots = asyncio.run(scenario())
+
+    assert all(current is snapshots[0] for current in snapshots)
+    assert database.version_checks() == 1
+
+
+def test_respond_sends_the_body_with_a_strong_etag(database):
+    cache = CatalogCache(database)
+    encoded = snapshot(cache).categories
+
+    response = cache.respond(encoded, None)
+
+    assert response.status_code == 200
+    assert response.body == encoded.body
+    assert response.headers["etag"] == encoded.etag
+    assert not encoded.etag.startswith("W/") and encoded.etag.startswith('"')
+    assert response.headers["cache-control"] == "private, no-cache"
+
+
+def test_respond_answers_304_to_the_current_etag(database):
+    cache = CatalogCache(database)
+    encoded = snapshot(cache).categories
+
+    response = cache.respond(encoded, encoded.etag)
+
+    assert response.status_code == 304
+    assert response.body == b""
+    assert response.headers["etag"] == encoded.etag
+    assert cache.not_modified == 1
+
+
+@pytest.mark.parametrize("header, matches", [
+    ('"abc"', True),
+    ('W/"abc"', True),
+    ('"old", "abc"', True),
+    ('"old",W/"abc" , "older"', True),
+    ("*", True),
+    (' * ', True),
+    ('"old", "older"', False),
+    ('"ABC"', False),
+    ('abc', False),
+    ("", False),
+    (None, False),
+])
+def test_if_none_match_lists(header, matches):
+    assert etag_matches(header, '"abc"') is matches
@@ -0,0 +1,95 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+import main
+from report_cache import ReportResultCache
+
+
+class SlowDatabase:
+    """Stands in for run_report_query and records how many queries run at once"""
+
+    def __init__(self, latency):
+        self.latency = latency
+        self.running = 0
+        self.peak = 0
+        self.started = []
+
+    async def __call__(self, sql, parameters=(), values=None):
+        self.started.append(sql)
+        self.running += 1
+        self.peak = max(self.peak, self.running)
+        try:
+            await asyncio.sleep(self.latency)
+            if "broken" in sql:
+                raise RuntimeError("relation does not exist")
+            return ["region", "revenue"], [("Europe", 10), ("Asia", 20)]
+        finally:
+            self.running -= 1
+
+
+@pytest.fixture
+def database(monkeypatch):
+    def install(latency, concurrency=2, timeout=5.0):
+        db = SlowDatabase(latency)
+        monkeypatch.setattr(main, "run_report_query", db)
+        monkeypatch.setattr(main, "report_cache", ReportResultCache(10_000_000, 100, 60))
+        monkeypatch.setattr(main, "DASHBOARD_MAX_CONCURRENCY", concurrency)
+        monkeypatch.setattr(main, "DASHBOARD_WIDGET_TIMEOUT_SECONDS", timeout)
+        return db
+
+    return install
+
+
+def runs(*names):
+    reports = [SimpleNamespace(id=name, sql_query=f"SELECT {name}", updated_at=None, chart_config={}) for name in names]
+    return {(report.id, ()): (report, (), {}) for report in reports}
+
+
+def test_timed_out_widgets_keep_their_slot_until_the_query_finishes(database):
+    db = database(latency=0.3, concurrency=2, timeout=0.05)
+
+    async def scenario():
+        outcomes = await main.run_dashboard_reports(runs(*"abcdef"), "json", "dashboard-1")
+        # The abandoned queries are still running; nothing queued behind them may start
+        await asyncio.sleep(0.5)
+        return outcomes
+
+    outcomes = asyncio.run(scenario())
+
+    assert {(outcome["success"], outcome["error"]) for outcome in outcomes.values()} == {(False, "Report timed out")}
+    assert db.peak == 2
+    assert len(db.started) == 2
+
+
+def test_in_flight_queries_never_exceed_the_limit(database):
+    db = database(latency=0.02, concurrency=3)
+
+    outcomes = asyncio.run(main.run_dashboard_reports(runs(*"abcdefghij"), "json", "dashboard-1"))
+
+    assert all(outcome["success"] for outcome in outcomes.values())
+    assert db.peak == 3
+    assert len(db.started) == 10
+
+
+def test_results_in_either_format(database):
+    database(latency=0)
+
+    records = asyncio.run(main.run_dashboard_reports(runs("a"), "json", "dashboard-1"))[("a", ())]
+    columnar = asyncio.run(main.run_dashboard_reports(runs("a"), "columnar", "dashboard-1"))[("a", ())]
+
+    assert records["data"] == [{"region": "Europe", "revenue": 10}, {"region": "Asia", "revenue": 20}]
+    assert (records["columns"], records["cached"]) == (["region", "revenue"], False)
+    assert columnar["cached"] is True
+    assert columnar["columns"] == ["region", "revenue"]
+
+
+def test_failing_report_only_fails_its_widget(database):
+    database(latency=0)
+
+    outcomes = asyncio.run(main.run_dashboard_reports(runs("a", "broken"), "json", "dashboard-1"))
+
+    assert outcomes[("a", ())]["success"] is True
+    assert outcomes[("broken", ())]["success"] is False
+    assert outcomes[("broken", ())]["error"] == "Error executing report: relation does not exist"
@@ -0,0 +1,185 @@
+import asyncio
+from contextlib import asynccontextmanager
+from datetime import datetime
+
+import pytest
+from sqlalchemy import Column, Integer, MetaData, String, Table
+
+from history import HistoryWriter, summarize_result
+
+metadata = MetaData()
+QUERIES = Table("llm_queries", metadata, Column("id", Integer), Column("created_at", String))
+AUDIT = Table("audit_logs", metadata, Column("id", Integer), Column("created_at", String))
+
+
+class Database:
+    """Stands in for the writer's engine and records every multi-row INSERT.
+
+    Inserts wait for ``gate`` when one is set and raise ``error`` when one is set."""
+
+    def __init__(self):
+        self.inserts = []
+        self.gate = None
+        self.error = None
+
+    @asynccontextmanager
+    async def begin(self):
+        if self.gate is not None:
+            await self.gate.wait()
+        yield self
+
+    async def execute(self, statement, rows):
+        if self.error is not None:
+            raise self.error
+        self.inserts.append((statement.table.name, [row["id"] for row in rows]))
+
+    def ids(self):
+        return [row_id for _, ids in self.inserts for row_id in ids]
+
+
+def run(scenario, **options):
+    database = Database()
+
+    async def main():
+        writer = HistoryWriter(database, **options)
+        writer.start()
+        try:
+            return await scenario(writer, database)
+        finally:
+            await writer.stop()
+
+    return database, asyncio.run(main())
+
+
+async def enqueue(writer, table, *ids):
+    return [await writer.enqueue(table, {"id": row_id}) for row_id in ids]
+
+
+def test_full_batches_are_written_without_waiting_for_the_interval():
+    async def scenario(writer, database):
+        await enqueue(writer, QUERIES, *range(7))
+        await asyncio.sleep(0.05)
+        return list(database.inserts)
+
+    database, before_stop = run(scenario, batch_size=3, flush_interval=10)
+
+    assert before_stop == [("llm_queries", [0, 1, 2]), ("llm_queries", [3, 4, 5])]
+    # The partial batch is written on shutdown
+    assert database.inserts[-1] == ("llm_queries", [6])
+
+
+def test_partial_batch_is_written_after_the_flush_interval():
+    async def scenario(writer, database):
+        await enqueue(writer, QUERIES, 1, 2)
+        await asyncio.sleep(0.02)
+        pending = list(database.inserts)
+        await asyncio.sleep(0.15)
+        return pending, list(database.inserts), writer.stats()
+
+    _, (pending, written, stats) = run(scenario, batch_size=100, flush_interval=0.05)
+
+    assert pending == []
+    assert written == [("llm_queries", [1, 2])]
+    assert stats == {"queued": 0, "written": 2, "dropped": 0, "failed": 0}
+
+
+def test_batch_is_written_with_one_insert_per_table():
+    async def scenario(writer, database):
+        await writer.enqueue(QUERIES, {"id": 1})
+        await writer.enqueue(AUDIT, {"id": 2})
+        await writer.enqueue(QUERIES, {"id": 3})
+
+    database, _ = run(scenario, batch_size=3, flush_interval=10)
+
+    assert sorted(database.inserts) == [("audit_logs", [2]), ("llm_queries", [1, 3])]
+
+
+def test_shutdown_drains_the_queue_exactly_once():
+    async def scenario(writer, database):
+        await enqueue(writer, QUERIES, *range(1000))
+        return writer
+
+    database, writer = run(scenario, batch_size=64, flush_interval=10)
+
+    assert database.ids() == list(range(1000))
+    assert writer.stats() == {"queued": 0, "written": 1000, "dropped": 0, "failed": 0}
+
+
+def test_full_queue_drops_rows_after_the_timeout():
+    async def scenario(writer, database):
+        database.gate = asyncio.Event()
+        await writer.enqueue(QUERIES, {"id": 0})
+        await asyncio.sleep(0.01)  # The writer takes row 0 and blocks on the database
+        accepted = await enqueue(writer, QUERIES, 1, 2, 3)
+        database.gate.set()
+        return accepted, writer.stats()
+
+    database, (accepted, stats) = run(scenario, max_queue=2, batch_size=1, flush_interval=0, enqueue_timeout=0.05)
+
+    assert accepted == [True, True, False]
+    assert (stats["dropped"], stats["queued"]) == (1, 2)
+    assert database.ids() == [0, 1, 2]
+
+
+def test_waiting_producer_gets_in_once_the_writer_catches_up():
+    async def scenario(writer, database):
+        database.gate = asyncio.Event()
+        await enqueue(writer, QUERIES, 0)
+        await asyncio.sleep(0.01)
+        await enqueue(writer, QUERIES, 1, 2)
+        waiting = asyncio.create_task(writer.enqueue(QUERIES, {"id": 3}))
+        await asyncio.sleep(0.02)
+        database.gate.set()
+        return await waiting
+
+    database, accepted = run(scenario, max_queue=2, batch_size=1, flush_interval=0, enqueue_timeout=1.0)
+
+    assert accepted is True
+    assert database.ids() == [0, 1, 2, 3]
+
+
+def test_failed_insert_is_counted_and_the_writer_keeps_going():
+    async def scenario(writer, database):
+        database.error = RuntimeError("connection lost")
+        await enqueue(writer, QUERIES, 1, 2)
+        await asyncio.sleep(0.05)
+        database.error = None
+        await enqueue(writer, QUERIES, 3)
+        return writer
+
+    database, writer = run(scenario, batch_size=2, flush_interval=0.01)
+
+    assert database.ids() == [3]
+    assert (writer.failed, writer.written) == (2, 1)
+
+
+def test_rows_are_stamped_when_enqueued():
+    async def scenario(writer, database):
+        stamped, given = {"id": 1}, {"id": 2, "created_at": "2024-01-01"}
+        before = datetime.utcnow()
+        await writer.enqueue(QUERIES, stamped)
+        await writer.enqueue(QUERIES, given)
+        return before, stamped, given
+
+    _, (before, stamped, given) = run(scenario)
+
+    assert before <= stamped["created_at"] <= datetime.utcnow()
+    assert given["created_at"] == "2024-01-01"
+
+
+def test_enqueue_before_start_is_an_error():
+    with pytest.raises(RuntimeError, match="not started"):
+        asyncio.run(HistoryWriter(Database()).enqueue(QUERIES, {"id": 1}))
+
+
+def test_summarize_result_keeps_the_shape_and_a_sample():
+    records = [{"region": f"r{i}", "revenue": i} for i in range(5)]
+
+    assert summarize_result(["region", "revenue"], records, 2) == {
+        "row_count": 5,
+        "columns": ["region", "revenue"],
+        "sample": records[:2],
+        "truncated": True,
+    }
+    assert summarize_result(["region"], records[:2], 2)["truncated"] is False
+    assert summarize_result([], [], 10) == {"row_count": 0, "columns": [], "sample": [], "truncated": False}
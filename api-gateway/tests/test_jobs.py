@@ -0,0 +1,190 @@
+import asyncio
+import json
+from datetime import date
+
+from jobs import JobManager, ResultSpool, encode_page
+
+COLUMNS = ["id", "region", "amount"]
+ROWS = [[i, f"region-{i % 3}", i * 1.5] for i in range(25)]
+
+
+def fill(rows, columns=COLUMNS, batch=7):
+    async def run(spool):
+        spool.set_columns(columns)
+        for start in range(0, len(rows), batch):
+            await spool.write(rows[start:start + batch])
+        return {"sql": "SELECT ..."}
+
+    return run
+
+
+async def finished(manager, job, timeout=5.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not job.finished:
+        assert asyncio.get_running_loop().time() < deadline, "job did not finish"
+        await asyncio.sleep(0.01)
+    return job
+
+
+def run_manager(tmp_path, scenario, **options):
+    async def main():
+        manager = JobManager(str(tmp_path), **{"workers": 1, "page_rows": 10, **options})
+        manager.start()
+        try:
+            return await scenario(manager)
+        finally:
+            await manager.stop()
+
+    return asyncio.run(main())
+
+
+def test_pages_are_read_by_byte_offset(tmp_path):
+    async def scenario(manager):
+        job = await finished(manager, manager.submit("alice", "report", fill(ROWS)))
+        pages = {
+            (offset, limit): [json.loads(line) for line in await manager.read(job, offset, limit)]
+            for offset, limit in [(0, 10), (5, 10), (8, 15), (20, 10), (24, 1), (25, 10), (3, 0)]
+        }
+        return job, pages, job.path.stat().st_size
+
+    job, pages, file_size = run_manager(tmp_path, scenario)
+
+    assert job.status == "succeeded"
+    assert (job.columns, job.row_count, job.metadata) == (COLUMNS, 25, {"sql": "SELECT ..."})
+    # One offset per full page of page_rows, plus the end of the last partial page
+    assert len(job.page_offsets) == 4
+    assert job.page_offsets[-1] == file_size
+    for (offset, limit), rows in pages.items():
+        assert rows == ROWS[offset:offset + limit]
+
+
+def test_encoded_page_carries_the_next_offset(tmp_path):
+    async def scenario(manager):
+        job = await finished(manager, manager.submit("alice", "report", fill(ROWS)))
+        first = encode_page(job, 0, await manager.read(job, 0, 20))
+        last = encode_page(job, 20, await manager.read(job, 20, 20))
+        return job, json.loads(first), json.loads(last)
+
+    job, first, last = run_manager(tmp_path, scenario)
+
+    assert first == {
+        "job_id": job.id, "columns": COLUMNS, "offset": 0, "total_rows": 25, "next_offset": 20, "rows": ROWS[:20]
+    }
+    assert (last["next_offset"], last["rows"]) == (None, ROWS[20:])
+
+
+def test_spooled_values_are_json_encoded(tmp_path):
+    rows = [[1, date(2024, 1, 31), None], [2, date(2024, 2, 29), "x"]]
+
+    async def scenario(manager):
+        job = await finished(manager, manager.submit("alice", "report", fill(rows)))
+        return [json.loads(line) for line in await manager.read(job, 0, 10)]
+
+    assert run_manager(tmp_path, scenario) == [[1, "2024-01-31", None], [2, "2024-02-29", "x"]]
+
+
+def test_reset_discards_rows_from_an_earlier_attempt(tmp_path):
+    async def retried(spool):
+        spool.set_columns(COLUMNS)
+        await spool.write(ROWS[:15])
+        spool.reset()
+        await spool.write(ROWS[:12])
+
+    async def scenario(manager):
+        job = await finished(manager, manager.submit("alice", "report", retried))
+        rows = [json.loads(line) for line in await manager.read(job, 0, 100)]
+        return job, rows, job.path.stat().st_size
+
+    job, rows, file_size = run_manager(tmp_path, scenario)
+
+    assert job.row_count == 12
+    assert rows == ROWS[:12]
+    assert file_size == job.page_offsets[-1]
+
+
+def test_finished_jobs_and_their_files_expire(tmp_path):
+    async def scenario(manager):
+        job = await finished(manager, manager.submit("alice", "report", fill(ROWS)))
+        path = job.path
+        assert path.exists() and manager.get(job.id, "alice") is job
+        await asyncio.sleep(0.3)
+        return job, path
+
+    job, path = run_manager(tmp_path, scenario, ttl=0.05)
+
+    assert job.expires_at is not None
+    assert not path.exists()
+    assert job.path is None and job.size == 0
+
+
+def test_expired_job_is_no_longer_listed(tmp_path):
+    async def scenario(manager):
+        job = await finished(manager, manager.submit("alice", "report", fill(ROWS)))
+        await asyncio.sleep(0.3)
+        return manager.get(job.id, "alice"), manager.for_user("alice"), manager.stats()
+
+    job, listed, stats = run_manager(tmp_path, scenario, ttl=0.05)
+
+    assert job is None and listed == []
+    assert (stats["retained"], stats["spool_bytes"]) == (0, 0)
+
+
+def test_unexpired_jobs_are_kept(tmp_path):
+    async def scenario(manager):
+        job = await finished(manager, manager.submit("alice", "report", fill(ROWS)))
+        await asyncio.sleep(0.1)
+        return manager.get(job.id, "alice"), job.path.exists()
+
+    job, exists = run_manager(tmp_path, scenario, ttl=3600)
+
+    assert job is not None and exists
+
+
+def test_result_over_the_spool_limit_fails_and_removes_the_file(tmp_path):
+    async def scenario(manager):
+        job = await finished(manager, manager.submit("alice", "report", fill(ROWS)))
+        return job, list(tmp_path.iterdir())
+
+    job, files = run_manager(tmp_path, scenario, max_result_bytes=200)
+
+    assert job.status == "failed"
+    assert "spool limit of 200 bytes" in job.error
+    assert job.path is None and files == []
+
+
+def test_failed_job_keeps_the_error(tmp_path):
+    async def broken(spool):
+        await spool.write([[1]])
+        raise RuntimeError("relation does not exist")
+
+    async def scenario(manager):
+        job = await finished(manager, manager.submit("alice", "report", broken))
+        return job, await manager.read(job, 0, 10)
+
+    job, rows = run_manager(tmp_path, scenario)
+
+    assert (job.status, job.error, rows) == ("failed", "relation does not exist", [])
+
+
+def test_leftover_spool_files_are_removed_on_start(tmp_path):
+    leftover = tmp_path / "stale.ndjson"
+    leftover.write_bytes(b"[1]\n")
+
+    async def scenario(manager):
+        return leftover.exists()
+
+    assert run_manager(tmp_path, scenario) is False
+
+
+def test_spool_writes_whole_pages_until_closed(tmp_path):
+    async def main():
+        spool = ResultSpool(tmp_path / "job.ndjson", page_rows=10)
+        spool.set_columns(COLUMNS)
+        await spool.write(ROWS[:15])
+        buffered = spool.row_count
+        await spool.close()
+        return buffered, spool.row_count, spool.page_offsets
+
+    buffered, rows, offsets = asyncio.run(main())
+
+    assert (buffered, rows, len(offsets)) == (10, 15, 3)
@@ -0,0 +1,195 @@
+import asyncio
+from contextlib import asynccontextmanager
+
+import pytest
+from sqlalchemy.exc import DBAPIError, ProgrammingError
+
+from pools import ReadRouter, ReplicaMonitor, is_replica_failure
+
+
+class Orig(Exception):
+    def __init__(self, sqlstate):
+        super().__init__(sqlstate)
+        self.sqlstate = sqlstate
+
+
+def db_error(sqlstate, invalidated=False, cls=DBAPIError):
+    return cls("SELECT 1", {}, Orig(sqlstate), connection_invalidated=invalidated)
+
+
+class Engine:
+    """Stands in for an AsyncEngine: connect() yields a connection whose scalar()
+    returns ``lag`` or raises it, and which counts the connections made"""
+
+    def __init__(self, name, lag=0.0):
+        self.name = name
+        self.lag = lag
+        self.connections = 0
+
+    @asynccontextmanager
+    async def connect(self):
+        self.connections += 1
+        if isinstance(self.lag, BaseException):
+            raise self.lag
+        yield self
+
+    async def scalar(self, statement):
+        return self.lag
+
+
+def check(monitor):
+    return asyncio.run(monitor.check())
+
+
+def test_replica_within_the_lag_limit_serves_reads():
+    replica = Engine("replica", lag=1.5)
+    monitor = ReplicaMonitor(replica, max_lag=5.0)
+    router = ReadRouter(Engine("primary"), replica, monitor)
+
+    assert check(monitor) is True
+    assert router.engine() is replica
+    assert monitor.stats() == {"healthy": 1, "lag_seconds": 1.5, "max_lag_seconds": 5.0, "failures": 0}
+
+
+def test_lagging_replica_falls_back_to_the_primary():
+    primary, replica = Engine("primary"), Engine("replica", lag=12.0)
+    monitor = ReplicaMonitor(replica, max_lag=5.0)
+    router = ReadRouter(primary, replica, monitor)
+
+    assert check(monitor) is False
+    assert router.engine() is primary
+    assert router.stats() == {"replica_reads": 0, "primary_reads": 1, "fallbacks": 0}
+
+
+def test_unknown_lag_is_not_trusted():
+    monitor = ReplicaMonitor(Engine("replica", lag=None))
+
+    assert check(monitor) is False
+    assert monitor.stats()["lag_seconds"] == -1
+
+
+def test_failing_probe_disables_the_replica():
+    replica = Engine("replica", lag=0.0)
+    monitor = ReplicaMonitor(replica)
+    router = ReadRouter(Engine("primary"), replica, monitor)
+    assert check(monitor) is True
+
+    replica.lag = ConnectionRefusedError("replica is down")
+
+    assert check(monitor) is False
+    assert router.engine() is router.primary
+    assert monitor.failures == 1
+
+
+def test_slow_probe_times_out_and_disables_the_replica():
+    class SlowEngine(Engine):
+        async def scalar(self, statement):
+            await asyncio.sleep(1)
+
+    monitor = ReplicaMonitor(SlowEngine("replica"), timeout=0.01)
+    monitor.healthy = True
+
+    assert check(monitor) is False
+    assert monitor.failures == 1
+
+
+def test_replica_is_used_again_once_it_recovers():
+    replica = Engine("replica", lag=30.0)
+    monitor = ReplicaMonitor(replica, max_lag=5.0)
+    router = ReadRouter(Engine("primary"), replica, monitor)
+    check(monitor)
+    assert router.engine() is router.primary
+
+    replica.lag = 0.2
+    assert check(monitor) is True
+    assert router.engine() is replica
+
+
+def test_replica_connection_failure_mid_query_retries_on_the_primary():
+    primary, replica = Engine("primary"), Engine("replica")
+    monitor = ReplicaMonitor(replica)
+    monitor.healthy = True
+    router = ReadRouter(primary, replica, monitor)
+    engines = []
+
+    async def query(engine):
+        engines.append(engine.name)
+        if engine is replica:
+            raise db_error("57P01")  # admin_shutdown
+        return "rows"
+
+    assert asyncio.run(router.run(query)) == "rows"
+    assert engines == ["replica", "primary"]
+    assert monitor.healthy is False
+    assert router.stats() == {"replica_reads": 1, "primary_reads": 1, "fallbacks": 1}
+    # Until the next successful check every read goes to the primary
+    assert router.engine() is primary
+
+
+def test_statement_errors_on_the_replica_are_not_retried():
+    primary, replica = Engine("primary"), Engine("replica")
+    monitor = ReplicaMonitor(replica)
+    monitor.healthy = True
+    router = ReadRouter(primary, replica, monitor)
+
+    async def query(engine):
+        raise db_error("42P01", cls=ProgrammingError)  # undefined_table
+
+    with pytest.raises(ProgrammingError):
+        asyncio.run(router.run(query))
+    assert monitor.healthy is True
+    assert router.fallbacks == 0
+
+
+def test_primary_errors_are_raised():
+    router = ReadRouter(Engine("primary"))
+
+    async def query(engine):
+        raise db_error("08006")
+
+    with pytest.raises(DBAPIError):
+        asyncio.run(router.run(query))
+
+
+def test_without_a_replica_every_read_goes_to_the_primary():
+    primary = Engine("primary")
+
+    for router in (ReadRouter(primary), ReadRouter(primary, Engine("replica"), None)):
+        assert router.replica is None
+        assert asyncio.run(router.run(lambda engine: asyncio.sleep(0, engine.name))) == "primary"
+        assert router.stats() == {"replica_reads": 0, "primary_reads": 1, "fallbacks": 0}
+
+
+@pytest.mark.parametrize("error, expected", [
+    (db_error("08006"), True),
+    (db_error("57P01"), True),
+    (db_error("40001"), True),
+    (db_error(None), True),
+    (db_error("42P01", invalidated=True), True),
+    (db_error("42P01"), False),
+    (db_error("22012"), False),
+    (ConnectionResetError(), True),
+    (asyncio.TimeoutError(), True),
+    (ValueError("bad"), False),
+])
+def test_replica_failures_are_told_apart_from_statement_errors(error, expected):
+    assert is_replica_failure(error) is expected
+
+
+def test_monitor_polls_until_stopped():
+    replica = Engine("replica", lag=0.0)
+    monitor = ReplicaMonitor(replica, interval=0.01)
+
+    async def scenario():
+        monitor.start()
+        await asyncio.sleep(0.05)
+        await monitor.stop()
+        polled = replica.connections
+        await asyncio.sleep(0.03)
+        return polled
+
+    polled = asyncio.run(scenario())
+
+    assert polled >= 2
+    assert replica.connections == polled
+    assert monitor.healthy is True
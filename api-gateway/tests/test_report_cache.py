@@ -0,0 +1,106 @@
+import asyncio
+from datetime import datetime, timedelta
+
+from report_cache import ReportResultCache
+
+SQL = "SELECT region, SUM(total_amount) FROM sales_data GROUP BY region"
+V1 = datetime(2024, 1, 1, 12, 0)
+V2 = V1 + timedelta(hours=1)
+
+
+def make_cache() -> ReportResultCache:
+    return ReportResultCache(max_bytes=1 << 20, max_entries=100, default_ttl=60)
+
+
+def loader(value, delay: float = 0.0):
+    async def load():
+        await asyncio.sleep(delay)
+        return ["value"], [(value,)]
+    return load
+
+
+def test_hit_after_miss():
+    cache = make_cache()
+    key = cache.make_key(1, SQL, V1)
+
+    async def scenario():
+        first = await cache.get_or_load(key, None, loader("a"))
+        second = await cache.get_or_load(key, None, loader("b"))
+        return first, second
+
+    (first, first_hit), (second, second_hit) = asyncio.run(scenario())
+    assert (first_hit, second_hit) == (False, True)
+    assert second.rows == [("a",)]
+
+
+def test_concurrent_misses_share_one_load():
+    cache = make_cache()
+    key = cache.make_key(1, SQL, V1)
+    calls = []
+
+    async def load():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return ["value"], [("a",)]
+
+    async def scenario():
+        return await asyncio.gather(*(cache.get_or_load(key, None, load) for _ in range(5)))
+
+    results = asyncio.run(scenario())
+    assert len(calls) == 1
+    assert all(entry.rows == [("a",)] for entry, _ in results)
+    assert cache.coalesced == 4
+
+
+def test_newer_version_evicts_older_entries():
+    cache = make_cache()
+    old, new = cache.make_key(1, SQL, V1), cache.make_key(1, SQL + " ", V2)
+
+    async def scenario():
+        await cache.get_or_load(old, None, loader("old"))
+        await cache.get_or_load(new, None, loader("new"))
+
+    asyncio.run(scenario())
+    assert list(cache._entries) == [new]
+
+
+def test_slow_load_of_older_version_does_not_evict_newer_entry():
+    cache = make_cache()
+    old, new = cache.make_key(1, SQL, V1), cache.make_key(1, SQL + " ", V2)
+
+    async def scenario():
+        slow = asyncio.ensure_future(cache.get_or_load(old, None, loader("old", delay=0.05)))
+        await cache.get_or_load(new, None, loader("new"))
+        entry, hit = await slow
+        return entry
+
+    entry = asyncio.run(scenario())
+    # The late caller still gets its rows, but only the newer version stays cached
+    assert entry.rows == [("old",)]
+    assert list(cache._entries) == [new]
+
+
+def test_other_parameter_values_of_the_same_version_are_kept():
+    cache = make_cache()
+    europe = cache.make_key(1, SQL, V1, (("region", "Europe"),))
+    asia = cache.make_key(1, SQL, V1, (("region", "Asia"),))
+
+    async def scenario():
+        await cache.get_or_load(europe, None, loader("europe"))
+        await cache.get_or_load(asia, None, loader("asia"))
+
+    asyncio.run(scenario())
+    assert set(cache._entries) == {europe, asia}
+
+
+def test_invalidate_drops_every_entry_of_a_report():
+    cache = make_cache()
+
+    async def scenario():
+        await cache.get_or_load(cache.make_key(1, SQL, V1), None, loader("a"))
+        await cache.get_or_load(cache.make_key(2, SQL, V1), None, loader("b"))
+
+    asyncio.run(scenario())
+    cache.invalidate(1)
+    assert [key[0] for key in cache._entries] == [2]
+    assert cache.stats()["bytes"] == cache._entries[cache.make_key(2, SQL, V1)].size
@@ -0,0 +1,177 @@
+from datetime import date, datetime, timezone
+from decimal import Decimal
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy.dialects import postgresql
+
+from main import bind_request_parameters
+from report_params import (
+    ParameterError,
+    bind_parameters,
+    cache_token,
+    declare,
+    report_parameters,
+    report_statement,
+)
+
+CHART_CONFIG = {
+    "parameters": [
+        {"name": "start_date", "type": "date", "required": True},
+        {"name": "region", "type": "string", "choices": ["Europe", "Asia"]},
+        {"name": "top_n", "type": "integer", "default": 10, "min": 1, "max": 100},
+    ]
+}
+
+
+@pytest.mark.parametrize("kind, value, expected", [
+    ("string", 42, "42"),
+    ("integer", "7", 7),
+    ("integer", 7.0, 7),
+    ("number", "12.50", Decimal("12.50")),
+    ("number", 3, Decimal(3)),
+    ("date", "2024-02-29", date(2024, 2, 29)),
+    ("date", datetime(2024, 2, 29, 13, 30), date(2024, 2, 29)),
+    ("timestamp", "2024-02-29T13:30:00+00:00", datetime(2024, 2, 29, 13, 30, tzinfo=timezone.utc)),
+    ("boolean", "yes", True),
+    ("boolean", "OFF", False),
+    ("boolean", False, False),
+])
+def test_values_are_coerced_to_the_declared_type(kind, value, expected):
+    parameter = declare({"name": "p", "type": kind})
+
+    coerced = parameter.coerce(value)
+
+    assert coerced == expected and type(coerced) is type(expected)
+
+
+@pytest.mark.parametrize("kind, value", [
+    ("integer", "7.5"),
+    ("integer", 7.5),
+    ("integer", True),
+    ("number", "NaN"),
+    ("number", "Infinity"),
+    ("number", "ten"),
+    ("number", False),
+    ("date", "2024-02-30"),
+    ("timestamp", "yesterday"),
+    ("boolean", "maybe"),
+])
+def test_values_of_the_wrong_type_are_rejected(kind, value):
+    with pytest.raises(ParameterError, match=f"Parameter p must be a {kind}"):
+        declare({"name": "p", "type": kind}).coerce(value)
+
+
+def test_choices_min_and_max_are_enforced():
+    parameters = report_parameters(CHART_CONFIG)
+
+    with pytest.raises(ParameterError, match="must be one of: Europe, Asia"):
+        bind_parameters(parameters, {"start_date": "2024-01-01", "region": "Mars"})
+    with pytest.raises(ParameterError, match="must be at least 1"):
+        bind_parameters(parameters, {"start_date": "2024-01-01", "top_n": "0"})
+    with pytest.raises(ParameterError, match="must be at most 100"):
+        bind_parameters(parameters, {"start_date": "2024-01-01", "top_n": "101"})
+
+
+def test_bounds_are_compared_in_the_declared_type():
+    parameter = declare({"name": "since", "type": "date", "min": "2024-01-01"})
+
+    assert parameter.min == date(2024, 1, 1)
+    with pytest.raises(ParameterError, match="must be at least 2024-01-01"):
+        parameter.coerce("2023-12-31")
+
+
+def test_defaults_and_nulls_fill_in_missing_values():
+    parameters = report_parameters(CHART_CONFIG)
+
+    bound = bind_parameters(parameters, {"start_date": "2024-01-01", "region": ""})
+
+    assert bound == {"start_date": date(2024, 1, 1), "region": None, "top_n": 10}
+    assert cache_token(bound) == (("region", None), ("start_date", date(2024, 1, 1)), ("top_n", 10))
+
+
+def test_required_parameter_must_be_supplied():
+    with pytest.raises(ParameterError, match="Parameter start_date is required"):
+        bind_parameters(report_parameters(CHART_CONFIG), {"region": "Asia"})
+
+
+def test_required_parameter_with_a_default_may_be_omitted():
+    parameters = report_parameters({"parameters": [{"name": "n", "type": "integer", "required": True, "default": 5}]})
+
+    assert bind_parameters(parameters, {}) == {"n": 5}
+
+
+def test_unknown_parameters_are_rejected():
+    with pytest.raises(ParameterError, match="Unknown report parameters: city, country"):
+        bind_parameters(report_parameters(CHART_CONFIG), {"start_date": "2024-01-01", "country": "x", "city": "y"})
+
+
+@pytest.mark.parametrize("specs, message", [
+    ([{"name": "1st", "type": "string"}], "Invalid report parameter name"),
+    ([{"name": "format", "type": "string"}], "Invalid report parameter name"),
+    ([{"name": "n", "type": "float"}], "unknown type 'float'"),
+    ([{"name": "n", "type": "integer", "default": 500, "max": 100}], "must be at most 100"),
+    ([{"name": "n", "type": "integer"}, {"name": "n", "type": "string"}], "distinct names"),
+])
+def test_malformed_declarations_are_rejected(specs, message):
+    with pytest.raises(ValueError, match=message):
+        report_parameters({"parameters": specs})
+
+
+def test_reports_without_parameters_declare_none():
+    assert report_parameters(None) == ()
+    assert report_parameters({"type": "bar"}) == ()
+
+
+def test_statement_binds_declared_types():
+    parameters = report_parameters(CHART_CONFIG)
+    sql = "SELECT * FROM sales_data WHERE sale_date >= :start_date AND (:region IS NULL OR region = :region)"
+
+    statement = report_statement(sql, parameters)
+
+    assert statement._bindparams["start_date"].type.__class__.__name__ == "Date"
+    assert statement._bindparams["region"].type.__class__.__name__ == "String"
+    assert "::DATE" in str(statement.compile(dialect=postgresql.asyncpg.dialect()))
+    assert report_statement(sql, parameters) is statement
+
+
+def test_statement_rejects_undeclared_binds():
+    with pytest.raises(ValueError, match="undeclared parameters: end_date"):
+        report_statement("SELECT * FROM sales_data WHERE sale_date BETWEEN :start_date AND :end_date",
+                         report_parameters(CHART_CONFIG))
+
+
+def test_casts_are_not_mistaken_for_binds():
+    assert report_statement("SELECT sale_date::text FROM sales_data")._bindparams == {}
+
+
+def report(chart_config):
+    return SimpleNamespace(id="report-1", chart_config=chart_config)
+
+
+def test_request_binding_returns_declared_parameters_and_values():
+    parameters, bound = bind_request_parameters(report(CHART_CONFIG), {"start_date": "2024-01-01", "top_n": "3"})
+
+    assert [parameter.name for parameter in parameters] == ["start_date", "region", "top_n"]
+    assert bound == {"start_date": date(2024, 1, 1), "region": None, "top_n": 3}
+
+
+@pytest.mark.parametrize("supplied, detail", [
+    ({"start_date": "soon"}, "Parameter start_date must be a date"),
+    ({}, "Parameter start_date is required"),
+    ({"start_date": "2024-01-01", "limit": "5"}, "Unknown report parameters: limit"),
+])
+def test_invalid_values_are_a_client_error(supplied, detail):
+    with pytest.raises(HTTPException) as raised:
+        bind_request_parameters(report(CHART_CONFIG), supplied)
+
+    assert (raised.value.status_code, raised.value.detail) == (400, detail)
+
+
+def test_malformed_declaration_is_a_server_error():
+    with pytest.raises(HTTPException) as raised:
+        bind_request_parameters(report({"parameters": [{"name": "n", "type": "float"}]}), {"n": "1"})
+
+    assert raised.value.status_code == 500
+    assert raised.value.detail.startswith("Invalid report parameters: Report parameter n has unknown type")
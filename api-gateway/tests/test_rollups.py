@@ -0,0 +1,168 @@
+import os
+import re
+from datetime import datetime, timezone
+
+import pytest
+
+from rollups import SALES_DAILY_ROLLUP, RollupRouter, rewrite
+
+WATERMARK = datetime(2024, 6, 1, tzinfo=timezone.utc)
+
+ROUTED = [
+    "SELECT region, SUM(total_amount) AS revenue FROM sales_data GROUP BY region ORDER BY revenue DESC",
+    "SELECT category, COUNT(*) AS orders, AVG(unit_price) AS avg_price FROM sales_data GROUP BY category",
+    "SELECT DATE_TRUNC('month', sale_date) AS month, SUM(quantity) AS units FROM sales_data"
+    " WHERE sale_date >= CURRENT_DATE - INTERVAL '12 months' GROUP BY 1 ORDER BY 1",
+    "SELECT s.region, SUM(s.total_amount) AS revenue FROM sales_data s WHERE s.category = 'Software'"
+    " GROUP BY s.region",
+    "SELECT product_name, SUM(total_amount) AS revenue FROM sales_data WHERE region = :region"
+    " AND sale_date BETWEEN :start_date AND :end_date GROUP BY product_name ORDER BY revenue DESC LIMIT 10",
+    "SELECT DISTINCT region FROM sales_data",
+]
+
+NOT_ROUTED = {
+    "raw-only column": "SELECT sales_rep, SUM(total_amount) FROM sales_data GROUP BY sales_rep",
+    "raw-only filter": "SELECT region, SUM(total_amount) FROM sales_data WHERE customer_id = 7 GROUP BY region",
+    "raw rows": "SELECT region, total_amount FROM sales_data",
+    "no aggregation": "SELECT region FROM sales_data WHERE category = 'Software'",
+    "join": "SELECT s.region, SUM(s.total_amount) FROM sales_data s JOIN customers c ON c.id = s.customer_id"
+            " GROUP BY s.region",
+    "subquery": "SELECT region, SUM(total_amount) FROM sales_data WHERE region IN (SELECT region FROM regions)"
+                " GROUP BY region",
+    "other table": "SELECT region, SUM(amount) FROM orders GROUP BY region",
+    "window": "SELECT region, SUM(total_amount) OVER (PARTITION BY region) FROM sales_data GROUP BY region",
+    "unsupported aggregate": "SELECT region, MAX(total_amount) FROM sales_data GROUP BY region",
+    "quoted identifier": 'SELECT "region", SUM(total_amount) FROM sales_data GROUP BY "region"',
+    "second statement": "SELECT region, COUNT(*) FROM sales_data GROUP BY region; SELECT 1",
+    # WHERE reads the raw column, which the rollup does not have
+    "alias shadowing a raw-only column": "SELECT region, SUM(total_amount) AS sales_rep FROM sales_data"
+                                         " WHERE sales_rep = 'Jane' GROUP BY region",
+    "alias shadowing an id": "SELECT region, COUNT(*) AS customer_id FROM sales_data WHERE customer_id > 10"
+                             " GROUP BY region",
+    # WHERE reads raw values, which the rollup only holds summed
+    "alias shadowing a measure": "SELECT region, SUM(quantity) AS total_amount FROM sales_data"
+                                 " WHERE total_amount > 100 GROUP BY region",
+}
+
+
+@pytest.mark.parametrize("sql", ROUTED)
+def test_routes_queries_the_rollup_answers(sql):
+    routed = rewrite(sql, SALES_DAILY_ROLLUP, WATERMARK)
+
+    assert routed is not None
+    assert "sales_daily_rollup" in routed
+    assert "'2024-06-01T00:00:00+00:00'::timestamptz" in routed
+
+
+@pytest.mark.parametrize("sql", NOT_ROUTED.values(), ids=NOT_ROUTED.keys())
+def test_leaves_other_queries_alone(sql):
+    assert rewrite(sql, SALES_DAILY_ROLLUP, WATERMARK) is None
+
+
+def test_aliased_relation_keeps_the_alias():
+    routed = rewrite("SELECT s.region, COUNT(*) FROM sales_data s GROUP BY s.region", SALES_DAILY_ROLLUP)
+
+    assert routed.startswith("SELECT s.region, SUM(row_count)::bigint FROM (SELECT ")
+    assert routed.endswith(") s GROUP BY s.region")
+
+
+def test_aggregates_are_replaced_with_rollup_equivalents():
+    routed = rewrite(
+        "SELECT region, SUM(total_amount), AVG(quantity), COUNT(1) FROM sales_data GROUP BY region",
+        SALES_DAILY_ROLLUP,
+    )
+
+    assert routed.startswith(
+        "SELECT region, SUM(total_amount), (SUM(quantity)::numeric / NULLIF(SUM(row_count), 0)),"
+        " SUM(row_count)::bigint FROM "
+    )
+    assert routed.endswith(" AS sales_data GROUP BY region")
+
+
+def test_bind_parameters_are_left_in_place():
+    routed = rewrite(ROUTED[4], SALES_DAILY_ROLLUP)
+
+    assert ":region" in routed and ":start_date" in routed and ":end_date" in routed
+
+
+def test_router_passes_through_until_a_watermark_is_known():
+    router = RollupRouter([SALES_DAILY_ROLLUP])
+    sql = ROUTED[0]
+
+    assert router.route(sql) == (sql, None)
+
+    router.set_watermark("sales_daily_rollup", WATERMARK)
+    routed, rollup = router.route(sql)
+    assert rollup == "sales_daily_rollup"
+    assert routed == rewrite(sql, SALES_DAILY_ROLLUP, WATERMARK)
+    assert router.route(NOT_ROUTED["join"]) == (NOT_ROUTED["join"], None)
+    assert (router.routed, router.passed) == (1, 1)
+
+
+def test_router_rewrites_again_when_the_watermark_moves():
+    router = RollupRouter([SALES_DAILY_ROLLUP])
+    router.set_watermark("sales_daily_rollup", WATERMARK)
+    before, _ = router.route(ROUTED[0])
+
+    later = datetime(2024, 7, 1, tzinfo=timezone.utc)
+    router.set_watermark("sales_daily_rollup", later)
+    after, _ = router.route(ROUTED[0])
+
+    assert before != after
+    assert after == rewrite(ROUTED[0], SALES_DAILY_ROLLUP, later)
+
+
+def test_disabled_router_never_routes():
+    router = RollupRouter([SALES_DAILY_ROLLUP], enabled=False)
+    router.set_watermark("sales_daily_rollup", WATERMARK)
+
+    assert router.route(ROUTED[0]) == (ROUTED[0], None)
+
+
+# Results against a real database: set TEST_DATABASE_URL to a database
+# initialised from database/init (it is left unchanged)
+DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+BIND_RE = re.compile(r"(?<!:):([A-Za-z_][A-Za-z0-9_]*)")
+PARAMS = {"region": "North America", "start_date": "2020-01-01", "end_date": "2030-12-31"}
+
+
+def normalize(rows):
+    return sorted(
+        tuple(round(float(value), 6) if isinstance(value, (int, float)) or hasattr(value, "as_tuple")
+              else value for value in row)
+        for row in rows
+    )
+
+
+@pytest.fixture
+def cursor():
+    if not DATABASE_URL:
+        pytest.skip("TEST_DATABASE_URL is not set")
+    psycopg2 = pytest.importorskip("psycopg2")
+    conn = psycopg2.connect(DATABASE_URL)
+    try:
+        cur = conn.cursor()
+        cur.execute("SELECT refresh_sales_daily_rollup()")
+        # Sales recorded after the refresh are read from the raw table
+        cur.execute(
+            "INSERT INTO sales_data (sale_date, product_name, category, region, sales_rep, quantity,"
+            " unit_price, total_amount, customer_id, created_at)"
+            " SELECT sale_date, product_name, category, region, sales_rep, quantity, unit_price, total_amount,"
+            " customer_id, clock_timestamp() FROM sales_data ORDER BY id LIMIT 50"
+        )
+        yield cur
+    finally:
+        conn.rollback()
+        conn.close()
+
+
+@pytest.mark.parametrize("sql", ROUTED)
+def test_routed_query_returns_the_raw_result(cursor, sql):
+    cursor.execute("SELECT high_watermark FROM rollup_watermarks WHERE rollup_name = 'sales_daily_rollup'")
+    routed = rewrite(sql, SALES_DAILY_ROLLUP, cursor.fetchone()[0])
+
+    cursor.execute(BIND_RE.sub(r"%(\1)s", sql), PARAMS)
+    raw = cursor.fetchall()
+    cursor.execute(BIND_RE.sub(r"%(\1)s", routed), PARAMS)
+
+    assert normalize(cursor.fetchall()) == normalize(raw)
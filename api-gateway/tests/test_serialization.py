@@ -0,0 +1,108 @@
+"""The orjson serializer must produce the same JSON as the old jsonable_encoder path"""
+import json
+import uuid
+from datetime import date, datetime, time, timedelta, timezone
+from decimal import Decimal
+
+import orjson
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from serialization import (
+    JSONBytesResponse, convert_rows, encode_json, encode_ndjson, encode_row_lines, to_columnar, to_jsonable, to_records
+)
+
+COLUMNS = [
+    "id", "customer_id", "name", "quantity", "unit_price", "total_amount", "discount",
+    "sale_date", "created_at", "updated_at", "opening_time", "duration", "active", "attributes",
+]
+ROWS = [
+    (
+        1, uuid.UUID("6f1c2c55-2f4e-4a53-9b0a-0f6b7d1d8a11"), "Widget Pro", 3, Decimal("19.99"), Decimal("59.97"),
+        0.15, date(2024, 3, 31), datetime(2024, 3, 31, 23, 59, 59, 123456),
+        datetime(2024, 4, 1, 8, 30, tzinfo=timezone.utc), time(9, 0), timedelta(days=1, seconds=30), True,
+        {"tier": "gold", "tags": ["b2b", "emea"]},
+    ),
+    (
+        2, None, "Café ünïcode — “quoted”", 0, Decimal("0"), Decimal("-12.5"),
+        None, None, datetime(2023, 12, 31), None, None, None, False, None,
+    ),
+    (
+        3, uuid.UUID("00000000-0000-0000-0000-000000000003"), None, -7, Decimal("1E+3"), None,
+        1e-7, date(1999, 1, 1), None, datetime(2024, 6, 1, tzinfo=timezone(timedelta(hours=-5))),
+        time(23, 59, 59, 999999), timedelta(microseconds=1), None, [],
+    ),
+]
+
+
+def legacy_records(columns, rows):
+    """The per-cell loop the report and LLM endpoints used before serialization.py"""
+    data = []
+    for row in rows:
+        row_dict = {}
+        for i, col in enumerate(columns):
+            value = row[i]
+            if isinstance(value, datetime):
+                value = value.isoformat()
+            elif isinstance(value, uuid.UUID):
+                value = str(value)
+            row_dict[col] = value
+        data.append(row_dict)
+    return data
+
+
+def legacy_body(content) -> bytes:
+    """What FastAPI sent for a returned dict: jsonable_encoder, then JSONResponse"""
+    return JSONResponse(jsonable_encoder(content)).body
+
+
+def test_records_match_the_legacy_response():
+    legacy = {"success": True, "data": legacy_records(COLUMNS, ROWS), "report_name": "Sales"}
+    current = {"success": True, "data": to_records(COLUMNS, ROWS), "report_name": "Sales"}
+    assert orjson.loads(encode_json(current)) == json.loads(legacy_body(legacy))
+
+
+def test_response_class_matches_the_legacy_response():
+    content = {"data": to_records(COLUMNS, ROWS), "generated_at": datetime(2024, 1, 1, 12, 0)}
+    legacy = {"data": legacy_records(COLUMNS, ROWS), "generated_at": datetime(2024, 1, 1, 12, 0)}
+    assert json.loads(JSONBytesResponse(content).body) == json.loads(legacy_body(legacy))
+
+
+def test_columnar_matches_legacy_records_column_by_column():
+    columnar = orjson.loads(encode_json(to_columnar(COLUMNS, ROWS)))
+    legacy = json.loads(legacy_body(legacy_records(COLUMNS, ROWS)))
+    assert columnar["columns"] == COLUMNS
+    for i, column in enumerate(COLUMNS):
+        assert columnar["data"][i] == [record[column] for record in legacy]
+
+
+def test_ndjson_lines_match_legacy_records():
+    lines = encode_ndjson(COLUMNS, ROWS).splitlines()
+    assert [orjson.loads(line) for line in lines] == json.loads(legacy_body(legacy_records(COLUMNS, ROWS)))
+
+
+def test_row_lines_match_legacy_values_in_column_order():
+    lines = encode_row_lines(ROWS, len(COLUMNS)).splitlines()
+    legacy = json.loads(legacy_body(legacy_records(COLUMNS, ROWS)))
+    assert [orjson.loads(line) for line in lines] == [[record[c] for c in COLUMNS] for record in legacy]
+
+
+def test_to_jsonable_matches_jsonable_encoder_per_value():
+    for row in ROWS:
+        for value in row:
+            if isinstance(value, (dict, list)):
+                continue
+            assert to_jsonable(value) == jsonable_encoder(value)
+
+
+def test_mixed_type_column_falls_back_per_value():
+    rows = [(1,), (Decimal("2.5"),), ("three",), (None,)]
+    assert orjson.loads(encode_json(to_records(["value"], rows))) == [
+        {"value": 1}, {"value": 2.5}, {"value": "three"}, {"value": None},
+    ]
+
+
+def test_rows_without_converted_columns_are_not_copied():
+    rows = [(1, "a"), (2, "b")]
+    assert convert_rows(rows, 2) is rows
+    assert convert_rows([(Decimal("1.5"), "a")], 2) == [[1.5, "a"]]
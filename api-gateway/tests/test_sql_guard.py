@@ -0,0 +1,131 @@
+import asyncio
+import re
+from contextlib import asynccontextmanager
+
+import pytest
+
+from pools import ReadRouter
+from sql_guard import QueryRejected, SQLGuard, apply_row_limit
+
+LIMIT_RE = re.compile(r"LIMIT (\d+)\s*$")
+
+
+class Result:
+    def __init__(self, value=None, columns=(), rows=()):
+        self.value, self.columns, self.rows = value, list(columns), list(rows)
+
+    def scalar(self):
+        return self.value
+
+    def keys(self):
+        return self.columns
+
+    def fetchall(self):
+        return self.rows
+
+
+class PlannerConnection:
+    """Stands in for a connection: EXPLAIN cost is proportional to the LIMIT, unless
+    the query aggregates, in which case every row is read whatever the LIMIT"""
+
+    def __init__(self, executed):
+        self.executed = executed
+
+    @asynccontextmanager
+    async def begin(self):
+        yield
+
+    async def exec_driver_sql(self, sql, parameters=None):
+        if sql.startswith("EXPLAIN"):
+            limit = int(LIMIT_RE.search(sql).group(1))
+            cost = 5_000_000.0 if "GROUP BY" in sql else limit * 10.0
+            return Result([{"Plan": {"Node Type": "Limit", "Startup Cost": 0.0, "Total Cost": cost, "Plan Rows": limit}}])
+        self.executed.append(sql)
+        return Result(columns=["id"], rows=[(1,)])
+
+
+class PlannerEngine:
+    def __init__(self):
+        self.executed = []
+
+    @asynccontextmanager
+    async def connect(self):
+        yield PlannerConnection(self.executed)
+
+
+def make_guard(downgrade_rows: int):
+    engine = PlannerEngine()
+    guard = SQLGuard(
+        ReadRouter(engine), max_cost=50_000, max_rows=10_000, statement_timeout_ms=1000, downgrade_rows=downgrade_rows
+    )
+    return guard, engine
+
+
+def test_apply_row_limit_appends_a_limit():
+    assert apply_row_limit("SELECT * FROM sales_data;", 100) == ("SELECT * FROM sales_data\nLIMIT 100", True)
+
+
+def test_apply_row_limit_keeps_a_smaller_limit():
+    assert apply_row_limit("SELECT * FROM sales_data LIMIT 10", 100) == ("SELECT * FROM sales_data LIMIT 10", False)
+
+
+def test_apply_row_limit_wraps_a_larger_limit():
+    sql, changed = apply_row_limit("SELECT * FROM sales_data LIMIT ALL", 100)
+    assert changed and sql.endswith(") AS limited_query\nLIMIT 100")
+
+
+@pytest.mark.parametrize("sql", [
+    "SELECT * FROM sales_data FETCH FIRST 5 ROWS ONLY",
+    "SELECT * FROM sales_data ORDER BY id OFFSET 10 ROWS FETCH NEXT 100 ROWS ONLY",
+    "SELECT * FROM sales_data fetch first row only",
+])
+def test_apply_row_limit_keeps_a_smaller_fetch_first(sql):
+    assert apply_row_limit(sql, 100) == (sql, False)
+
+
+@pytest.mark.parametrize("sql", [
+    "SELECT * FROM sales_data FETCH FIRST 500 ROWS ONLY",
+    "SELECT * FROM sales_data ORDER BY region FETCH FIRST 5 ROWS WITH TIES",
+    "SELECT * FROM sales_data ORDER BY id OFFSET 10 ROWS",
+    "SELECT * FROM sales_data ORDER BY id LIMIT 10 OFFSET 5 ROWS",
+])
+def test_apply_row_limit_wraps_other_row_limiting_clauses(sql):
+    assert apply_row_limit(sql, 100) == (f"SELECT * FROM (\n{sql}\n) AS limited_query\nLIMIT 100", True)
+
+
+def test_query_within_the_cost_limit_runs_with_the_normal_row_cap():
+    guard, engine = make_guard(downgrade_rows=100)
+    result = asyncio.run(guard.execute("SELECT id FROM sales_data LIMIT 1000"))
+    assert result.plan["row_limit"] is None
+    assert "downgraded_from_cost" not in result.plan
+    assert engine.executed == [
+        "SET TRANSACTION READ ONLY",
+        "SELECT set_config('statement_timeout', $1, true)",
+        "SELECT id FROM sales_data LIMIT 1000",
+    ]
+
+
+def test_expensive_query_is_downgraded_to_the_smaller_row_cap():
+    guard, engine = make_guard(downgrade_rows=100)
+    result = asyncio.run(guard.execute("SELECT id FROM sales_data"))
+    assert result.plan["row_limit"] == 100
+    assert result.plan["downgraded_from_cost"] == 100_000.0
+    assert result.plan["total_cost"] == 1000.0
+    assert engine.executed[2:] == ["SELECT id FROM sales_data\nLIMIT 100"]
+
+
+def test_query_still_over_the_limit_after_downgrade_is_rejected():
+    guard, engine = make_guard(downgrade_rows=100)
+    with pytest.raises(QueryRejected) as rejected:
+        asyncio.run(guard.execute("SELECT region, SUM(total_amount) FROM sales_data GROUP BY region"))
+    assert rejected.value.plan["row_limit"] == 100
+    assert rejected.value.plan["downgraded_from_cost"] == 5_000_000.0
+    assert engine.executed[2:] == []
+
+
+def test_downgrade_disabled_rejects_at_once():
+    guard, engine = make_guard(downgrade_rows=0)
+    with pytest.raises(QueryRejected, match="exceeds the limit of 50000") as rejected:
+        asyncio.run(guard.execute("SELECT id FROM sales_data"))
+    assert "downgraded_from_cost" not in rejected.value.plan
+    assert engine.executed[2:] == []
@@ -0,0 +1,186 @@
+import asyncio
+
+import httpx
+import pytest
+
+from upstream import CircuitBreaker, CircuitOpenError, Upstream
+
+
+class Service:
+    """MockTransport handler answering with queued outcomes: a status code, an exception, or an
+    asyncio.Event to wait for before answering 200"""
+
+    def __init__(self, *outcomes):
+        self.outcomes = list(outcomes)
+        self.requests = []
+
+    async def __call__(self, request):
+        self.requests.append(request)
+        outcome = self.outcomes.pop(0) if self.outcomes else 200
+        if isinstance(outcome, asyncio.Event):
+            await outcome.wait()
+            outcome = 200
+        if isinstance(outcome, Exception):
+            raise outcome
+        return httpx.Response(outcome, json={"status": outcome})
+
+
+def upstream(service, **options):
+    client = Upstream("llm-service", "http://llm", **{"failure_threshold": 3, "reset_timeout": 30.0, **options})
+    client.start()
+    client._client = httpx.AsyncClient(base_url=client.base_url, transport=httpx.MockTransport(service))
+    return client
+
+
+def expire(breaker):
+    """Move the breaker past its reset timeout"""
+    breaker._opened_at -= breaker.reset_timeout
+
+
+async def outcome(client, path="/generate-sql"):
+    try:
+        return (await client.post(path)).status_code
+    except Exception as e:
+        return type(e).__name__
+
+
+def test_circuit_opens_at_the_failure_threshold():
+    service = Service(500, 502, 503)
+    client = upstream(service)
+
+    async def scenario():
+        results = [await outcome(client) for _ in range(4)]
+        await client.aclose()
+        return results
+
+    assert asyncio.run(scenario()) == [500, 502, 503, "CircuitOpenError"]
+    assert len(service.requests) == 3
+    assert client.stats() == {"circuit": "open", "consecutive_failures": 3}
+    assert 0 < client.breaker.retry_after() <= 30.0
+
+
+def test_open_circuit_reports_when_to_retry():
+    client = upstream(Service(500, 500, 500))
+
+    async def scenario():
+        for _ in range(3):
+            await client.get("/health")
+        with pytest.raises(CircuitOpenError) as raised:
+            await client.get("/health")
+        await client.aclose()
+        return raised.value
+
+    error = asyncio.run(scenario())
+
+    assert error.name == "llm-service"
+    assert 29.0 < error.retry_after <= 30.0
+
+
+def test_timeouts_and_connection_errors_count_as_failures():
+    request = httpx.Request("POST", "http://llm/generate-sql")
+    service = Service(httpx.ReadTimeout("slow", request=request), httpx.ConnectError("refused", request=request), 500)
+    client = upstream(service)
+
+    async def scenario():
+        results = [await outcome(client) for _ in range(4)]
+        await client.aclose()
+        return results
+
+    assert asyncio.run(scenario()) == ["ReadTimeout", "ConnectError", 500, "CircuitOpenError"]
+
+
+def test_client_errors_and_successes_reset_the_count():
+    client = upstream(Service(500, 500, 404, 500, 500, 200, 500))
+
+    async def scenario():
+        results = [await outcome(client) for _ in range(7)]
+        await client.aclose()
+        return results
+
+    assert asyncio.run(scenario()) == [500, 500, 404, 500, 500, 200, 500]
+    assert client.stats() == {"circuit": "closed", "consecutive_failures": 1}
+
+
+def test_half_open_circuit_lets_one_trial_through():
+    gate = asyncio.Event()
+    service = Service(500, 500, 500, gate)
+    client = upstream(service)
+
+    async def scenario():
+        for _ in range(3):
+            await outcome(client)
+        expire(client.breaker)
+        assert client.breaker.state == CircuitBreaker.HALF_OPEN
+        trial = asyncio.create_task(outcome(client))
+        await asyncio.sleep(0)
+        # A second caller while the trial is in flight fails fast
+        rejected = await outcome(client)
+        gate.set()
+        results = [rejected, await trial, await outcome(client)]
+        await client.aclose()
+        return results
+
+    assert asyncio.run(scenario()) == ["CircuitOpenError", 200, 200]
+    assert len(service.requests) == 5
+    assert client.stats() == {"circuit": "closed", "consecutive_failures": 0}
+
+
+def test_failed_trial_reopens_the_circuit():
+    service = Service(500, 500, 500, 500)
+    client = upstream(service)
+
+    async def scenario():
+        for _ in range(3):
+            await outcome(client)
+        expire(client.breaker)
+        results = [await outcome(client), await outcome(client)]
+        await client.aclose()
+        return results
+
+    assert asyncio.run(scenario()) == [500, "CircuitOpenError"]
+    assert client.breaker.state == CircuitBreaker.OPEN
+    assert client.breaker.retry_after() > 29.0
+
+
+def test_cancelled_trial_is_released():
+    service = Service(500, 500, 500, asyncio.Event())
+    client = upstream(service)
+
+    async def scenario():
+        for _ in range(3):
+            await outcome(client)
+        expire(client.breaker)
+        trial = asyncio.create_task(client.post("/generate-sql"))
+        await asyncio.sleep(0)
+        trial.cancel()
+        await asyncio.gather(trial, return_exceptions=True)
+        # The cancelled trial reached no verdict: the circuit stays half-open for the next caller
+        state = client.breaker.state
+        result = await outcome(client)
+        await client.aclose()
+        return state, result
+
+    assert asyncio.run(scenario()) == (CircuitBreaker.HALF_OPEN, 200)
+    assert client.breaker.state == CircuitBreaker.CLOSED
+
+
+def test_per_request_headers_are_merged():
+    service = Service()
+    client = upstream(service, headers=lambda: {"X-Request-ID": "abc", "X-Source": "gateway"})
+
+    async def scenario():
+        await client.get("/health", headers={"X-Source": "test"})
+        await client.aclose()
+
+    asyncio.run(scenario())
+
+    headers = service.requests[0].headers
+    assert (headers["x-request-id"], headers["x-source"]) == ("abc", "test")
+
+
+def test_request_before_start_is_an_error():
+    async def scenario():
+        with pytest.raises(RuntimeError, match="not started"):
+            await Upstream("llm-service", "http://llm").get("/health")
+
+    asyncio.run(scenario())
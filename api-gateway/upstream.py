@@ -0,0 +1,159 @@
+import time
+from typing import Any, Callable, Dict, Optional
+
+import httpx
+import structlog
+
+logger = structlog.get_logger()
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an upstream whose circuit breaker is open"""
+
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(f"{name} is unavailable (circuit open)")
+        self.name = name
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker.
+
+    After ``failure_threshold`` failures in a row the circuit opens and calls
+    fail fast for ``reset_timeout`` seconds. Then a single trial call is let
+    through (half-open): success closes the circuit, failure reopens it.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+
+    @property
+    def state(self) -> str:
+        if self.failures < self.failure_threshold:
+            return self.CLOSED
+        if time.monotonic() - self._opened_at < self.reset_timeout:
+            return self.OPEN
+        return self.HALF_OPEN
+
+    def retry_after(self) -> float:
+        return max(0.0, self.reset_timeout - (time.monotonic() - self._opened_at))
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == self.CLOSED:
+            return True
+        if state == self.HALF_OPEN and not self._trial_in_flight:
+            self._trial_in_flight = True
+            return True
+        return False
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        self._trial_in_flight = False
+        if self.failures >= self.failure_threshold:
+            self._opened_at = time.monotonic()
+
+    def release(self) -> None:
+        """Give up a trial call that ended without a verdict, e.g. cancelled"""
+        self._trial_in_flight = False
+
+
+def http2_available() -> bool:
+    try:
+        import h2  # noqa: F401 - httpx needs it for HTTP/2
+    except ImportError:
+        return False
+    return True
+
+
+class Upstream:
+    """Long-lived pooled HTTP client for one backing service.
+
+    The connection pool is capped per upstream, so a slow service can tie up
+    at most ``max_connections`` requests; callers beyond that wait up to
+    ``pool_timeout`` for a connection and then fail. Timeouts, connection
+    errors and 5xx responses count towards the circuit breaker.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        base_url: str,
+        timeout: float = 30.0,
+        connect_timeout: float = 5.0,
+        pool_timeout: float = 5.0,
+        max_connections: int = 20,
+        keepalive_expiry: float = 30.0,
+        http2: bool = False,
+        failure_threshold: int = 5,
+        reset_timeout: float = 30.0,
+        headers: Optional[Callable[[], Dict[str, str]]] = None,
+    ):
+        self.name = name
+        self.base_url = base_url.rstrip("/")
+        self.timeout = httpx.Timeout(timeout, connect=connect_timeout, pool=pool_timeout)
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_connections,
+            keepalive_expiry=keepalive_expiry
+        )
+        self.http2 = http2
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        # Per-request headers, e.g. the caller's request id and trace context
+        self.headers = headers
+        self._client: Optional[httpx.AsyncClient] = None
+
+    def start(self) -> None:
+        http2 = self.http2
+        if http2 and not http2_available():
+            logger.warning(f"HTTP/2 requested for {self.name} but the h2 package is missing, using HTTP/1.1")
+            http2 = False
+        self._client = httpx.AsyncClient(base_url=self.base_url, timeout=self.timeout, limits=self.limits, http2=http2)
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def request(self, method: str, path: str, stream: bool = False, **kwargs) -> httpx.Response:
+        """With ``stream=True`` the body is not read; the caller iterates it and must close the response"""
+        if self._client is None:
+            raise RuntimeError(f"Upstream {self.name} is not started")
+        if not self.breaker.allow():
+            raise CircuitOpenError(self.name, self.breaker.retry_after())
+        if self.headers is not None:
+            kwargs["headers"] = {**self.headers(), **(kwargs.get("headers") or {})}
+        try:
+            response = await self._client.send(self._client.build_request(method, path, **kwargs), stream=stream)
+        except httpx.HTTPError:
+            self.breaker.record_failure()
+            raise
+        except BaseException:
+            self.breaker.release()
+            raise
+        if response.status_code >= 500:
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+        return response
+
+    async def get(self, path: str, **kwargs) -> httpx.Response:
+        return await self.request("GET", path, **kwargs)
+
+    async def post(self, path: str, **kwargs) -> httpx.Response:
+        return await self.request("POST", path, **kwargs)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"circuit": self.breaker.state, "consecutive_failures": self.breaker.failures}
@@ -0,0 +1,119 @@
+"""Startup warm-up and readiness.
+
+A fresh process pays for opening pool connections, fetching signing keys,
+building caches and routing tables on its first requests. ``Warmup`` runs
+those steps concurrently in the background once the app is up, so ``/health``
+(liveness) answers at once while ``/ready`` stays 503 until every required step
+has succeeded. Orchestrators send traffic only to ready instances, and the first
+user request sees warm latency. Failed required steps are retried; optional
+ones are logged and skipped.
+"""
+import asyncio
+import time
+from contextlib import AsyncExitStack
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import structlog
+
+logger = structlog.get_logger()
+
+
+@dataclass
+class WarmupStep:
+    name: str
+    run: Callable[[], Awaitable[Any]]
+    required: bool = True
+    state: str = "pending"
+    seconds: Optional[float] = None
+    error: Optional[str] = None
+
+
+class Warmup:
+    def __init__(self, import_seconds: float = 0.0, timeout: float = 30.0, retry_interval: float = 5.0):
+        self.import_seconds = import_seconds
+        self.timeout = timeout
+        self.retry_interval = retry_interval
+        self.steps: List[WarmupStep] = []
+        self.seconds: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def add(self, name: str, run: Callable[[], Awaitable[Any]], required: bool = True) -> None:
+        self.steps.append(WarmupStep(name, run, required))
+
+    @property
+    def ready(self) -> bool:
+        return self.seconds is not None
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self.run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def run(self) -> None:
+        started = time.perf_counter()
+        pending = self.steps
+        while True:
+            await asyncio.gather(*(self._run_step(step) for step in pending))
+            pending = [step for step in self.steps if step.required and step.state != "ok"]
+            if not pending:
+                break
+            logger.warning("Warm-up incomplete, retrying", steps=[step.name for step in pending])
+            await asyncio.sleep(self.retry_interval)
+        self.seconds = time.perf_counter() - started
+        logger.info(
+            "Warm-up complete",
+            import_ms=round(self.import_seconds * 1000),
+            warmup_ms=round(self.seconds * 1000),
+            steps={step.name: step.state for step in self.steps}
+        )
+
+    async def _run_step(self, step: WarmupStep) -> None:
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(step.run(), self.timeout)
+            step.state, step.error = "ok", None
+        except Exception as e:
+            step.state, step.error = "failed", str(e) or type(e).__name__
+            log = logger.warning if step.required else logger.info
+            log(f"Warm-up step {step.name} failed: {step.error}")
+        step.seconds = time.perf_counter() - started
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "ready": self.ready,
+            "import_ms": round(self.import_seconds * 1000, 1),
+            "warmup_ms": round(self.seconds * 1000, 1) if self.seconds is not None else None,
+            "steps": {
+                step.name: {
+                    "state": step.state,
+                    "required": step.required,
+                    "ms": round(step.seconds * 1000, 1) if step.seconds is not None else None,
+                    **({"error": step.error} if step.error else {}),
+                }
+                for step in self.steps
+            },
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "ready": int(self.ready),
+            "import_seconds": self.import_seconds,
+            "warmup_seconds": self.seconds if self.seconds is not None else -1,
+        }
+
+
+async def warm_pool(engine: Any, connections: int) -> None:
+    """Open ``connections`` connections together so they are left idle in the pool"""
+    async with AsyncExitStack() as stack:
+        for _ in range(connections):
+            conn = await stack.enter_async_context(engine.connect())
+            await conn.exec_driver_sql("SELECT 1")
@@ -0,0 +1,84 @@
+"""Closed-loop HTTP load driver: N concurrent workers per endpoint for a fixed duration."""
+import asyncio
+import itertools
+import math
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+import httpx
+
+
+@dataclass
+class Target:
+    name: str
+    method: str
+    url: str
+    # Called per request to vary the path or body, e.g. rotate report ids
+    make_request: Optional[Callable[[int], Dict[str, Any]]] = None
+    headers: Dict[str, str] = field(default_factory=dict)
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    rank = max(0, math.ceil(pct / 100 * len(sorted_values)) - 1)
+    return sorted_values[rank]
+
+
+def summarize(latencies: List[float], errors: int, elapsed: float) -> Dict[str, Any]:
+    values = sorted(latencies)
+    total = len(values) + errors
+    return {
+        "requests": total,
+        "errors": errors,
+        "throughput_rps": round(len(values) / elapsed, 2) if elapsed else 0.0,
+        "latency_ms": {
+            "mean": round(sum(values) / len(values), 2) if values else 0.0,
+            "p50": round(percentile(values, 50), 2),
+            "p95": round(percentile(values, 95), 2),
+            "p99": round(percentile(values, 99), 2),
+            "max": round(values[-1], 2) if values else 0.0,
+        },
+    }
+
+
+async def run_target(client: httpx.AsyncClient, target: Target, concurrency: int, duration: float) -> Dict[str, Any]:
+    latencies: List[float] = []
+    errors = 0
+    counter = itertools.count()
+    deadline = time.perf_counter() + duration
+
+    async def worker():
+        nonlocal errors
+        while time.perf_counter() < deadline:
+            request = {"method": target.method, "url": target.url, "headers": target.headers}
+            if target.make_request:
+                request.update(target.make_request(next(counter)))
+            start = time.perf_counter()
+            try:
+                response = await client.request(**request)
+                ok = response.status_code < 400
+            except httpx.HTTPError:
+                ok = False
+            if ok:
+                latencies.append((time.perf_counter() - start) * 1000)
+            else:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(latencies, errors, time.perf_counter() - start)
+
+
+async def run_load(targets: List[Target], concurrency: int, duration: float, warmup: float = 2.0) -> Dict[str, Any]:
+    """Run each target in turn so endpoints do not skew each other's numbers"""
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    results = {}
+    async with httpx.AsyncClient(limits=limits, timeout=60.0) as client:
+        for target in targets:
+            if warmup:
+                await run_target(client, target, concurrency, warmup)
+            results[target.name] = await run_target(client, target, concurrency, duration)
+            print(f"{target.name}: {results[target.name]}")
+    return results
@@ -0,0 +1,93 @@
+"""Micro-benchmark of result serialization: the old per-cell loop vs serialization.py.
+
+    python benchmarks/serialization_bench.py --rows 100000
+
+"legacy" is the loop previously pasted in execute_report/natural_language_query
+followed by FastAPI's default response encoding (jsonable_encoder + json.dumps).
+Rows mimic sales_data: dates, timestamps, UUIDs and NUMERIC (Decimal) amounts.
+"""
+import argparse
+import json
+import random
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+from decimal import Decimal
+from pathlib import Path
+
+from fastapi.encoders import jsonable_encoder
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "api-gateway"))
+from serialization import encode_json, to_columnar, to_records  # noqa: E402
+
+COLUMNS = [
+    "id", "sale_date", "product_name", "category", "region", "sales_rep",
+    "quantity", "unit_price", "total_amount", "customer_id", "created_at", "report_id",
+]
+
+
+def make_rows(count: int):
+    rng = random.Random(42)
+    start = datetime(2024, 1, 1)
+    rows = []
+    for i in range(count):
+        quantity = rng.randint(1, 10)
+        price = Decimal(rng.randint(1000, 100000)) / 100
+        created_at = start + timedelta(seconds=rng.randint(0, 365 * 86400))
+        rows.append((
+            i, created_at.date(), f"Product {rng.randint(1, 500)}", "Electronics", "Europe", "Alice Cooper",
+            quantity, price, price * quantity, rng.randint(1, 10000), created_at, uuid.uuid4(),
+        ))
+    return rows
+
+
+def legacy(columns, rows) -> bytes:
+    data = []
+    for row in rows:
+        row_dict = {}
+        for i, col in enumerate(columns):
+            value = row[i]
+            if isinstance(value, datetime):
+                value = value.isoformat()
+            elif isinstance(value, uuid.UUID):
+                value = str(value)
+            row_dict[col] = value
+        data.append(row_dict)
+    payload = {"success": True, "data": data}
+    return json.dumps(jsonable_encoder(payload), separators=(",", ":")).encode()
+
+
+def records(columns, rows) -> bytes:
+    return encode_json({"success": True, "data": to_records(columns, rows)})
+
+
+def columnar(columns, rows) -> bytes:
+    return encode_json({"success": True, **to_columnar(columns, rows)})
+
+
+def measure(fn, columns, rows, repeat: int):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        body = fn(columns, rows)
+        timings.append(time.perf_counter() - start)
+    return min(timings), len(body)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    rows = make_rows(args.rows)
+    baseline, _ = measure(legacy, COLUMNS, rows, args.repeat)
+    print(f"{'encoder':10} {'best ms':>10} {'rows/s':>12} {'bytes':>12} {'speedup':>8}")
+    for name, fn in (("legacy", legacy), ("records", records), ("columnar", columnar)):
+        best, size = measure(fn, COLUMNS, rows, args.repeat)
+        print(f"{name:10} {best * 1000:10.1f} {args.rows / best:12.0f} {size:12} {baseline / best:7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""Throughput of the LLM service's SQL validation: old substring scan vs sql_validator.py.
+
+    python benchmarks/sql_validator_bench.py --iterations 2000
+
+"legacy" is the previous validate_sql_syntax (full sqlparse.parse plus a
+substring scan). "cold" runs SQLValidator without memoization; "memoized" is
+the steady state where generated SQL repeats. The corpus mixes short and long
+(CTE, window, join-heavy) queries and the false rejections of the old check.
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import sqlparse
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "llm-service"))
+from sql_validator import SQLValidator  # noqa: E402
+
+ALLOWED_TABLES = ["sales_data", "customers", "products", "reports", "report_categories", "dashboards"]
+
+LONG_QUERY = """
+WITH monthly AS (
+    SELECT date_trunc('month', s.sale_date) AS month, s.region, c.industry,
+           SUM(s.total_amount) AS revenue, COUNT(*) AS orders,
+           AVG(s.unit_price) AS avg_price
+    FROM sales_data s
+    JOIN customers c ON c.id = s.customer_id
+    LEFT JOIN products p ON p.product_name = s.product_name
+    WHERE s.sale_date >= CURRENT_DATE - INTERVAL '12 months'
+      AND s.created_at > '2024-01-01 10:30'
+      AND p.category IN ('Electronics', 'Software', 'Services')
+    GROUP BY 1, 2, 3
+), ranked AS (
+    SELECT *, RANK() OVER (PARTITION BY month ORDER BY revenue DESC) AS rank,
+           revenue - LAG(revenue) OVER (PARTITION BY region, industry ORDER BY month) AS change
+    FROM monthly
+)
+SELECT month, region, industry, revenue, orders, avg_price, rank, change,
+       EXTRACT(YEAR FROM month) AS year, COALESCE(change, 0) / NULLIF(revenue, 0) AS growth
+FROM ranked
+WHERE rank <= 5
+ORDER BY month DESC, rank
+LIMIT 100;
+"""
+
+CORPUS = [
+    "SELECT SUM(total_amount) AS total_sales FROM sales_data;",
+    "SELECT region, SUM(total_amount) AS revenue FROM sales_data GROUP BY region ORDER BY revenue DESC;",
+    "SELECT industry, COUNT(*) AS customers FROM customers GROUP BY industry;",
+    "SELECT product_name, created_at, updated_at FROM products ORDER BY updated_at DESC LIMIT 20;",
+    "SELECT c.company, SUM(s.total_amount) FROM customers c JOIN sales_data s ON s.customer_id = c.id "
+    "GROUP BY c.company ORDER BY 2 DESC LIMIT 10;",
+    LONG_QUERY,
+    LONG_QUERY.replace("LIMIT 100", "LIMIT 50"),
+]
+
+
+def legacy_validate(sql: str):
+    try:
+        parsed = sqlparse.parse(sql)
+        if not parsed:
+            return False, "Empty or invalid SQL"
+        sql_lower = sql.lower()
+        for keyword in ['drop', 'delete', 'truncate', 'alter', 'create', 'insert', 'update']:
+            if keyword in sql_lower:
+                return False, f"Dangerous operation detected: {keyword}"
+        return True, None
+    except Exception as e:
+        return False, str(e)
+
+
+def measure(validate, iterations: int) -> float:
+    start = time.perf_counter()
+    for i in range(iterations):
+        validate(CORPUS[i % len(CORPUS)])
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args()
+
+    cold = SQLValidator(ALLOWED_TABLES, cache_size=0)
+    memoized = SQLValidator(ALLOWED_TABLES)
+    runs = [
+        ("legacy", legacy_validate),
+        ("cold", cold.validate),
+        ("memoized", memoized.validate),
+    ]
+    baseline = None
+    print(f"{'validator':10} {'total s':>8} {'queries/s':>12} {'speedup':>8}")
+    for name, validate in runs:
+        elapsed = measure(validate, args.iterations)
+        baseline = baseline or elapsed
+        print(f"{name:10} {elapsed:8.3f} {args.iterations / elapsed:12.0f} {baseline / elapsed:7.1f}x")
+
+    rejected = [sql for sql in CORPUS if not legacy_validate(sql)[0]]
+    print(f"\nlegacy rejects {len(rejected)}/{len(CORPUS)} valid corpus queries "
+          f"(e.g. {legacy_validate(rejected[0])[1]!r})" if rejected else "")
+    print(f"SQLValidator rejects {sum(not cold.validate(sql)[0] for sql in CORPUS)}/{len(CORPUS)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""Local stand-ins for Keycloak and an OpenAI-compatible LLM, used by the benchmarks.
+
+    uvicorn stubs:keycloak_app --app-dir benchmarks --port 18080
+    uvicorn stubs:openai_app --app-dir benchmarks --port 18090
+"""
+import asyncio
+import os
+import re
+import time
+import uuid
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from fastapi import FastAPI, Request
+from jose import jwk, jwt
+
+KEY_ID = "bench-key"
+STUB_LLM_LATENCY_MS = float(os.getenv("STUB_LLM_LATENCY_MS", "800"))
+
+# Keycloak: one RSA key per process, published as the realm JWKS
+_private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+_private_pem = _private_key.private_bytes(
+    serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+)
+_public_jwk = jwk.construct(
+    _private_key.public_key().public_bytes(
+        serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo
+    ),
+    "RS256"
+).to_dict()
+_public_jwk.update({"kid": KEY_ID, "use": "sig", "alg": "RS256"})
+
+keycloak_app = FastAPI(title="Keycloak stub")
+
+
+@keycloak_app.get("/health")
+async def keycloak_health():
+    return {"status": "healthy"}
+
+
+@keycloak_app.get("/realms/{realm}/protocol/openid-connect/certs")
+async def certs(realm: str):
+    return {"keys": [_public_jwk]}
+
+
+@keycloak_app.post("/realms/{realm}/protocol/openid-connect/token")
+async def token(realm: str, request: Request, username: str = "bench-user"):
+    now = int(time.time())
+    claims = {
+        "sub": str(uuid.uuid5(uuid.NAMESPACE_DNS, username)),
+        "preferred_username": username,
+        "email": f"{username}@bench.local",
+        "given_name": "Bench",
+        "family_name": "User",
+        "iss": f"{str(request.base_url).rstrip('/')}/realms/{realm}",
+        "iat": now,
+        "exp": now + 3600,
+    }
+    access_token = jwt.encode(claims, _private_pem, algorithm="RS256", headers={"kid": KEY_ID})
+    return {"access_token": access_token, "token_type": "Bearer", "expires_in": 3600}
+
+
+# OpenAI-compatible chat completions returning canned SQL after a fixed latency
+openai_app = FastAPI(title="OpenAI stub")
+
+CANNED_SQL = [
+    (re.compile(r"customer", re.I), "SELECT industry, COUNT(*) AS customers FROM customers GROUP BY industry"),
+    (re.compile(r"region", re.I), "SELECT region, SUM(total_amount) AS revenue FROM sales_data GROUP BY region"),
+    (re.compile(r"product", re.I), "SELECT product_name, SUM(total_amount) AS revenue FROM sales_data "
+                                   "GROUP BY product_name ORDER BY revenue DESC LIMIT 10"),
+]
+DEFAULT_SQL = "SELECT SUM(total_amount) AS total_sales FROM sales_data"
+QUESTION_RE = re.compile(r'Natural Language Query: "(.*)"')
+
+
+@openai_app.get("/health")
+async def openai_health():
+    return {"status": "healthy"}
+
+
+@openai_app.post("/v1/chat/completions")
+async def chat_completions(body: dict):
+    prompt = body["messages"][-1]["content"]
+    match = QUESTION_RE.search(prompt)
+    question = match.group(1) if match else prompt
+    sql = next((sql for pattern, sql in CANNED_SQL if pattern.search(question)), DEFAULT_SQL)
+    await asyncio.sleep(STUB_LLM_LATENCY_MS / 1000)
+    return {
+        "id": f"chatcmpl-{uuid.uuid4().hex}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model", "stub"),
+        "choices": [{
+            "index": 0,
+            "finish_reason": "stop",
+            "message": {"role": "assistant", "content": sql},
+        }],
+        "usage": {"prompt_tokens": len(prompt) // 4, "completion_tokens": len(sql) // 4, "total_tokens": 0},
+    }
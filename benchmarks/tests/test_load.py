@@ -0,0 +1,97 @@
+import asyncio
+
+import httpx
+import pytest
+from jose import jwt
+
+import stubs
+from load import Target, percentile, run_target, summarize
+
+
+def test_percentile_uses_nearest_rank():
+    values = [float(v) for v in range(1, 101)]
+    assert percentile(values, 50) == 50.0
+    assert percentile(values, 95) == 95.0
+    assert percentile(values, 99) == 99.0
+    assert percentile(values, 100) == 100.0
+    assert percentile([7.0], 99) == 7.0
+    assert percentile([], 50) == 0.0
+
+
+def test_summarize_counts_errors_but_excludes_them_from_latency():
+    summary = summarize([10.0, 20.0, 30.0, 40.0], errors=2, elapsed=2.0)
+    assert summary["requests"] == 6
+    assert summary["errors"] == 2
+    assert summary["throughput_rps"] == 2.0
+    assert summary["latency_ms"] == {"mean": 25.0, "p50": 20.0, "p95": 40.0, "p99": 40.0, "max": 40.0}
+
+
+def test_summarize_without_successful_requests():
+    summary = summarize([], errors=3, elapsed=1.0)
+    assert summary["requests"] == 3
+    assert summary["latency_ms"]["max"] == 0.0
+
+
+@pytest.fixture
+def openai_stub(monkeypatch):
+    monkeypatch.setattr(stubs, "STUB_LLM_LATENCY_MS", 0.0)
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=stubs.openai_app), base_url="http://stub")
+
+
+def completion(question: str) -> dict:
+    return {"json": {"model": "stub", "messages": [{"role": "user", "content": f'Natural Language Query: "{question}"'}]}}
+
+
+def test_run_target_drives_every_worker_until_the_deadline(openai_stub):
+    questions = ["Show revenue by region", "How many customers per industry?"]
+    target = Target("chat", "POST", "/v1/chat/completions", make_request=lambda i: completion(questions[i % 2]))
+
+    async def run():
+        async with openai_stub:
+            return await run_target(openai_stub, target, concurrency=4, duration=0.2)
+
+    result = asyncio.run(run())
+    assert result["errors"] == 0
+    assert result["requests"] >= 4
+    assert 0 < result["latency_ms"]["p50"] <= result["latency_ms"]["max"]
+
+
+def test_run_target_counts_error_responses(openai_stub):
+    target = Target("missing", "GET", "/v1/missing")
+
+    async def run():
+        async with openai_stub:
+            return await run_target(openai_stub, target, concurrency=2, duration=0.1)
+
+    result = asyncio.run(run())
+    assert result["requests"] == result["errors"] > 0
+    assert result["throughput_rps"] == 0.0
+
+
+@pytest.mark.parametrize("question, expected", [
+    ("Show revenue by region", "GROUP BY region"),
+    ("How many customers do we have per industry?", "FROM customers"),
+    ("What are the top products by revenue?", "GROUP BY product_name"),
+    ("What is the total revenue?", stubs.DEFAULT_SQL),
+])
+def test_openai_stub_returns_canned_sql_for_the_question(openai_stub, question, expected):
+    async def ask():
+        async with openai_stub:
+            response = await openai_stub.post("/v1/chat/completions", **completion(question))
+            response.raise_for_status()
+            return response.json()["choices"][0]["message"]["content"]
+
+    assert expected in asyncio.run(ask())
+
+
+def test_keycloak_stub_tokens_verify_against_its_jwks():
+    async def token_and_keys():
+        transport = httpx.ASGITransport(app=stubs.keycloak_app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://keycloak") as client:
+            token = (await client.post("/realms/test/protocol/openid-connect/token?username=alice")).json()
+            keys = (await client.get("/realms/test/protocol/openid-connect/certs")).json()["keys"]
+            return token["access_token"], keys
+
+    token, keys = asyncio.run(token_and_keys())
+    claims = jwt.decode(token, keys[0], algorithms=["RS256"], issuer="http://keycloak/realms/test")
+    assert claims["preferred_username"] == "alice"
@@ -0,0 +1,13 @@
+-- Keep updated_at current so caches keyed on it see every change
+
+CREATE OR REPLACE FUNCTION set_updated_at()
+RETURNS TRIGGER AS $$
+BEGIN
+    NEW.updated_at = CURRENT_TIMESTAMP;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trg_reports_updated_at
+    BEFORE UPDATE ON reports
+    FOR EACH ROW EXECUTE FUNCTION set_updated_at();
@@ -0,0 +1,92 @@
+-- Pre-aggregated sales rollups, refreshed incrementally from created_at watermarks
+
+CREATE INDEX IF NOT EXISTS idx_sales_data_created_at ON sales_data(created_at);
+
+-- One row per day x region x category x product. Measure columns keep the
+-- names of the sales_data columns they sum so report SQL can be pointed at
+-- the rollup without renaming; row_count and unit_price_sum let COUNT(*) and
+-- AVG(...) be recomputed exactly.
+CREATE TABLE IF NOT EXISTS sales_daily_rollup (
+    sale_date DATE NOT NULL,
+    region VARCHAR(100) NOT NULL,
+    category VARCHAR(100) NOT NULL,
+    product_name VARCHAR(200) NOT NULL,
+    total_amount NUMERIC(18,2) NOT NULL,
+    quantity BIGINT NOT NULL,
+    unit_price_sum NUMERIC(18,2) NOT NULL,
+    row_count BIGINT NOT NULL,
+    PRIMARY KEY (sale_date, region, category, product_name)
+);
+
+CREATE INDEX IF NOT EXISTS idx_sales_daily_rollup_region ON sales_daily_rollup(region, sale_date);
+
+-- Rows with created_at <= high_watermark are folded into the rollup
+CREATE TABLE IF NOT EXISTS rollup_watermarks (
+    rollup_name VARCHAR(100) PRIMARY KEY,
+    high_watermark TIMESTAMP WITH TIME ZONE NOT NULL,
+    refreshed_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    rows_merged BIGINT DEFAULT 0
+);
+
+-- Merge sales_data rows created since the last watermark into the rollup.
+-- The new watermark trails the clock by p_lag: created_at defaults to the
+-- inserting transaction's start time, so a transaction still open when the
+-- refresh runs would otherwise commit rows behind the watermark. Updates,
+-- deletes and back-dated inserts are not tracked; p_full rebuilds from scratch.
+-- The watermark never moves backwards: readers may bound the raw tail with a
+-- watermark they saw earlier.
+CREATE OR REPLACE FUNCTION refresh_sales_daily_rollup(
+    p_lag INTERVAL DEFAULT INTERVAL '1 minute',
+    p_full BOOLEAN DEFAULT FALSE
+)
+RETURNS BIGINT AS $$
+DECLARE
+    v_from TIMESTAMP WITH TIME ZONE;
+    v_to TIMESTAMP WITH TIME ZONE := clock_timestamp() - p_lag;
+    v_rows BIGINT;
+BEGIN
+    -- One refresh at a time, however many gateways schedule it
+    PERFORM pg_advisory_xact_lock(hashtext('sales_daily_rollup'));
+
+    SELECT high_watermark INTO v_from
+    FROM rollup_watermarks
+    WHERE rollup_name = 'sales_daily_rollup';
+
+    IF p_full OR v_from IS NULL THEN
+        TRUNCATE sales_daily_rollup;
+        v_to := GREATEST(v_to, v_from);
+        v_from := '-infinity';
+    END IF;
+
+    IF v_to <= v_from THEN
+        RETURN 0;
+    END IF;
+
+    INSERT INTO sales_daily_rollup AS r (
+        sale_date, region, category, product_name, total_amount, quantity, unit_price_sum, row_count
+    )
+    SELECT sale_date, region, category, product_name,
+           SUM(total_amount), SUM(quantity), SUM(unit_price), COUNT(*)
+    FROM sales_data
+    WHERE created_at > v_from AND created_at <= v_to
+    GROUP BY sale_date, region, category, product_name
+    ON CONFLICT (sale_date, region, category, product_name) DO UPDATE SET
+        total_amount = r.total_amount + EXCLUDED.total_amount,
+        quantity = r.quantity + EXCLUDED.quantity,
+        unit_price_sum = r.unit_price_sum + EXCLUDED.unit_price_sum,
+        row_count = r.row_count + EXCLUDED.row_count;
+    GET DIAGNOSTICS v_rows = ROW_COUNT;
+
+    INSERT INTO rollup_watermarks (rollup_name, high_watermark, refreshed_at, rows_merged)
+    VALUES ('sales_daily_rollup', v_to, CURRENT_TIMESTAMP, v_rows)
+    ON CONFLICT (rollup_name) DO UPDATE SET
+        high_watermark = EXCLUDED.high_watermark,
+        refreshed_at = EXCLUDED.refreshed_at,
+        rows_merged = EXCLUDED.rows_merged;
+
+    RETURN v_rows;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Build the rollup from the sample data
+SELECT refresh_sales_daily_rollup(INTERVAL '0', TRUE);
@@ -0,0 +1,10 @@
+-- Report categories get an updated_at like reports, so the gateway's catalog
+-- snapshot can tell from max(updated_at) and count(*) when the menu changed
+
+ALTER TABLE report_categories
+    ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP;
+
+DROP TRIGGER IF EXISTS trg_report_categories_updated_at ON report_categories;
+CREATE TRIGGER trg_report_categories_updated_at
+    BEFORE UPDATE ON report_categories
+    FOR EACH ROW EXECUTE FUNCTION set_updated_at();
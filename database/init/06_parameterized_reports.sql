@@ -0,0 +1,28 @@
+-- A parameterized report: chart_config["parameters"] declares typed parameters
+-- that the gateway validates and binds as :name, so one prepared statement
+-- serves every date range, region and top-N. Optional parameters left out are
+-- bound as NULL, hence the "(:region IS NULL OR ...)" filter.
+
+INSERT INTO reports (category_id, name, description, sql_query, chart_config)
+SELECT
+    (SELECT id FROM report_categories WHERE name = 'Sales Analytics'),
+    'Regional Sales for a Period',
+    'Revenue and transactions per region between two dates, optionally for one region',
+    'SELECT
+        region,
+        SUM(total_amount) as revenue,
+        COUNT(*) as transactions
+     FROM sales_data
+     WHERE sale_date BETWEEN :start_date AND :end_date
+       AND (:region IS NULL OR region = :region)
+     GROUP BY region
+     ORDER BY revenue DESC
+     LIMIT :top_n',
+    '{"type": "bar", "xAxis": "region", "yAxis": "revenue", "title": "Regional Sales for a Period",
+      "parameters": [
+        {"name": "start_date", "type": "date", "required": true},
+        {"name": "end_date", "type": "date", "required": true},
+        {"name": "region", "type": "string", "choices": ["North America", "Europe", "Asia", "South America"]},
+        {"name": "top_n", "type": "integer", "default": 10, "min": 1, "max": 100}
+      ]}'
+WHERE NOT EXISTS (SELECT 1 FROM reports WHERE name = 'Regional Sales for a Period');
@@ -0,0 +1,559 @@
+"""Local NL-to-SQL for routine questions about sales, customers and products.
+
+Questions are matched against a declarative catalog of metrics, dimensions,
+time grains and date ranges, plus filter values (regions, categories, ...)
+loaded from the database. Everything is compiled into a single regular
+expression, so matching costs one scan of the question. The SQL is built with
+SQLAlchemy Core and rendered with literal binds, because callers receive
+plain SQL text. Every literal comes from the catalog, the loaded vocabulary
+or a parsed integer or date. Questions are never interpolated into the SQL.
+
+Rendering SQL dominates the cost of a match, so rendered statements are
+memoized by intent.
+
+Confidence is the share of the question's content words that the match
+explains, so anything the catalog does not cover ("growth", "per customer")
+pulls the score down and leaves the question to the LLM. Negations ("not in
+Europe", "except hardware") exclude the filter values they directly precede.
+A question with a negation that applies to anything else gets no match at all,
+since dropping it would invert the answer.
+"""
+import calendar
+import re
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+import structlog
+from sqlalchemy import Date, DateTime, Integer, Numeric, String, asc, column, desc, func, select, table
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.engine import Engine
+
+logger = structlog.get_logger()
+
+CATALOG: Dict[str, Any] = {
+    "tables": {
+        "sales_data": {
+            "date_column": "sale_date",
+            "columns": {
+                "id": Integer, "sale_date": Date, "product_name": String, "category": String,
+                "region": String, "sales_rep": String, "quantity": Integer, "unit_price": Numeric,
+                "total_amount": Numeric, "customer_id": Integer, "created_at": DateTime,
+            },
+        },
+        "customers": {
+            "date_column": "created_at",
+            "columns": {
+                "id": Integer, "customer_name": String, "company": String, "industry": String,
+                "region": String, "created_at": DateTime,
+            },
+        },
+        "products": {
+            "date_column": "created_at",
+            "columns": {
+                "id": Integer, "product_name": String, "category": String, "price": Numeric,
+                "cost": Numeric, "supplier": String, "created_at": DateTime,
+            },
+        },
+    },
+    # Many-to-one joins usable from a metric's table: {from: {to: (from_column, to_column)}}
+    "joins": {
+        "sales_data": {"customers": ("customer_id", "id")},
+    },
+    "metrics": {
+        "revenue": {
+            "table": "sales_data", "agg": "sum", "column": "total_amount",
+            "phrases": ["revenue", "sales", "total sales", "sales amount", "income", "turnover", "sales revenue"],
+        },
+        "orders": {
+            "table": "sales_data", "agg": "count",
+            "phrases": ["orders", "transactions", "number of sales", "number of orders", "order count",
+                        "how many orders", "how many sales", "how many transactions", "sales count"],
+        },
+        "units_sold": {
+            "table": "sales_data", "agg": "sum", "column": "quantity",
+            "phrases": ["units", "units sold", "quantity", "quantity sold", "items sold"],
+        },
+        "average_order_value": {
+            "table": "sales_data", "agg": "avg", "column": "total_amount",
+            "phrases": ["average order value", "aov", "average sale", "average order", "average sales",
+                        "average revenue"],
+        },
+        "customer_count": {
+            "table": "customers", "agg": "count",
+            "phrases": ["how many customers", "number of customers", "customer count", "count of customers",
+                        "new customers", "how many clients", "number of clients"],
+        },
+        "product_count": {
+            "table": "products", "agg": "count",
+            "phrases": ["how many products", "number of products", "product count", "count of products"],
+        },
+        "average_price": {
+            "table": "products", "agg": "avg", "column": "price",
+            "phrases": ["average price", "average product price", "mean price"],
+        },
+    },
+    # Metric used when a question names only dimensions, e.g. "top 5 products"
+    "default_metric": "revenue",
+    "dimensions": {
+        "region": {"columns": {"sales_data": "region", "customers": "region"}, "phrases": ["region", "regions"]},
+        "category": {
+            "columns": {"sales_data": "category", "products": "category"},
+            "phrases": ["category", "categories", "product category", "product categories"],
+        },
+        "product": {
+            "columns": {"sales_data": "product_name", "products": "product_name"},
+            "phrases": ["product", "products", "item", "items"],
+        },
+        "sales_rep": {
+            "columns": {"sales_data": "sales_rep"},
+            "phrases": ["sales rep", "sales reps", "rep", "reps", "salesperson", "salespeople", "sales representative",
+                        "sales representatives"],
+        },
+        "industry": {"columns": {"customers": "industry"}, "phrases": ["industry", "industries", "sector", "sectors"]},
+        "customer": {"columns": {"customers": "customer_name"}, "phrases": ["customer", "customers", "client", "clients"]},
+        "company": {"columns": {"customers": "company"}, "phrases": ["company", "companies", "account", "accounts"]},
+        "supplier": {"columns": {"products": "supplier"}, "phrases": ["supplier", "suppliers", "vendor", "vendors"]},
+    },
+    # Dimensions whose values are loaded from the database and matched as filters
+    "entities": ["region", "category", "industry", "sales_rep", "product", "supplier"],
+    "time_grains": {
+        "day": ["daily", "per day", "by day", "each day", "day by day"],
+        "week": ["weekly", "per week", "by week", "each week", "week by week"],
+        "month": ["monthly", "per month", "by month", "each month", "month by month", "over time", "trend"],
+        "quarter": ["quarterly", "per quarter", "by quarter", "each quarter"],
+        "year": ["yearly", "annual", "annually", "per year", "by year", "each year"],
+    },
+}
+
+NUMBER_WORDS = {
+    "one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6, "seven": 7, "eight": 8, "nine": 9,
+    "ten": 10, "eleven": 11, "twelve": 12, "fifteen": 15, "twenty": 20, "fifty": 50, "hundred": 100,
+}
+NUMBER = r"(\d+|" + "|".join(NUMBER_WORDS) + r")"
+
+# Words that carry no meaning of their own in these questions
+FILLER_WORDS = {
+    "a", "an", "the", "what", "whats", "which", "who", "is", "are", "was", "were", "be", "been", "show", "me", "us",
+    "give", "list", "get", "find", "tell", "display", "report", "see", "view", "please", "can", "could", "you",
+    "i", "we", "our", "do", "did", "does", "have", "has", "had", "total", "overall", "all", "sum", "of", "by",
+    "per", "for", "each", "every", "in", "on", "at", "to", "from", "with", "and", "during", "over", "across",
+    "breakdown", "broken", "down", "split", "grouped", "group", "value", "amount", "number", "count", "how",
+    "many", "much", "so", "far", "data", "figures", "numbers", "ranked", "rank", "ranking", "their", "its",
+    "it", "there", "made", "generated",
+}
+
+DEFAULT_TOP_N = 10
+MAX_TOP_N = 1000
+
+TOP_RE = re.compile(
+    rf"\b(top|best|highest|largest|biggest|bottom|worst|lowest|smallest)(?:\s+{NUMBER})?\b", re.IGNORECASE
+)
+RANGE_PATTERNS = [
+    ("day", re.compile(r"\b(today|yesterday)\b", re.IGNORECASE)),
+    ("this", re.compile(r"\b(?:this|current)\s+(week|month|quarter|year)\b", re.IGNORECASE)),
+    ("rolling", re.compile(rf"\b(?:last|past|previous|prior)\s+{NUMBER}\s+(days?|weeks?|months?|quarters?|years?)\b",
+                           re.IGNORECASE)),
+    ("previous", re.compile(r"\b(?:last|previous|prior|past)\s+(week|month|quarter|year)\b", re.IGNORECASE)),
+    ("to_date", re.compile(r"\b(?:(year|month|quarter)\s+to\s+date|(ytd|mtd|qtd))\b", re.IGNORECASE)),
+    ("since", re.compile(r"\bsince\s+((?:19|20)\d{2})\b", re.IGNORECASE)),
+    ("year", re.compile(r"\b(?:in|during|for)?\s*((?:19|20)\d{2})\b", re.IGNORECASE)),
+]
+WORD_RE = re.compile(r"[a-z0-9]+")
+NEGATION_RE = re.compile(
+    r"(?:\b(?:not|except|excluding|exclude|without|other\s+than|apart\s+from|aside\s+from|outside|non)\b|n't\b)",
+    re.IGNORECASE
+)
+# Words that may sit between a negation and the values it excludes: "not in the", "except for"
+NEGATION_CONNECTORS = {"in", "for", "from", "of", "the", "any", "and", "or", "nor", "to", "within", "including"}
+# Between a dimension used as a qualifier and the attribute it qualifies: "customer industry", "customer's region"
+QUALIFIER_GAP_RE = re.compile(r"^(?:'s)?\s+$")
+
+
+@dataclass
+class IntentMatch:
+    sql: str
+    confidence: float
+    explanation: str
+    intent: Dict[str, Any] = field(default_factory=dict)
+
+
+def parse_number(value: Optional[str]) -> Optional[int]:
+    if value is None:
+        return None
+    return int(value) if value.isdigit() else NUMBER_WORDS.get(value.lower())
+
+
+def add_months(day: date, months: int) -> date:
+    month_index = day.year * 12 + day.month - 1 + months
+    year, month = divmod(month_index, 12)
+    return date(year, month + 1, min(day.day, calendar.monthrange(year, month + 1)[1]))
+
+
+def period_start(day: date, unit: str) -> date:
+    if unit == "week":
+        return day - timedelta(days=day.weekday())
+    if unit == "month":
+        return day.replace(day=1)
+    if unit == "quarter":
+        return date(day.year, 3 * ((day.month - 1) // 3) + 1, 1)
+    return date(day.year, 1, 1)
+
+
+def shift(day: date, unit: str, count: int) -> date:
+    if unit == "day":
+        return day + timedelta(days=count)
+    if unit == "week":
+        return day + timedelta(weeks=count)
+    if unit == "month":
+        return add_months(day, count)
+    if unit == "quarter":
+        return add_months(day, 3 * count)
+    return add_months(day, 12 * count)
+
+
+def date_range(kind: str, match: re.Match, today: date) -> Optional[Tuple[date, Optional[date], str]]:
+    """[start, end) for a matched date phrase; end None means open-ended"""
+    tomorrow = today + timedelta(days=1)
+    if kind == "day":
+        if match.group(1).lower() == "today":
+            return today, tomorrow, "today"
+        return today - timedelta(days=1), today, "yesterday"
+    if kind == "this":
+        unit = match.group(1).lower()
+        return period_start(today, unit), tomorrow, f"this {unit}"
+    if kind == "previous":
+        unit = match.group(1).lower()
+        end = period_start(today, unit)
+        return shift(end, unit, -1), end, f"last {unit}"
+    if kind == "rolling":
+        count = parse_number(match.group(1))
+        unit = match.group(2).lower().rstrip("s")
+        if not count:
+            return None
+        return shift(tomorrow, unit, -count), tomorrow, f"last {count} {unit}s"
+    if kind == "to_date":
+        unit = (match.group(1) or {"ytd": "year", "mtd": "month", "qtd": "quarter"}[match.group(2).lower()]).lower()
+        return period_start(today, unit), tomorrow, f"{unit} to date"
+    if kind == "since":
+        year = int(match.group(1))
+        return date(year, 1, 1), None, f"since {year}"
+    year = int(match.group(1))
+    return date(year, 1, 1), date(year + 1, 1, 1), str(year)
+
+
+def phrase_pattern(phrases: List[str]) -> re.Pattern:
+    # Longest first so "total sales" wins over "sales" and "sales rep" over "sales"
+    alternatives = [
+        re.escape(phrase).replace(r"\ ", r"\s+")
+        for phrase in sorted(set(phrases), key=len, reverse=True)
+    ]
+    return re.compile(r"(?<![a-z0-9])(?:" + "|".join(alternatives) + r")(?![a-z0-9])", re.IGNORECASE)
+
+
+def normalize_phrase(text: str) -> str:
+    return " ".join(text.lower().split())
+
+
+class IntentEngine:
+    def __init__(self, catalog: Dict[str, Any] = CATALOG, max_entity_values: int = 500, cache_size: int = 4096):
+        self.catalog = catalog
+        self.max_entity_values = max_entity_values
+        self.cache_size = cache_size
+        self.dialect = postgresql.dialect()
+        self._rendered: "OrderedDict[tuple, Optional[Tuple[str, str]]]" = OrderedDict()
+        self.tables = {
+            name: table(name, *(column(col, type_) for col, type_ in spec["columns"].items()))
+            for name, spec in catalog["tables"].items()
+        }
+        self.loaded_at: Optional[float] = None
+        self._compile({})
+
+    def _compile(self, entity_values: Dict[str, List[str]]) -> None:
+        meanings: Dict[str, List[Tuple[str, ...]]] = {}
+        for key, metric in self.catalog["metrics"].items():
+            for phrase in metric["phrases"]:
+                meanings.setdefault(normalize_phrase(phrase), []).append(("metric", key))
+        for key, dimension in self.catalog["dimensions"].items():
+            for phrase in dimension["phrases"]:
+                meanings.setdefault(normalize_phrase(phrase), []).append(("dimension", key))
+        for grain, phrases in self.catalog["time_grains"].items():
+            for phrase in phrases:
+                meanings.setdefault(normalize_phrase(phrase), []).append(("grain", grain))
+        for key, values in entity_values.items():
+            for value in values:
+                phrase = normalize_phrase(value)
+                # Catalog phrases win over data values that happen to spell the same
+                if phrase not in meanings:
+                    meanings[phrase] = [("entity", key, value)]
+                elif meanings[phrase][0][0] == "entity":
+                    meanings[phrase].append(("entity", key, value))
+        self._meanings = meanings
+        self._pattern = phrase_pattern(list(meanings))
+
+    def load_vocabulary(self, engine: Engine) -> None:
+        """Load filter values (regions, categories, ...) and recompile the matcher"""
+        values: Dict[str, List[str]] = {}
+        with engine.connect() as conn:
+            for key in self.catalog["entities"]:
+                table_name, column_name = next(iter(self.catalog["dimensions"][key]["columns"].items()))
+                col = self.tables[table_name].c[column_name]
+                try:
+                    rows = conn.execute(
+                        select(col).distinct().where(col.isnot(None)).limit(self.max_entity_values)
+                    ).scalars().all()
+                except Exception as e:
+                    conn.rollback()
+                    logger.warning(f"Could not load intent values for {key}: {e}")
+                    continue
+                values[key] = [value for value in rows if isinstance(value, str) and len(value.strip()) >= 2]
+        self.set_vocabulary(values)
+        logger.info("Intent vocabulary loaded", entities={key: len(v) for key, v in values.items()})
+
+    def set_vocabulary(self, values: Dict[str, List[str]]) -> None:
+        """Use these filter values per entity, e.g. {"region": ["Europe", "Asia"]}"""
+        self._compile(values)
+        self.loaded_at = time.monotonic()
+
+    def is_stale(self, ttl: float) -> bool:
+        return self.loaded_at is None or time.monotonic() - self.loaded_at >= ttl
+
+    def match(self, question: str, today: Optional[date] = None) -> Optional[IntentMatch]:
+        today = today or date.today()
+        spans: List[Tuple[int, int]] = []
+        masked = question
+
+        def consume(m: re.Match) -> None:
+            nonlocal masked
+            spans.append(m.span())
+            masked = masked[:m.start()] + " " * (m.end() - m.start()) + masked[m.end():]
+
+        # Date phrases and top-N first; the phrase matcher runs on what is left
+        time_range = None
+        for kind, pattern in RANGE_PATTERNS:
+            for m in pattern.finditer(masked):
+                if time_range is None:
+                    time_range = date_range(kind, m, today)
+                consume(m)
+
+        top = None
+        m = TOP_RE.search(masked)
+        if m:
+            direction = "asc" if m.group(1).lower() in ("bottom", "worst", "lowest", "smallest") else "desc"
+            top = (min(parse_number(m.group(2)) or DEFAULT_TOP_N, MAX_TOP_N), direction)
+            consume(m)
+
+        negations = list(NEGATION_RE.finditer(masked))
+        for m in negations:
+            consume(m)
+        unresolved = {m.end() for m in negations}
+
+        metrics: List[str] = []
+        dimensions: List[str] = []
+        qualifiers: Dict[str, str] = {}
+        grain = None
+        filters: Dict[str, List[str]] = {}
+        excluded: Dict[str, List[str]] = {}
+        negation_end = None  # End of the last negation, or of the last value it excluded
+        previous_dimension = None  # (key, match end, added here) of the last dimension phrase
+        for m in self._pattern.finditer(masked):
+            meanings = self._meanings.get(normalize_phrase(m.group(0)))
+            if not meanings:
+                continue
+            spans.append(m.span())
+            kind, key = meanings[0][0], meanings[0][1]
+            preceding = [end for end in unresolved if end <= m.start()]
+            if preceding:
+                negation_end = max(preceding)
+            if kind == "entity" and negation_end is not None and self._connects(masked[negation_end:m.start()]):
+                unresolved.discard(negation_end)
+                negation_end = m.end()
+                for _, entity_key, value in meanings:
+                    excluded.setdefault(entity_key, []).append(value)
+                continue
+            negation_end = None
+            if kind == "metric" and key not in metrics:
+                metrics.append(key)
+            elif kind == "dimension":
+                qualifier = self._qualifier(masked, previous_dimension, key, m.start())
+                if qualifier is not None:
+                    qualified_key, table_name = qualifier
+                    dimensions.remove(qualified_key)
+                    qualifiers[key] = table_name
+                added = key not in dimensions
+                if added:
+                    dimensions.append(key)
+                previous_dimension = (key, m.end(), added)
+                continue
+            elif kind == "grain":
+                grain = grain or key
+            elif kind == "entity":
+                for _, entity_key, value in meanings:
+                    filters.setdefault(entity_key, []).append(value)
+            previous_dimension = None
+
+        # A negation that excludes no filter value cannot be expressed here
+        if unresolved:
+            return None
+
+        # "top 5 products" names no metric: rank by the default one, at lower confidence
+        defaulted = False
+        if not metrics:
+            if not dimensions and not top:
+                return None
+            metrics = [self.catalog["default_metric"]]
+            defaulted = True
+
+        key = (
+            tuple(metrics), tuple(dimensions), tuple(qualifiers.items()), grain,
+            tuple((k, tuple(v)) for k, v in filters.items()), tuple((k, tuple(v)) for k, v in excluded.items()),
+            time_range, top,
+        )
+        if key in self._rendered:
+            self._rendered.move_to_end(key)
+            built = self._rendered[key]
+        else:
+            built = self._build(metrics, dimensions, qualifiers, grain, filters, excluded, time_range, top)
+            self._rendered[key] = built
+            if len(self._rendered) > self.cache_size:
+                self._rendered.popitem(last=False)
+        if built is None:
+            return None
+        sql, explanation = built
+
+        words = [(w.group(0), w.start()) for w in WORD_RE.finditer(question.lower())]
+        content = [(word, start) for word, start in words if word not in FILLER_WORDS]
+        covered = sum(1 for _, start in content if any(a <= start < b for a, b in spans))
+        coverage = covered / len(content) if content else 0.0
+        confidence = round(max(0.0, 0.95 * coverage - (0.1 if defaulted else 0.0)), 2)
+
+        return IntentMatch(
+            sql=sql,
+            confidence=confidence,
+            explanation=explanation,
+            intent={
+                "metrics": metrics,
+                "dimensions": dimensions,
+                "grain": grain,
+                "filters": filters,
+                "excluded": excluded,
+                "time_range": time_range[2] if time_range else None,
+                "top": top,
+            },
+        )
+
+    def _connects(self, gap: str) -> bool:
+        """Whether only connector words separate a negation from the value after it"""
+        return all(word in NEGATION_CONNECTORS for word in WORD_RE.findall(gap.lower()))
+
+    def _qualifier(self, masked: str, previous, key: str, start: int) -> Optional[Tuple[str, str]]:
+        """(qualifying dimension, table) when the previous dimension phrase only names
+        the table ``key`` belongs to: "customer industry" is customers.industry"""
+        if previous is None:
+            return None
+        previous_key, previous_end, added = previous
+        if not added or previous_key == key or not QUALIFIER_GAP_RE.match(masked[previous_end:start]):
+            return None
+        dimensions = self.catalog["dimensions"]
+        tables = sorted(set(dimensions[previous_key]["columns"]) & set(dimensions[key]["columns"]))
+        return (previous_key, tables[0]) if tables else None
+
+    def _build(
+        self, metrics, dimensions, qualifiers, grain, filters, excluded, time_range, top
+    ) -> Optional[Tuple[str, str]]:
+        metric_specs = [self.catalog["metrics"][key] for key in metrics]
+        base_name = metric_specs[0]["table"]
+        if any(spec["table"] != base_name for spec in metric_specs):
+            return None  # Metrics over different tables do not share one GROUP BY
+        base = self.tables[base_name]
+        joins = self.catalog["joins"].get(base_name, {})
+        from_clause = base
+        joined = set()
+
+        def resolve(dimension: str):
+            nonlocal from_clause
+            columns = self.catalog["dimensions"][dimension]["columns"]
+            if dimension in qualifiers:
+                # "customer region" means the customer's region, not the sale's
+                columns = {qualifiers[dimension]: columns[qualifiers[dimension]]}
+            if base_name in columns:
+                return base.c[columns[base_name]]
+            for other, (local, remote) in joins.items():
+                if other in columns:
+                    if other not in joined:
+                        from_clause = from_clause.join(self.tables[other], base.c[local] == self.tables[other].c[remote])
+                        joined.add(other)
+                    return self.tables[other].c[columns[other]]
+            return None
+
+        group_columns = []
+        for dimension in dimensions:
+            col = resolve(dimension)
+            if col is None:
+                return None
+            group_columns.append(col.label(col.name))
+        conditions = []
+        for dimension, values in filters.items():
+            col = resolve(dimension)
+            if col is None:
+                return None
+            conditions.append(col == values[0] if len(values) == 1 else col.in_(values))
+        for dimension, values in excluded.items():
+            col = resolve(dimension)
+            if col is None:
+                return None
+            conditions.append(col != values[0] if len(values) == 1 else col.notin_(values))
+
+        aggregates = []
+        for key, spec in zip(metrics, metric_specs):
+            if spec["agg"] == "count":
+                expression = func.count()
+            elif spec["agg"] == "avg":
+                expression = func.round(func.avg(base.c[spec["column"]]), 2)
+            else:
+                expression = func.sum(base.c[spec["column"]])
+            aggregates.append(expression.label(key))
+
+        date_column = base.c[self.catalog["tables"][base_name]["date_column"]]
+        if time_range:
+            start, end, _ = time_range
+            conditions.append(date_column >= start)
+            if end is not None:
+                conditions.append(date_column < end)
+
+        columns = []
+        if grain:
+            columns.append(func.date_trunc(grain, date_column).label(grain))
+        columns += group_columns
+        stmt = select(*columns, *aggregates).select_from(from_clause)
+        if conditions:
+            stmt = stmt.where(*conditions)
+        if columns:
+            stmt = stmt.group_by(*columns)
+            order = desc if not top or top[1] == "desc" else asc
+            if grain:
+                stmt = stmt.order_by(asc(columns[0]), *([order(aggregates[0])] if group_columns else []))
+            else:
+                stmt = stmt.order_by(order(aggregates[0]))
+            if top and not grain:
+                stmt = stmt.limit(top[0])
+
+        sql = str(stmt.compile(dialect=self.dialect, compile_kwargs={"literal_binds": True}))
+        sql = " ".join(sql.split()) + ";"
+
+        explanation = ", ".join(metrics).replace("_", " ").capitalize()
+        if grain:
+            explanation += f" by {grain}"
+        if group_columns:
+            explanation += " by " + " and ".join(col.name.replace("_", " ") for col in group_columns)
+        if filters:
+            explanation += " for " + ", ".join(", ".join(values) for values in filters.values())
+        if excluded:
+            explanation += " excluding " + ", ".join(", ".join(values) for values in excluded.values())
+        if time_range:
+            explanation += f" ({time_range[2]})"
+        if top and group_columns and not grain:
+            explanation += f", {'top' if top[1] == 'desc' else 'bottom'} {top[0]}"
+        return sql, explanation
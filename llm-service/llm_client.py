@@ -0,0 +1,192 @@
+import asyncio
+import random
+from typing import Any, Dict, List, Optional
+
+import httpx
+import structlog
+
+logger = structlog.get_logger()
+
+DEFAULT_BASE_URL = "https://api.openai.com/v1"
+
+
+class LLMError(Exception):
+    """Raised when a completion cannot be obtained"""
+
+
+class LLMStatusError(LLMError):
+    def __init__(self, message: str, status_code: Optional[int] = None, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+    @property
+    def retryable(self) -> bool:
+        # No status code means the request never got a response (connect/read error)
+        return self.status_code is None or self.status_code == 429 or self.status_code >= 500
+
+
+class LLMTimeoutError(LLMError):
+    """Raised when the per-call deadline expires, including time spent queued and retrying"""
+
+
+def parse_retry_after(headers: Any) -> Optional[float]:
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError, AttributeError):
+        return None
+
+
+class OpenAIBackend:
+    """Chat completions through the official async SDK"""
+
+    def __init__(self, api_key: str, base_url: Optional[str], http_client: httpx.AsyncClient):
+        import openai  # Only needed when this backend is selected
+
+        self._openai = openai
+        self._client = openai.AsyncOpenAI(
+            api_key=api_key,
+            base_url=base_url or DEFAULT_BASE_URL,
+            http_client=http_client,
+            max_retries=0  # Retries are handled by LLMClient so they share one deadline
+        )
+
+    async def complete(self, messages: List[Dict[str, str]], **params) -> str:
+        try:
+            response = await self._client.chat.completions.create(messages=messages, **params)
+        except self._openai.APIStatusError as e:
+            raise LLMStatusError(str(e), e.status_code, parse_retry_after(e.response.headers))
+        except self._openai.APIConnectionError as e:
+            raise LLMStatusError(str(e))
+        return response.choices[0].message.content
+
+    async def warm(self) -> None:
+        await self._client.models.list()
+
+    async def aclose(self) -> None:
+        await self._client.close()
+
+
+class HTTPBackend:
+    """Chat completions against any OpenAI-compatible endpoint with plain httpx"""
+
+    def __init__(self, api_key: Optional[str], base_url: Optional[str], http_client: httpx.AsyncClient):
+        self._url = f"{(base_url or DEFAULT_BASE_URL).rstrip('/')}/chat/completions"
+        self._models_url = f"{(base_url or DEFAULT_BASE_URL).rstrip('/')}/models"
+        self._headers = {"Authorization": f"Bearer {api_key}"} if api_key else {}
+        self._client = http_client
+
+    async def complete(self, messages: List[Dict[str, str]], **params) -> str:
+        try:
+            response = await self._client.post(self._url, json={"messages": messages, **params}, headers=self._headers)
+        except httpx.HTTPError as e:
+            raise LLMStatusError(str(e))
+        if response.status_code != 200:
+            raise LLMStatusError(
+                f"LLM endpoint returned {response.status_code}: {response.text[:200]}",
+                response.status_code,
+                parse_retry_after(response.headers)
+            )
+        return response.json()["choices"][0]["message"]["content"]
+
+    async def warm(self) -> None:
+        # Any response will do: the point is the pooled, already-handshaken connection
+        await self._client.get(self._models_url, headers=self._headers)
+
+    async def aclose(self) -> None:
+        await self._client.aclose()
+
+
+BACKENDS = {
+    "openai": OpenAIBackend,
+    "http": HTTPBackend,
+}
+
+
+class LLMClient:
+    """Shared, non-blocking LLM client.
+
+    At most ``max_in_flight`` completions run at once; callers beyond that
+    queue on a semaphore. Every call has one deadline covering queueing, the
+    request itself and any retries. 429/5xx and connection failures are
+    retried with full-jitter exponential backoff.
+    """
+
+    def __init__(
+        self,
+        backend,
+        max_in_flight: int = 8,
+        timeout: float = 25.0,
+        max_retries: int = 3,
+        backoff_base: float = 0.5,
+        backoff_max: float = 8.0,
+    ):
+        self.backend = backend
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.max_in_flight = max_in_flight
+        self.in_flight = 0
+        self.retries = 0
+        self._semaphore = asyncio.Semaphore(max_in_flight)
+
+    async def _attempt(self, messages: List[Dict[str, str]], params: Dict[str, Any]) -> str:
+        async with self._semaphore:
+            self.in_flight += 1
+            try:
+                return await self.backend.complete(messages, **params)
+            finally:
+                self.in_flight -= 1
+
+    async def complete(self, messages: List[Dict[str, str]], timeout: Optional[float] = None, **params) -> str:
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + (timeout or self.timeout)
+        attempt = 0
+        while True:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                raise LLMTimeoutError("LLM call deadline exceeded")
+            try:
+                return await asyncio.wait_for(self._attempt(messages, params), remaining)
+            except asyncio.TimeoutError:
+                raise LLMTimeoutError("LLM call deadline exceeded")
+            except LLMStatusError as e:
+                if not e.retryable or attempt >= self.max_retries:
+                    raise
+                delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+                if e.retry_after is not None:
+                    delay = max(delay, e.retry_after)
+                remaining = deadline - loop.time()
+                if delay >= remaining:
+                    raise
+                logger.warning(f"LLM call failed, retrying in {delay:.2f}s: {e}")
+                attempt += 1
+                self.retries += 1
+                await asyncio.sleep(delay)
+
+    async def warm(self) -> None:
+        """Open a connection to the LLM endpoint ahead of the first completion, without generating tokens"""
+        await self.backend.warm()
+
+    def stats(self) -> Dict[str, int]:
+        return {"max_in_flight": self.max_in_flight, "in_flight": self.in_flight, "retries": self.retries}
+
+    async def aclose(self) -> None:
+        await self.backend.aclose()
+
+
+def create_llm_client(
+    backend: str,
+    api_key: Optional[str],
+    base_url: Optional[str] = None,
+    max_connections: int = 20,
+    **options,
+) -> LLMClient:
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown LLM backend: {backend}")
+    http_client = httpx.AsyncClient(
+        limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+        timeout=httpx.Timeout(options.get("timeout", 25.0), connect=5.0)
+    )
+    return LLMClient(BACKENDS[backend](api_key, base_url, http_client), **options)
@@ -0,0 +1,168 @@
+"""Prometheus metrics and request context for the LLM service.
+
+Phases of SQL generation (schema reflection, intent matching, the LLM
+completion, validation) are timed with ``timed(phase)``. Prompt sizes and
+the source of each answer are recorded too. Pool, cache and client state is
+read from the components' ``stats()`` at scrape time.
+
+The gateway's X-Request-ID is bound to structlog's context for the whole
+request. When span propagation is on, an incoming ``traceparent`` makes the
+request a child span of the gateway's, and a "span" event is logged when it
+completes.
+"""
+import re
+import secrets
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, Tuple
+
+import structlog
+from fastapi.responses import Response
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, Counter, Histogram, generate_latest
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+logger = structlog.get_logger()
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route",
+    ["method", "route", "status"], buckets=LATENCY_BUCKETS
+)
+PHASE_DURATION = Histogram(
+    "phase_duration_seconds", "Time spent in each hot-path phase of a request",
+    ["phase"], buckets=LATENCY_BUCKETS
+)
+PROMPT_CHARS = Histogram(
+    "llm_prompt_chars", "Size of prompts sent to the LLM, in characters",
+    buckets=(500, 1000, 2000, 4000, 8000, 16000, 32000, 64000)
+)
+PROMPT_TABLES = Histogram(
+    "llm_prompt_tables", "Tables described in each prompt", buckets=(1, 2, 3, 4, 6, 8, 12, 16, 24)
+)
+SQL_SOURCE = Counter("sql_generated", "Generated SQL by where the answer came from", ["source"])
+
+TRACEPARENT_RE = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-[0-9a-f]{2}$")
+REQUEST_ID_RE = re.compile(r"^[A-Za-z0-9._:-]{1,128}$")
+
+
+@contextmanager
+def timed(phase: str) -> Iterator[None]:
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        PHASE_DURATION.labels(phase).observe(time.perf_counter() - start)
+
+
+class StatsCollector:
+    """Exports registered components' stats() as gauges and counters at scrape time"""
+
+    def __init__(self):
+        self.pools: Dict[str, Any] = {}
+        self.caches: Dict[str, Tuple[Callable[[], Dict[str, Any]], Dict[str, str]]] = {}
+        self.components: Dict[str, Callable[[], Dict[str, Any]]] = {}
+
+    def add_pool(self, name: str, engine: Any) -> None:
+        self.pools[name] = engine
+
+    def add_cache(self, name: str, stats: Callable[[], Dict[str, Any]], results: Dict[str, str]) -> None:
+        """``results`` maps a stats() key to the result label it counts, e.g. {"misses": "miss"}"""
+        self.caches[name] = (stats, results)
+
+    def add_component(self, name: str, stats: Callable[[], Dict[str, Any]]) -> None:
+        self.components[name] = stats
+
+    def collect(self):
+        pools = GaugeMetricFamily("db_pool_connections", "Database pool connections by state", labels=["pool", "state"])
+        for name, engine in self.pools.items():
+            pool = engine.pool
+            if not hasattr(pool, "checkedout"):
+                continue
+            pools.add_metric([name, "size"], pool.size())
+            pools.add_metric([name, "checked_out"], pool.checkedout())
+            pools.add_metric([name, "idle"], pool.checkedin())
+            pools.add_metric([name, "overflow"], max(pool.overflow(), 0))
+        yield pools
+
+        requests = CounterMetricFamily("cache_requests", "Cache lookups by result", labels=["cache", "result"])
+        ratios = GaugeMetricFamily("cache_hit_ratio", "Share of cache lookups that were hits", labels=["cache"])
+        for name, (stats, results) in self.caches.items():
+            values = stats()
+            counts = {result: 0 for result in results.values()}
+            for key, result in results.items():
+                counts[result] += values.get(key, 0)
+            for result, count in counts.items():
+                requests.add_metric([name, result], count)
+            hits = sum(count for result, count in counts.items() if result != "miss")
+            total = sum(counts.values())
+            ratios.add_metric([name], hits / total if total else 0.0)
+        yield requests
+        yield ratios
+
+        state = GaugeMetricFamily("component_state", "Numeric state of clients and caches", labels=["component", "stat"])
+        for name, stats in self.components.items():
+            for key, value in stats().items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    state.add_metric([name, key], value)
+        yield state
+
+
+collector = StatsCollector()
+REGISTRY.register(collector)
+
+
+def metrics_response() -> Response:
+    return Response(generate_latest(REGISTRY), media_type=CONTENT_TYPE_LATEST)
+
+
+class RequestContextMiddleware:
+    """ASGI middleware binding the request id and trace context, and timing each request"""
+
+    def __init__(self, app, propagate_spans: bool = False):
+        self.app = app
+        self.propagate_spans = propagate_spans
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope["headers"])
+        request_id = headers.get(b"x-request-id", b"").decode("latin-1")
+        if not REQUEST_ID_RE.match(request_id):
+            request_id = secrets.token_hex(16)
+        context = {"request_id": request_id}
+        parent_span_id = None
+        if self.propagate_spans:
+            match = TRACEPARENT_RE.match(headers.get(b"traceparent", b"").decode("latin-1"))
+            trace_id, parent_span_id = match.groups() if match else (secrets.token_hex(16), None)
+            context.update(trace_id=trace_id, span_id=secrets.token_hex(8))
+        structlog.contextvars.clear_contextvars()
+        structlog.contextvars.bind_contextvars(**context)
+
+        status = 500
+
+        async def send_with_request_id(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message["headers"] = [*message.get("headers", []), (b"x-request-id", request_id.encode())]
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_request_id)
+        finally:
+            elapsed = time.perf_counter() - start
+            route_path = getattr(scope.get("route"), "path", "unmatched")
+            REQUEST_DURATION.labels(scope["method"], route_path, str(status)).observe(elapsed)
+            if self.propagate_spans:
+                logger.info(
+                    "span",
+                    name=f"{scope['method']} {route_path}",
+                    parent_span_id=parent_span_id,
+                    status=status,
+                    duration_ms=round(elapsed * 1000, 2)
+                )
+            structlog.contextvars.clear_contextvars()
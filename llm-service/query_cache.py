@@ -0,0 +1,157 @@
+import re
+import time
+from collections import Counter, OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, FrozenSet, Iterable, Optional, Set, Tuple
+
+WORD_RE = re.compile(r"[a-z0-9]+")
+
+# Words that can differ between two phrasings of the same question. Anything
+# else (measures, dimensions, filter values, direction, time, negation, numbers)
+# is a content term and must match exactly for a near-duplicate to count.
+STOPWORDS = frozenset({
+    "a", "an", "the", "of", "for", "to", "me", "us", "i", "we", "you", "my", "our",
+    "please", "can", "could", "would", "will", "do", "does", "did", "want", "need", "like",
+    "show", "list", "give", "get", "display", "find", "tell", "see", "return", "fetch",
+    "what", "which", "is", "are", "was", "were", "be", "there", "all", "and",
+})
+
+
+def normalize_question(question: str) -> str:
+    return " ".join(WORD_RE.findall(question.lower()))
+
+
+def content_terms(normalized: str) -> FrozenSet[str]:
+    """Non-stopword tokens, with a plural "s" dropped so product matches products"""
+    return frozenset(
+        word[:-1] if len(word) > 3 and word.endswith("s") and not word.endswith("ss") else word
+        for word in normalized.split() if word not in STOPWORDS
+    )
+
+
+def trigrams(normalized: str) -> FrozenSet[str]:
+    padded = f"  {normalized} "
+    return frozenset(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+@dataclass
+class CachedSQL:
+    question: str
+    sql: str
+    explanation: Optional[str] = None
+    terms: FrozenSet[str] = frozenset()
+    grams: FrozenSet[str] = frozenset()
+    stored_at: float = field(default_factory=time.time)
+
+
+class QueryCache:
+    """Two-tier cache of generated SQL keyed by the user's question.
+
+    Tier one is an exact match on the normalized question. Tier two finds
+    near-duplicates by character-trigram Jaccard similarity through an inverted
+    index. A near-duplicate only counts if it has the same content terms, so it
+    may differ in stopwords and plurals but never in a number, a filter value
+    or a direction: "top 5 products" never answers "top 10 products", nor "sales
+    in north america" "sales in south america". The whole cache is dropped when
+    the schema fingerprint changes.
+    """
+
+    def __init__(self, max_entries: int = 5000, similarity_threshold: float = 0.85):
+        self.max_entries = max_entries
+        self.similarity_threshold = similarity_threshold
+        self.fingerprint: Optional[str] = None
+        self._entries: "OrderedDict[str, CachedSQL]" = OrderedDict()
+        self._postings: Dict[str, Set[str]] = {}
+        self.exact_hits = 0
+        self.similar_hits = 0
+        self.misses = 0
+
+    def check_fingerprint(self, fingerprint: Optional[str]) -> None:
+        """Drop every entry if the schema changed since the cache was filled"""
+        if fingerprint != self.fingerprint:
+            if self.fingerprint is not None:
+                self.clear()
+            self.fingerprint = fingerprint
+
+    def lookup(self, question: str) -> Optional[Tuple[CachedSQL, str, float]]:
+        """Return (entry, "exact" | "similar", similarity) or None"""
+        normalized = normalize_question(question)
+        entry = self._entries.get(normalized)
+        if entry is not None:
+            self._entries.move_to_end(normalized)
+            self.exact_hits += 1
+            return entry, "exact", 1.0
+
+        grams = trigrams(normalized)
+        terms = content_terms(normalized)
+        shared = Counter()
+        for gram in grams:
+            shared.update(self._postings.get(gram, ()))
+
+        best, best_score = None, 0.0
+        for candidate, overlap in shared.items():
+            entry = self._entries[candidate]
+            score = overlap / (len(grams) + len(entry.grams) - overlap)
+            if score > best_score and entry.terms == terms:
+                best, best_score = entry, score
+
+        if best is not None and best_score >= self.similarity_threshold:
+            self._entries.move_to_end(normalize_question(best.question))
+            self.similar_hits += 1
+            return best, "similar", best_score
+
+        self.misses += 1
+        return None
+
+    def store(self, question: str, sql: str, explanation: Optional[str] = None) -> None:
+        normalized = normalize_question(question)
+        if not normalized:
+            return
+        if normalized in self._entries:
+            self._remove(normalized)
+        grams = trigrams(normalized)
+        self._entries[normalized] = CachedSQL(
+            question=question,
+            sql=sql,
+            explanation=explanation,
+            terms=content_terms(normalized),
+            grams=grams
+        )
+        for gram in grams:
+            self._postings.setdefault(gram, set()).add(normalized)
+        while len(self._entries) > self.max_entries:
+            self._remove(next(iter(self._entries)))
+
+    def warm(self, history: Iterable[Tuple[str, str]]) -> int:
+        """Seed from (question, sql) pairs, oldest first so recent ones win eviction"""
+        count = 0
+        for question, sql in history:
+            self.store(question, sql)
+            count += 1
+        return count
+
+    def _remove(self, normalized: str) -> None:
+        entry = self._entries.pop(normalized, None)
+        if entry is None:
+            return
+        for gram in entry.grams:
+            keys = self._postings.get(gram)
+            if keys is not None:
+                keys.discard(normalized)
+                if not keys:
+                    del self._postings[gram]
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._postings.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.exact_hits + self.similar_hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "exact_hits": self.exact_hits,
+            "similar_hits": self.similar_hits,
+            "misses": self.misses,
+            "hit_ratio": (self.exact_hits + self.similar_hits) / lookups if lookups else 0.0,
+            "fingerprint": self.fingerprint,
+        }
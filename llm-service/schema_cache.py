@@ -0,0 +1,146 @@
+import asyncio
+import threading
+import time
+from typing import Any, Dict, Optional
+
+import structlog
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+logger = structlog.get_logger()
+
+# All columns of all base tables in one catalog round-trip
+SCHEMA_QUERY = text("""
+    SELECT c.table_name, c.column_name, c.data_type, c.character_maximum_length,
+           c.numeric_precision, c.numeric_scale, c.is_nullable, c.column_default
+    FROM information_schema.columns c
+    JOIN information_schema.tables t
+      ON t.table_schema = c.table_schema AND t.table_name = c.table_name
+    WHERE c.table_schema = :schema AND t.table_type = 'BASE TABLE'
+    ORDER BY c.table_name, c.ordinal_position
+""")
+
+FOREIGN_KEY_QUERY = text("""
+    SELECT tc.table_name, kcu.column_name,
+           ccu.table_name AS foreign_table, ccu.column_name AS foreign_column
+    FROM information_schema.table_constraints tc
+    JOIN information_schema.key_column_usage kcu
+      ON kcu.constraint_name = tc.constraint_name AND kcu.table_schema = tc.table_schema
+    JOIN information_schema.constraint_column_usage ccu
+      ON ccu.constraint_name = tc.constraint_name AND ccu.table_schema = tc.table_schema
+    WHERE tc.constraint_type = 'FOREIGN KEY' AND tc.table_schema = :schema
+    ORDER BY tc.table_name, kcu.column_name
+""")
+
+# Changes whenever a table or column is added, dropped, renamed or retyped
+FINGERPRINT_QUERY = text("""
+    SELECT md5(string_agg(
+        c.relname || '.' || a.attname || ':' || a.atttypid || ':' || a.atttypmod || ':' || a.attnotnull,
+        ',' ORDER BY c.relname, a.attnum
+    ))
+    FROM pg_attribute a
+    JOIN pg_class c ON c.oid = a.attrelid
+    JOIN pg_namespace n ON n.oid = c.relnamespace
+    WHERE n.nspname = :schema AND c.relkind IN ('r', 'p') AND a.attnum > 0 AND NOT a.attisdropped
+""")
+
+
+def format_column_type(data_type: str, char_length: Optional[int], precision: Optional[int], scale: Optional[int]) -> str:
+    type_name = data_type.upper()
+    if char_length:
+        return f"{type_name}({char_length})"
+    if type_name == "NUMERIC" and precision:
+        return f"NUMERIC({precision}, {scale or 0})"
+    return type_name
+
+
+class SchemaCache:
+    """In-process copy of the database schema.
+
+    The schema is reloaded with one bulk catalog query when the cheap DDL
+    fingerprint changes (checked at most every ``check_interval`` seconds) or
+    when the snapshot is older than ``ttl``.
+    """
+
+    def __init__(self, engine: Engine, schema: str = "public", ttl: float = 3600.0, check_interval: float = 30.0):
+        self.engine = engine
+        self.schema = schema
+        self.ttl = ttl
+        self.check_interval = check_interval
+        self.info: Optional[Dict[str, Any]] = None
+        self.fingerprint: Optional[str] = None
+        self._loaded_at = 0.0
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def is_fresh(self) -> bool:
+        return self.info is not None and time.monotonic() - self._checked_at < self.check_interval
+
+    def get(self) -> Dict[str, Any]:
+        if self.is_fresh():
+            return self.info
+        with self._lock:
+            if self.is_fresh():
+                return self.info
+            try:
+                self._refresh()
+            except Exception:
+                if self.info is None:
+                    raise
+                logger.exception("Schema refresh failed, serving cached schema")
+                self._checked_at = time.monotonic()
+            return self.info
+
+    async def aget(self) -> Dict[str, Any]:
+        """Like get(), but only leaves the event loop when the catalog must be queried"""
+        if self.is_fresh():
+            return self.info
+        return await asyncio.to_thread(self.get)
+
+    def invalidate(self) -> None:
+        self._checked_at = 0.0
+        self._loaded_at = 0.0
+
+    def _refresh(self) -> None:
+        with self.engine.connect() as conn:
+            fingerprint = conn.execute(FINGERPRINT_QUERY, {"schema": self.schema}).scalar()
+            expired = time.monotonic() - self._loaded_at >= self.ttl
+            if self.info is None or expired or fingerprint != self.fingerprint:
+                rows = conn.execute(SCHEMA_QUERY, {"schema": self.schema}).fetchall()
+                foreign_keys = conn.execute(FOREIGN_KEY_QUERY, {"schema": self.schema}).fetchall()
+                self.info = self._build(rows, foreign_keys)
+                self.fingerprint = fingerprint
+                self._loaded_at = time.monotonic()
+                logger.info("Database schema loaded", tables=len(self.info["tables"]), fingerprint=fingerprint)
+        self._checked_at = time.monotonic()
+
+    @staticmethod
+    def _build(rows, foreign_keys) -> Dict[str, Any]:
+        schema_info = {
+            "tables": [],
+            "columns": {},
+            "foreign_keys": [
+                {
+                    "table": fk.table_name,
+                    "column": fk.column_name,
+                    "foreign_table": fk.foreign_table,
+                    "foreign_column": fk.foreign_column
+                }
+                for fk in foreign_keys
+            ]
+        }
+        for row in rows:
+            schema_info["columns"].setdefault(row.table_name, []).append({
+                "name": row.column_name,
+                "type": format_column_type(
+                    row.data_type, row.character_maximum_length, row.numeric_precision, row.numeric_scale
+                ),
+                "nullable": row.is_nullable == "YES",
+                "default": row.column_default
+            })
+        for table, columns in schema_info["columns"].items():
+            schema_info["tables"].append({
+                "name": table,
+                "column_count": len(columns)
+            })
+        return schema_info
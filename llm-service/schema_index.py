@@ -0,0 +1,154 @@
+import math
+import re
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+# Words that carry no schema meaning, in questions or in column names like created_by
+STOPWORDS = {
+    "a", "an", "and", "are", "at", "by", "do", "for", "from", "have", "how", "id", "in", "is", "it",
+    "list", "many", "me", "much", "of", "on", "or", "per", "show", "the", "to", "was", "we", "what",
+    "which", "who", "with",
+}
+
+# Business vocabulary that does not appear literally in table or column names
+SYNONYMS = {
+    "revenue": ["sales", "amount", "total"],
+    "sold": ["sales", "quantity"],
+    "sell": ["sales"],
+    "order": ["sales"],
+    "transaction": ["sales"],
+    "unit": ["quantity"],
+    "client": ["customer"],
+    "buyer": ["customer"],
+    "item": ["product"],
+    "sku": ["product"],
+    "rep": ["sales", "rep"],
+    "salesperson": ["sales", "rep"],
+    "margin": ["price", "cost"],
+    "profit": ["price", "cost"],
+    "vendor": ["supplier"],
+    "sector": ["industry"],
+    "month": ["date"],
+    "year": ["date"],
+    "week": ["date"],
+    "daily": ["date"],
+}
+
+# Table names count more than column names when matching a question
+TABLE_NAME_WEIGHT = 3
+# Tables scoring below this fraction of the best match are left out
+RELATIVE_SCORE_CUTOFF = 0.3
+
+
+def normalize_token(token: str) -> str:
+    if len(token) > 4 and token.endswith("ies"):
+        return token[:-3] + "y"
+    if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+        return token[:-1]
+    return token
+
+
+def tokenize(text: str) -> List[str]:
+    return [
+        normalize_token(token) for token in TOKEN_RE.findall(text.lower().replace("_", " "))
+        if token not in STOPWORDS
+    ]
+
+
+class SchemaIndex:
+    """TF-IDF index over table and column names used to prune the prompt schema.
+
+    Vectors are computed once per schema snapshot; answering a question is a
+    sparse dot product per allowed table.
+    """
+
+    def __init__(
+        self,
+        schema_info: Dict[str, Any],
+        allow: Optional[Iterable[str]] = None,
+        deny: Iterable[str] = (),
+        top_k: int = 4,
+        expand_foreign_keys: bool = True,
+    ):
+        allow = set(allow) if allow else None
+        deny = set(deny)
+        self.top_k = top_k
+        self.expand_foreign_keys = expand_foreign_keys
+        self.tables = [
+            table["name"] for table in schema_info["tables"]
+            if (allow is None or table["name"] in allow) and table["name"] not in deny
+        ]
+
+        documents = {}
+        for table in self.tables:
+            terms = Counter()
+            for token in tokenize(table):
+                terms[token] += TABLE_NAME_WEIGHT
+            for column in schema_info["columns"].get(table, []):
+                terms.update(tokenize(column["name"]))
+            documents[table] = terms
+
+        document_frequency = Counter(term for terms in documents.values() for term in terms)
+        table_count = len(documents)
+        self.idf = {
+            term: math.log((table_count + 1) / (count + 1)) + 1
+            for term, count in document_frequency.items()
+        }
+        self.vectors = {}
+        for table, terms in documents.items():
+            vector = {term: weight * self.idf[term] for term, weight in terms.items()}
+            norm = math.sqrt(sum(value * value for value in vector.values())) or 1.0
+            self.vectors[table] = {term: value / norm for term, value in vector.items()}
+
+        allowed = set(self.tables)
+        self.neighbours: Dict[str, Set[str]] = {table: set() for table in self.tables}
+        for fk in schema_info.get("foreign_keys", []):
+            if fk["table"] in allowed and fk["foreign_table"] in allowed and fk["table"] != fk["foreign_table"]:
+                self.neighbours[fk["table"]].add(fk["foreign_table"])
+                self.neighbours[fk["foreign_table"]].add(fk["table"])
+
+    def query_terms(self, question: str) -> Counter:
+        terms = Counter()
+        for token in tokenize(question):
+            terms[token] += 1
+            for synonym in SYNONYMS.get(token, ()):
+                # Normalized like indexed tokens, so "sales" meets sales_data's "sale"
+                terms[normalize_token(synonym)] += 0.5
+        return terms
+
+    def select(self, question: str) -> List[str]:
+        """Tables most relevant to the question, plus their foreign-key neighbours"""
+        terms = self.query_terms(question)
+        scores = {
+            table: sum(vector.get(term, 0.0) * count * self.idf.get(term, 0.0) for term, count in terms.items())
+            for table, vector in self.vectors.items()
+        }
+        best = max(scores.values(), default=0.0)
+        if best <= 0:
+            return list(self.tables)
+        ranked = [
+            table for table, score in sorted(scores.items(), key=lambda item: -item[1])
+            if score >= best * RELATIVE_SCORE_CUTOFF
+        ]
+
+        selected = ranked[:self.top_k]
+        if self.expand_foreign_keys:
+            for table in list(selected):
+                for neighbour in sorted(self.neighbours[table]):
+                    if neighbour not in selected:
+                        selected.append(neighbour)
+        return selected
+
+    @staticmethod
+    def restrict(schema_info: Dict[str, Any], tables: List[str]) -> Dict[str, Any]:
+        chosen = set(tables)
+        return {
+            "tables": [table for table in schema_info["tables"] if table["name"] in chosen],
+            "columns": {name: columns for name, columns in schema_info["columns"].items() if name in chosen},
+            "foreign_keys": [
+                fk for fk in schema_info.get("foreign_keys", [])
+                if fk["table"] in chosen and fk["foreign_table"] in chosen
+            ]
+        }
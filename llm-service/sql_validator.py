@@ -0,0 +1,231 @@
+import hashlib
+from collections import OrderedDict
+from typing import Iterable, List, Optional, Set, Tuple
+
+from sqlparse import lexer, tokens as T
+
+Verdict = Tuple[bool, Optional[str]]
+
+# Keywords that never belong in a read-only query, matched at token level so
+# identifiers such as created_at or updated_at are not mistaken for them
+FORBIDDEN_KEYWORDS = {
+    "INSERT", "UPDATE", "DELETE", "MERGE", "UPSERT", "REPLACE",
+    "CREATE", "DROP", "ALTER", "TRUNCATE", "RENAME",
+    "GRANT", "REVOKE", "COPY", "INTO", "CALL", "EXECUTE", "PREPARE", "DO",
+    "VACUUM", "REINDEX", "CLUSTER", "LOCK", "SET", "RESET", "LISTEN", "NOTIFY",
+}
+
+# Functions with side effects, file or network access, or that can stall a backend
+FORBIDDEN_FUNCTIONS = {
+    "pg_sleep", "pg_sleep_for", "pg_sleep_until",
+    "pg_read_file", "pg_read_binary_file", "pg_ls_dir", "pg_stat_file",
+    "pg_terminate_backend", "pg_cancel_backend", "pg_reload_conf", "pg_rotate_logfile",
+    "pg_advisory_lock", "pg_advisory_xact_lock", "pg_try_advisory_lock",
+    "lo_import", "lo_export", "dblink", "dblink_exec", "set_config",
+    "query_to_xml", "table_to_xml", "nextval", "setval",
+}
+
+# Keywords after which a table name follows; TABLE x is shorthand for SELECT * FROM x
+TABLE_KEYWORDS = {"FROM", "TABLE"}
+# Keywords that may sit between FROM/JOIN and the table name
+TABLE_PREFIX_KEYWORDS = {"ONLY", "LATERAL"}
+# Words that may sit between a CTE's AS and its body: AS [NOT] MATERIALIZED (...)
+CTE_BODY_PREFIX = {"NOT", "MATERIALIZED"}
+# Clauses that close a FROM list; commas after them no longer introduce tables
+FROM_LIST_END = {
+    "WHERE", "GROUP BY", "HAVING", "WINDOW", "ORDER BY", "LIMIT", "OFFSET", "FETCH",
+    "UNION", "INTERSECT", "EXCEPT", "FOR", "RETURNING",
+}
+
+SKIPPED = (T.Whitespace, T.Newline, T.Comment)
+
+# What opened a parenthesis: a subquery, a parenthesised join in FROM, or an
+# expression/function call (whose FROM, as in extract(year FROM x), is not a table)
+QUERY, JOIN, EXPRESSION = "query", "join", "expression"
+
+
+class Level:
+    __slots__ = ("kind", "from_list", "ctes", "recursive", "defines")
+
+    def __init__(self, kind: str, from_list: bool = False, defines: Optional[str] = None):
+        self.kind = kind
+        self.from_list = from_list  # Inside FROM ... : commas introduce more tables
+        self.ctes: Set[str] = set()  # CTE names visible from here on in this query
+        self.recursive = False  # WITH RECURSIVE: CTEs are visible in their own bodies
+        self.defines = defines  # Name of the CTE whose body this parenthesis holds
+
+
+def significant_tokens(sql: str) -> List[Tuple[object, str]]:
+    return [(ttype, value) for ttype, value in lexer.tokenize(sql) if not any(ttype in t for t in SKIPPED)]
+
+
+def identifier(value: str) -> str:
+    if value.startswith('"') and value.endswith('"'):
+        return value[1:-1]
+    return value.lower()
+
+
+class SQLValidator:
+    """Single-pass, token-level validator for generated read-only SQL.
+
+    The lexer output is walked once without sqlparse's grouping step. Only one
+    SELECT (or WITH ... SELECT) statement is accepted, forbidden keywords and
+    functions are matched against tokens, and every table named after FROM,
+    JOIN or TABLE must be in ``allowed_tables`` when one is given. A name only
+    refers to a CTE after that CTE's body and within the query that defines it,
+    so ``WITH t AS (SELECT * FROM t)`` still checks the real table ``t``.
+    Verdicts are memoized by SQL hash.
+    """
+
+    def __init__(self, allowed_tables: Optional[Iterable[str]] = None, cache_size: int = 4096):
+        self.allowed_tables: Optional[Set[str]] = (
+            {table.lower() for table in allowed_tables} if allowed_tables is not None else None
+        )
+        self.cache_size = cache_size
+        self._verdicts: "OrderedDict[bytes, Verdict]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def validate(self, sql: str) -> Verdict:
+        key = hashlib.blake2b(sql.encode(), digest_size=16).digest()
+        verdict = self._verdicts.get(key)
+        if verdict is not None:
+            self._verdicts.move_to_end(key)
+            self.hits += 1
+            return verdict
+        self.misses += 1
+        verdict = self._validate(sql)
+        self._verdicts[key] = verdict
+        if len(self._verdicts) > self.cache_size:
+            self._verdicts.popitem(last=False)
+        return verdict
+
+    def _validate(self, sql: str) -> Verdict:
+        tokens = significant_tokens(sql)
+        if not tokens:
+            return False, "Empty or invalid SQL"
+
+        first_type, first_value = tokens[0]
+        if not (first_value == "(" or first_type in T.CTE or (first_type in T.DML and first_value.upper() == "SELECT")):
+            return False, f"Only SELECT queries are allowed, got {first_value.upper()}"
+
+        # One Level per open parenthesis, innermost last
+        levels = [Level(QUERY)]
+        expect_table = False
+        tables: Set[str] = set()
+        cte_body: Optional[str] = None  # CTE whose body the next "(" opens
+        count = len(tokens)
+
+        for i, (ttype, value) in enumerate(tokens):
+            next_value = tokens[i + 1][1].upper() if i + 1 < count else None
+            upper = value.upper()
+            level = levels[-1]
+
+            if ttype in T.Error:
+                return False, f"Invalid token: {value}"
+            if value == ";":
+                if i + 1 < count:
+                    return False, "Only a single statement is allowed"
+                continue
+            if value == "(":
+                if cte_body is not None:
+                    levels.append(Level(QUERY, defines=cte_body))
+                    cte_body = None
+                elif next_value in ("SELECT", "WITH", "TABLE", "VALUES"):
+                    levels.append(Level(QUERY))
+                elif expect_table:
+                    levels.append(Level(JOIN, from_list=True))  # FROM (a JOIN b ON ...)
+                    continue
+                else:
+                    levels.append(Level(EXPRESSION))
+                expect_table = False
+                continue
+            if value == ")":
+                if len(levels) == 1:
+                    return False, "Unbalanced parentheses"
+                closed = levels.pop()
+                if closed.defines is not None:
+                    levels[-1].ctes.add(closed.defines)  # Visible to what follows the body
+                expect_table = False
+                continue
+
+            is_call = next_value == "("
+            if is_call and value.lower() in FORBIDDEN_FUNCTIONS:
+                return False, f"Function not allowed: {value.lower()}"
+
+            if expect_table and (ttype in T.Name or ttype in T.Keyword or ttype in T.Literal.String.Symbol):
+                if ttype in T.Keyword and upper in TABLE_PREFIX_KEYWORDS:
+                    continue
+                expect_table = False
+                if is_call:
+                    continue  # Set-returning function such as generate_series()
+                # Schema-qualified names arrive as name "." name; keep the last part
+                name, j = identifier(value), i
+                while j + 2 < count and tokens[j + 1][1] == ".":
+                    if name != "public":
+                        return False, f"Schema not allowed: {name}"
+                    j += 2
+                    name = identifier(tokens[j][1])
+                if j == i and any(name in outer.ctes for outer in levels):
+                    continue  # Reference to a CTE in scope
+                tables.add(name)
+                continue
+
+            if ttype in T.Keyword:
+                # Keyword-named functions such as replace(), left() or right() are fine
+                forbidden = (ttype in T.DML and upper != "SELECT") or ttype in T.DDL or upper in FORBIDDEN_KEYWORDS
+                if forbidden and not is_call:
+                    return False, f"Operation not allowed: {upper}"
+                if ttype in T.CTE and next_value == "RECURSIVE":
+                    level.recursive = True
+                elif upper == "AS" and self._cte_body_follows(tokens, i):
+                    cte_body = self._cte_name(tokens, i)
+                    if level.recursive:
+                        level.ctes.add(cte_body)
+                elif level.kind == EXPRESSION:
+                    continue  # FROM inside extract(), substring(), trim() ...
+                elif upper in TABLE_KEYWORDS or upper.split()[-1] == "JOIN":
+                    expect_table = True
+                    level.from_list = True
+                elif upper in FROM_LIST_END:
+                    level.from_list = False
+                continue
+
+            if value == "," and level.from_list:
+                expect_table = True
+
+        if len(levels) != 1:
+            return False, "Unbalanced parentheses"
+        if self.allowed_tables is not None:
+            unknown = sorted(tables - self.allowed_tables)
+            if unknown:
+                return False, f"Table not allowed: {', '.join(unknown)}"
+        return True, None
+
+    @staticmethod
+    def _cte_body_follows(tokens: List[Tuple[object, str]], as_index: int) -> bool:
+        """Whether ``AS`` opens a CTE body: AS (...) or AS [NOT] MATERIALIZED (...)"""
+        j = as_index + 1
+        while j < len(tokens) and tokens[j][1].upper() in CTE_BODY_PREFIX:
+            j += 1
+        return j < len(tokens) and tokens[j][1] == "("
+
+    @staticmethod
+    def _cte_name(tokens: List[Tuple[object, str]], as_index: int) -> str:
+        """Name before ``AS (``, skipping an optional column list: name (a, b) AS (...)"""
+        j = as_index - 1
+        if tokens[j][1] == ")":
+            depth = 0
+            while j > 0:
+                depth += {")": 1, "(": -1}.get(tokens[j][1], 0)
+                if depth == 0:
+                    break
+                j -= 1
+            j -= 1
+        return identifier(tokens[j][1]) if j >= 0 else ""
+
+    def clear(self) -> None:
+        self._verdicts.clear()
+
+    def stats(self) -> dict:
+        return {"entries": len(self._verdicts), "hits": self.hits, "misses": self.misses}
@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# The service is a flat set of modules run from its own directory (uvicorn main:app)
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
@@ -0,0 +1,107 @@
+from datetime import date
+
+import pytest
+
+from intent_engine import IntentEngine
+
+TODAY = date(2024, 6, 15)
+
+
+@pytest.fixture(scope="module")
+def engine():
+    engine = IntentEngine()
+    engine.set_vocabulary({
+        "region": ["Europe", "Asia", "North America", "South America"],
+        "category": ["Hardware", "Software", "Services"],
+        "industry": ["Retail", "Technology"],
+    })
+    return engine
+
+
+def match(engine, question):
+    return engine.match(question, today=TODAY)
+
+
+def test_metric_only(engine):
+    result = match(engine, "total sales")
+    assert result.sql == "SELECT sum(sales_data.total_amount) AS revenue FROM sales_data;"
+    assert result.confidence == 0.95
+
+
+def test_dimension_with_top_n(engine):
+    result = match(engine, "top 5 products by revenue")
+    assert result.sql == (
+        "SELECT sales_data.product_name AS product_name, sum(sales_data.total_amount) AS revenue "
+        "FROM sales_data GROUP BY sales_data.product_name ORDER BY revenue DESC LIMIT 5;"
+    )
+
+
+def test_filter_and_date_range(engine):
+    result = match(engine, "revenue in europe last month")
+    assert "sales_data.region = 'Europe'" in result.sql
+    assert "sales_data.sale_date >= '2024-05-01' AND sales_data.sale_date < '2024-06-01'" in result.sql
+
+
+@pytest.mark.parametrize("question, condition", [
+    ("total sales not in europe", "sales_data.region != 'Europe'"),
+    ("total sales except hardware", "sales_data.category != 'Hardware'"),
+    ("total sales excluding europe and asia", "sales_data.region NOT IN ('Europe', 'Asia')"),
+    ("revenue by region other than north america", "sales_data.region != 'North America'"),
+    ("revenue by category except for the software category", "sales_data.category != 'Software'"),
+    ("revenue for non-hardware sales", "sales_data.category != 'Hardware'"),
+    ("revenue outside of asia", "sales_data.region != 'Asia'"),
+])
+def test_negated_values_are_excluded(engine, question, condition):
+    result = match(engine, question)
+    assert condition in result.sql
+    assert " = '" not in result.sql and " IN (" not in result.sql.replace("NOT IN (", "")
+
+
+def test_negation_and_inclusion_together(engine):
+    result = match(engine, "total sales in europe except hardware")
+    assert "sales_data.category != 'Hardware'" in result.sql
+    assert "sales_data.region = 'Europe'" in result.sql
+    assert result.intent["filters"] == {"region": ["Europe"]}
+    assert result.intent["excluded"] == {"category": ["Hardware"]}
+
+
+@pytest.mark.parametrize("question", [
+    "regions that did not buy hardware",
+    "which regions didn't buy software",
+    "total sales not by region",
+    "revenue not in 2023",
+    "total sales without discounts",
+])
+def test_negation_that_excludes_no_value_is_not_matched(engine, question):
+    assert match(engine, question) is None
+
+
+@pytest.mark.parametrize("question", ["total sales per customer industry", "revenue by customer's industry"])
+def test_customer_attribute_groups_by_the_attribute_only(engine, question):
+    result = match(engine, question)
+    assert result.intent["dimensions"] == ["industry"]
+    assert "GROUP BY customers.industry ORDER BY" in result.sql
+    assert "customer_name" not in result.sql
+
+
+def test_qualified_dimension_reads_the_qualifying_table(engine):
+    result = match(engine, "revenue by customer region")
+    assert "GROUP BY customers.region" in result.sql
+    assert "JOIN customers ON sales_data.customer_id = customers.id" in result.sql
+    # Unqualified, region is the sale's own region
+    assert "GROUP BY sales_data.region" in match(engine, "revenue by region").sql
+
+
+def test_customer_alone_still_groups_by_customer_name(engine):
+    assert "GROUP BY customers.customer_name" in match(engine, "total sales by customer").sql
+
+
+def test_uncovered_words_lower_confidence(engine):
+    assert match(engine, "total sales growth rate by region").confidence < 0.8
+
+
+def test_rendered_sql_is_memoized(engine):
+    first = match(engine, "total sales by region in asia")
+    second = match(engine, "sales by region for asia")
+    assert first.sql == second.sql
+    assert len(engine._rendered) <= engine.cache_size
@@ -0,0 +1,189 @@
+import asyncio
+
+import httpx
+import pytest
+
+import llm_client
+from llm_client import HTTPBackend, LLMClient, LLMStatusError, LLMTimeoutError
+
+MESSAGES = [{"role": "user", "content": "total sales"}]
+
+
+class Endpoint:
+    """MockTransport handler for /chat/completions answering with queued outcomes: a status
+    code, (status, headers), or an exception. It also records how many requests overlap."""
+
+    def __init__(self, *outcomes, latency=0.0):
+        self.outcomes = list(outcomes)
+        self.latency = latency
+        self.requests = 0
+        self.running = 0
+        self.peak = 0
+
+    async def __call__(self, request):
+        self.requests += 1
+        self.running += 1
+        self.peak = max(self.peak, self.running)
+        try:
+            await asyncio.sleep(self.latency)
+        finally:
+            self.running -= 1
+        outcome = self.outcomes.pop(0) if self.outcomes else 200
+        if isinstance(outcome, Exception):
+            raise outcome
+        status, headers = outcome if isinstance(outcome, tuple) else (outcome, {})
+        if status != 200:
+            return httpx.Response(status, headers=headers, text="upstream says no")
+        return httpx.Response(200, json={"choices": [{"message": {"content": "SELECT 1"}}]})
+
+
+def client(endpoint, **options):
+    http = httpx.AsyncClient(transport=httpx.MockTransport(endpoint))
+    return LLMClient(HTTPBackend("key", "http://llm/v1", http), **{"backoff_base": 0.001, **options})
+
+
+def complete(llm, **kwargs):
+    async def main():
+        try:
+            return await llm.complete(MESSAGES, **kwargs)
+        finally:
+            await llm.aclose()
+
+    return asyncio.run(main())
+
+
+def test_rate_limits_and_server_errors_are_retried():
+    endpoint = Endpoint(429, 502, 503)
+    llm = client(endpoint)
+
+    assert complete(llm) == "SELECT 1"
+    assert endpoint.requests == 4
+    assert llm.stats()["retries"] == 3
+
+
+def test_connection_errors_are_retried():
+    endpoint = Endpoint(httpx.ConnectError("refused"))
+
+    assert complete(client(endpoint)) == "SELECT 1"
+    assert endpoint.requests == 2
+
+
+def test_retries_stop_after_max_retries():
+    endpoint = Endpoint(*[500] * 10)
+
+    with pytest.raises(LLMStatusError) as raised:
+        complete(client(endpoint, max_retries=2))
+
+    assert raised.value.status_code == 500
+    assert endpoint.requests == 3
+
+
+@pytest.mark.parametrize("status", [400, 401, 403, 404, 422])
+def test_client_errors_other_than_429_are_not_retried(status):
+    endpoint = Endpoint(status)
+    llm = client(endpoint)
+
+    with pytest.raises(LLMStatusError) as raised:
+        complete(llm)
+
+    assert raised.value.status_code == status
+    assert endpoint.requests == 1
+    assert llm.stats()["retries"] == 0
+
+
+def test_backoff_is_full_jitter_with_a_cap(monkeypatch):
+    bounds = []
+
+    def uniform(low, high):
+        bounds.append((low, high))
+        return 0.0
+
+    monkeypatch.setattr(llm_client.random, "uniform", uniform)
+    endpoint = Endpoint(500, 500, 500, 500)
+
+    complete(client(endpoint, max_retries=4, backoff_base=0.5, backoff_max=1.5))
+
+    assert bounds == [(0, 0.5), (0, 1.0), (0, 1.5), (0, 1.5)]
+
+
+def test_retry_after_is_honoured_within_the_deadline():
+    endpoint = Endpoint((429, {"Retry-After": "0.05"}))
+
+    async def main():
+        llm = client(endpoint)
+        start = asyncio.get_running_loop().time()
+        result = await llm.complete(MESSAGES)
+        elapsed = asyncio.get_running_loop().time() - start
+        await llm.aclose()
+        return result, elapsed
+
+    result, elapsed = asyncio.run(main())
+
+    assert result == "SELECT 1"
+    assert elapsed >= 0.05
+
+
+def test_no_retry_is_started_that_would_end_past_the_deadline():
+    endpoint = Endpoint((503, {"Retry-After": "5"}))
+
+    with pytest.raises(LLMStatusError) as raised:
+        complete(client(endpoint, timeout=0.5))
+
+    assert raised.value.retry_after == 5.0
+    assert endpoint.requests == 1
+
+
+def test_slow_completion_hits_the_deadline():
+    endpoint = Endpoint(latency=1.0)
+
+    with pytest.raises(LLMTimeoutError):
+        complete(client(endpoint), timeout=0.05)
+
+
+def test_retries_stop_at_the_deadline():
+    endpoint = Endpoint(*[500] * 100, latency=0.03)
+
+    async def main():
+        llm = client(endpoint, max_retries=100, timeout=0.1)
+        start = asyncio.get_running_loop().time()
+        with pytest.raises((LLMTimeoutError, LLMStatusError)):
+            await llm.complete(MESSAGES)
+        elapsed = asyncio.get_running_loop().time() - start
+        await llm.aclose()
+        return elapsed
+
+    # Either the deadline cuts an attempt short or the next backoff would overrun it
+    assert asyncio.run(main()) < 0.15
+    assert 2 <= endpoint.requests <= 4
+
+
+def test_in_flight_completions_are_bounded():
+    endpoint = Endpoint(latency=0.02)
+    llm = client(endpoint, max_in_flight=2)
+
+    async def main():
+        results = await asyncio.gather(*(llm.complete(MESSAGES) for _ in range(6)))
+        await llm.aclose()
+        return results
+
+    assert asyncio.run(main()) == ["SELECT 1"] * 6
+    assert endpoint.peak == 2
+    assert llm.stats() == {"max_in_flight": 2, "in_flight": 0, "retries": 0}
+
+
+def test_time_queued_for_a_slot_counts_towards_the_deadline():
+    endpoint = Endpoint(latency=0.2)
+    llm = client(endpoint, max_in_flight=1)
+
+    async def main():
+        results = await asyncio.gather(
+            llm.complete(MESSAGES, timeout=1.0), llm.complete(MESSAGES, timeout=0.1), return_exceptions=True
+        )
+        await llm.aclose()
+        return results
+
+    first, second = asyncio.run(main())
+
+    assert first == "SELECT 1"
+    assert isinstance(second, LLMTimeoutError)
+    assert endpoint.requests == 1
@@ -0,0 +1,66 @@
+import pytest
+
+from query_cache import QueryCache
+
+SQL = "SELECT 1"
+
+
+# Each pair scores above the 0.85 trigram threshold
+@pytest.mark.parametrize("cached, asked", [
+    ("list all customers sorted by company name ascending", "list all customers sorted by company name descending"),
+    ("show me the total sales revenue for every product category in north america",
+     "show me the total sales revenue for every product category in south america"),
+    ("show me the total revenue for each region and product category for last month",
+     "show me the total revenue for each region and product category for this month"),
+    ("what were the total sales and the number of transactions for all software products",
+     "what were the total sales and the number of transactions for all hardware products"),
+    ("show me the total revenue for each region and product category in europe",
+     "show me the total revenue for each region and product category not in europe"),
+    ("show me the top 5 products by total revenue across all regions",
+     "show me the top 6 products by total revenue across all regions"),
+])
+def test_questions_differing_in_a_content_word_do_not_match(cached, asked):
+    cache = QueryCache()
+    cache.store(cached, SQL)
+    assert cache.lookup(asked) is None
+    assert cache.misses == 1
+
+
+@pytest.mark.parametrize("cached, asked", [
+    ("show me the total sales by region", "show the total sales by region"),
+    ("what are the top 5 products by revenue?", "what are the top 5 product by revenue"),
+    ("list all customers in the technology industry", "list all the customers in the technology industry"),
+])
+def test_rephrasings_match_as_similar(cached, asked):
+    cache = QueryCache()
+    cache.store(cached, SQL)
+    result = cache.lookup(asked)
+    assert result is not None
+    entry, tier, score = result
+    assert (entry.sql, tier) == (SQL, "similar")
+    assert score >= cache.similarity_threshold
+
+
+def test_exact_match_ignores_case_and_punctuation():
+    cache = QueryCache()
+    cache.store("Total sales by region?", SQL)
+    entry, tier, score = cache.lookup("total SALES by region")
+    assert (tier, score) == ("exact", 1.0)
+
+
+def test_fingerprint_change_clears_the_cache():
+    cache = QueryCache()
+    cache.check_fingerprint("v1")
+    cache.store("total sales by region", SQL)
+    cache.check_fingerprint("v2")
+    assert cache.lookup("total sales by region") is None
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = QueryCache(max_entries=2)
+    cache.store("total sales by region", SQL)
+    cache.store("total sales by product", SQL)
+    cache.lookup("total sales by region")
+    cache.store("total sales by customer", SQL)
+    assert cache.lookup("total sales by product") is None
+    assert cache.lookup("total sales by region") is not None
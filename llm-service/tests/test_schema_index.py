@@ -0,0 +1,110 @@
+import pytest
+
+from schema_index import SchemaIndex
+
+
+def table(name, *columns):
+    return name, [{"name": column, "type": "text"} for column in columns]
+
+
+TABLES = dict([
+    table("sales_data", "id", "sale_date", "product_name", "category", "region", "sales_rep", "quantity",
+          "unit_price", "total_amount", "customer_id", "created_at"),
+    table("customers", "id", "name", "industry", "region", "created_at"),
+    table("products", "id", "name", "category", "price", "cost", "supplier"),
+    table("reports", "id", "name", "description", "sql_query", "created_by"),
+    table("dashboards", "id", "name", "layout", "created_by"),
+    table("audit_logs", "id", "user_id", "action", "resource", "created_at"),
+])
+
+
+def fk(source, column, target):
+    return {"table": source, "column": column, "foreign_table": target, "foreign_column": "id"}
+
+
+SCHEMA = {
+    "tables": [{"name": name, "type": "table"} for name in TABLES],
+    "columns": TABLES,
+    "foreign_keys": [fk("sales_data", "customer_id", "customers"), fk("audit_logs", "user_id", "users")],
+}
+
+
+@pytest.fixture(scope="module")
+def index():
+    return SchemaIndex(SCHEMA, top_k=2, expand_foreign_keys=False)
+
+
+@pytest.mark.parametrize("question", [
+    "number of orders",
+    "which salesperson closed most",
+    "how many transactions last week",
+    "what sold best",
+    "who sells the most",
+    "total sales",
+])
+def test_synonyms_match_normalized_schema_tokens(index, question):
+    selected = index.select(question)
+
+    assert selected[0] == "sales_data"
+    assert len(selected) < len(index.tables)
+
+
+def test_synonyms_reach_other_tables(index):
+    assert set(index.select("revenue by client sector")) == {"customers", "sales_data"}
+    assert index.select("which vendor has the best margin") == ["products"]
+
+
+def test_question_without_schema_terms_keeps_every_table(index):
+    assert index.select("hello there") == list(TABLES)
+
+
+def test_weak_matches_are_cut_relative_to_the_best(index):
+    # customers shares only the generic "name" with products, far below the cutoff
+    assert index.select("product price and cost by supplier") == ["products"]
+
+
+def test_top_k_bounds_the_selection():
+    wide = SchemaIndex(SCHEMA, top_k=6, expand_foreign_keys=False)
+    narrow = SchemaIndex(SCHEMA, top_k=1, expand_foreign_keys=False)
+
+    assert wide.select("customer region sales") == ["sales_data", "customers"]
+    assert narrow.select("customer region sales") == ["sales_data"]
+
+
+def test_foreign_key_neighbours_are_added():
+    index = SchemaIndex(SCHEMA, top_k=1)
+
+    assert index.select("customer industry") == ["customers", "sales_data"]
+    assert index.neighbours["sales_data"] == {"customers"}
+    # users is not in the schema, so audit_logs has no neighbour to expand to
+    assert index.neighbours["audit_logs"] == set()
+
+
+def test_allow_list_limits_the_indexed_tables():
+    index = SchemaIndex(SCHEMA, allow=["customers", "products"])
+
+    assert index.tables == ["customers", "products"]
+    assert index.select("total sales by sales rep") == ["customers", "products"]
+
+
+def test_deny_list_hides_tables_and_their_foreign_keys():
+    index = SchemaIndex(SCHEMA, deny=["audit_logs", "customers"], top_k=1)
+
+    assert "audit_logs" not in index.tables and "customers" not in index.tables
+    assert index.select("customer industry") == ["sales_data"]
+    assert index.neighbours["sales_data"] == set()
+
+
+def test_restrict_keeps_only_the_chosen_tables():
+    restricted = SchemaIndex.restrict(SCHEMA, ["sales_data", "customers"])
+
+    assert [t["name"] for t in restricted["tables"]] == ["sales_data", "customers"]
+    assert set(restricted["columns"]) == {"sales_data", "customers"}
+    assert restricted["foreign_keys"] == [fk("sales_data", "customer_id", "customers")]
+
+
+def test_restrict_drops_foreign_keys_to_unchosen_tables():
+    restricted = SchemaIndex.restrict(SCHEMA, ["sales_data"])
+
+    assert restricted["foreign_keys"] == []
+    assert restricted["columns"] == {"sales_data": TABLES["sales_data"]}
@@ -0,0 +1,94 @@
+import pytest
+
+from sql_validator import SQLValidator
+
+ALLOWED_TABLES = ["sales_data", "customers", "products", "reports", "report_categories"]
+
+
+@pytest.fixture
+def validator():
+    return SQLValidator(ALLOWED_TABLES)
+
+
+@pytest.mark.parametrize("sql", [
+    "SELECT SUM(total_amount) AS total_sales FROM sales_data;",
+    "SELECT region, SUM(total_amount) AS revenue FROM sales_data GROUP BY region ORDER BY revenue DESC",
+    "SELECT product_name, created_at, updated_at FROM products ORDER BY updated_at DESC LIMIT 20",
+    "SELECT c.company, SUM(s.total_amount) FROM customers c JOIN sales_data s ON s.customer_id = c.id GROUP BY 1",
+    "SELECT * FROM public.sales_data",
+    "SELECT * FROM sales_data, customers WHERE sales_data.customer_id = customers.id",
+    "SELECT * FROM (sales_data s JOIN customers c ON c.id = s.customer_id)",
+    "SELECT EXTRACT(YEAR FROM sale_date) AS year, SUBSTRING(region FROM 1 FOR 3) FROM sales_data",
+    "SELECT replace(region, 'a', 'b'), left(region, 2) FROM sales_data",
+    "SELECT * FROM sales_data WHERE customer_id IN (SELECT id FROM customers WHERE industry = 'Retail')",
+    "SELECT * FROM generate_series(1, 10) AS n",
+    "SELECT created_at, updated_at, deleted_flag FROM sales_data",
+    "WITH monthly AS (SELECT region, SUM(total_amount) AS revenue FROM sales_data GROUP BY region) "
+    "SELECT * FROM monthly",
+    "WITH a AS (SELECT * FROM sales_data), b AS (SELECT * FROM a) SELECT * FROM b JOIN a ON true",
+    "WITH a AS MATERIALIZED (SELECT * FROM sales_data) SELECT * FROM a",
+    "WITH a (region, revenue) AS (SELECT region, SUM(total_amount) FROM sales_data GROUP BY 1) SELECT * FROM a",
+    "WITH RECURSIVE n (i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < 5) SELECT * FROM n",
+    "(SELECT region FROM sales_data) UNION (SELECT industry FROM customers)",
+    "SELECT region FROM sales_data UNION TABLE customers",
+    "(TABLE products)",
+    "SELECT * FROM sales_data WHERE created_at > '2024-01-01 10:30'",
+])
+def test_accepts_read_only_queries_over_allowed_tables(validator, sql):
+    assert validator.validate(sql) == (True, None)
+
+
+@pytest.mark.parametrize("sql, error", [
+    ("", "Empty"),
+    ("DELETE FROM sales_data", "Only SELECT"),
+    ("SELECT 1; DROP TABLE sales_data", "single statement"),
+    ("SELECT * INTO backup FROM sales_data", "INTO"),
+    ("WITH d AS (DELETE FROM sales_data RETURNING *) SELECT * FROM d", "DELETE"),
+    ("SELECT pg_sleep(10)", "pg_sleep"),
+    ("SELECT * FROM sales_data WHERE pg_read_file('/etc/passwd') IS NOT NULL", "pg_read_file"),
+    ("SELECT * FROM sales_data FOR UPDATE", "UPDATE"),
+    ("SELECT * FROM users", "users"),
+    ("SELECT * FROM pg_catalog.pg_authid", "Schema not allowed"),
+    ("SELECT * FROM sales_data s JOIN data_sources d ON true", "data_sources"),
+    ("SELECT * FROM sales_data WHERE EXISTS (SELECT 1 FROM users)", "users"),
+    ("SELECT (SELECT password FROM users LIMIT 1) FROM sales_data", "users"),
+    ("SELECT * FROM (sales_data s JOIN users u ON true)", "users"),
+    ("SELECT (1", "Unbalanced"),
+    ("SELECT 1)", "Unbalanced"),
+])
+def test_rejects_writes_side_effects_and_unknown_tables(validator, sql, error):
+    valid, message = validator.validate(sql)
+    assert not valid
+    assert error in message
+
+
+@pytest.mark.parametrize("sql", [
+    # A CTE named after a blocked table: its own body still reads the real table
+    "WITH data_sources AS (SELECT * FROM data_sources) SELECT * FROM data_sources;",
+    "WITH users AS MATERIALIZED (SELECT * FROM users) SELECT * FROM users",
+    # A CTE is only in scope after its definition...
+    "WITH a AS (SELECT * FROM users), users AS (SELECT 1) SELECT * FROM a",
+    # ...and only inside the query that defines it
+    "SELECT * FROM (WITH users AS (SELECT 1) SELECT * FROM users) x, users",
+    # TABLE x is SELECT * FROM x
+    "(TABLE data_sources);",
+    "SELECT * FROM sales_data UNION TABLE users;",
+    "SELECT * FROM sales_data WHERE customer_id IN (TABLE users)",
+])
+def test_cte_and_table_shorthand_cannot_reach_blocked_tables(validator, sql):
+    valid, message = validator.validate(sql)
+    assert not valid
+    assert message.startswith("Table not allowed")
+
+
+def test_without_an_allow_list_any_table_is_accepted():
+    assert SQLValidator().validate("SELECT * FROM users") == (True, None)
+
+
+def test_verdicts_are_memoized():
+    validator = SQLValidator(ALLOWED_TABLES, cache_size=1)
+    validator.validate("SELECT * FROM sales_data")
+    validator.validate("SELECT * FROM sales_data")
+    validator.validate("SELECT * FROM customers")
+    validator.validate("SELECT * FROM sales_data")
+    assert validator.stats() == {"entries": 1, "hits": 1, "misses": 3}